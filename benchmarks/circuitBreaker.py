@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Edge TTS circuit breaker benchmark
+Runs kiosk-style traffic through text_to_speech against the offline fake
+backend while it is down (every stream fails after a connect timeout), with
+the circuit breaker off and on, and reports how long a request takes to come
+back with its failure, which is how long the kiosk waits before the browser
+voice takes over. A phrase served from the audio cache is timed alongside.
+With the breaker on, the run ends by bringing the backend back and counting
+requests until the half-open probe closes the circuit again.
+
+Usage: python benchmarks/circuitBreaker.py [--requests <n>] [--concurrency <n>] [--outage-delay <s>]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'services'))
+
+os.environ['EDGE_TTS_PHRASE_BANK'] = os.path.join(BENCHMARK_DIR, 'missing.pack')
+
+import fakeEdgeTTS  # noqa: E402
+
+fakeEdgeTTS.install()
+
+from edgeTTS import EdgeTTSService  # noqa: E402
+from edgeTTSCircuit import CircuitBreaker  # noqa: E402
+
+CACHED_TEXT = 'Hello! How can I help you today?'
+
+
+async def speak(service, text):
+    started = time.perf_counter()
+    result = await service.text_to_speech(text, language='en', encoding='raw', audio_format='mp3-low')
+    return time.perf_counter() - started, result
+
+
+async def run_outage(service, count, concurrency):
+    """Seconds until each of count distinct requests failed, and seconds for each cached one"""
+    semaphore = asyncio.Semaphore(concurrency)
+    failed, cached = [], []
+
+    async def one(index):
+        async with semaphore:
+            # Numbered texts keep identical requests from being coalesced
+            seconds, result = await speak(service, f'Where is room {index}?')
+            if result['success']:
+                raise RuntimeError('a request succeeded during the outage')
+            failed.append(seconds)
+            seconds, result = await speak(service, CACHED_TEXT)
+            if not result['success']:
+                raise RuntimeError(f"cached audio failed: {result['error']}")
+            cached.append(seconds)
+
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return failed, cached
+
+
+async def benchmark(args):
+    print(f'{args.requests} requests during an outage, connect timeout {args.outage_delay * 1e3:.0f} ms, '
+          f'concurrency {args.concurrency}')
+    print(f"{'breaker':<10}{'fail p50 ms':>13}{'fail max ms':>13}{'cached p50 ms':>15}{'streams':>9}")
+    for mode in ('off', 'on'):
+        fakeEdgeTTS.configure(outage=False)
+        service = EdgeTTSService()
+        service.circuit = CircuitBreaker(enabled=mode == 'on', metrics=service.metrics)
+        service.circuit.OPEN_SECONDS = args.open_seconds
+        # Put the cached phrase in the audio cache while the backend is up
+        await speak(service, CACHED_TEXT)
+
+        fakeEdgeTTS.configure(outage=True, outage_delay=args.outage_delay)
+        failed, cached = await run_outage(service, args.requests, args.concurrency)
+        print(f'{mode:<10}{statistics.median(failed) * 1e3:>13.1f}{max(failed) * 1e3:>13.1f}'
+              f'{statistics.median(cached) * 1e3:>15.2f}{fakeEdgeTTS.stats["streams"]:>9}')
+
+    # Recovery: requests fail fast until the cool-down ends, then one probe closes the circuit
+    fakeEdgeTTS.configure(outage=False)
+    started = time.perf_counter()
+    attempts = 0
+    while service.circuit.state != 'closed':
+        attempts += 1
+        await speak(service, f'Recovery request {attempts}.')
+        await asyncio.sleep(0.05)
+    print(f'circuit closed {time.perf_counter() - started:.2f}s after the backend came back, '
+          f'{attempts} requests, {fakeEdgeTTS.stats["streams"]} reached the backend')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS circuit breaker benchmark')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=2, help='requests in flight, as from a couple of kiosks')
+    parser.add_argument('--outage-delay', type=float, default=1.0, help='seconds each stream takes to fail')
+    parser.add_argument('--open-seconds', type=float, default=1.0, help='first cool-down of the open circuit')
+    args = parser.parse_args()
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
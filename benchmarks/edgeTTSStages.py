@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Per-stage microbenchmarks for the Edge TTS pipeline
+Times each step of text_to_speech separately against the offline fake backend
+and compares the results with a saved JSON baseline
+
+Usage: python benchmarks/edgeTTSStages.py [--save] [--baseline <path>] [--tolerance <ratio>]
+                                          [--chunk-rate <chunks/s>] [--chunk-bytes <n>]
+                                          [--backend-format mp3|opus] [--format mp3|mp3-low|opus|pcm]
+
+Without --save the run fails (exit status 1) when any stage is slower than its
+baseline by more than the tolerance, or when there is no baseline to compare
+with. Baselines are machine specific, so record one with --save on the machine
+that runs the comparison.
+
+The transcode stage runs the synthesized audio through transcode_stream into
+--format, as text_to_speech does: a pass-through when the backend audio already
+is that format, ffmpeg otherwise (not timed when ffmpeg is missing).
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'services'))
+
+import fakeEdgeTTS  # noqa: E402
+
+fakeEdgeTTS.install()
+
+import edgeTTS  # noqa: E402
+from edgeTTS import EdgeTTSService  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baselines', 'edgeTTSStages.json')
+
+STAGES = ('clean_text', 'lexicon', 'enhancements', 'detect_language', 'synthesis', 'transcode', 'base64')
+
+INPUTS = {
+    'short': 'Hello! How can I help you today?',
+    'long': (
+        'The CSE department is on the second floor, next to the AICTE approved ECE labs. '
+        'Prof. Anitha C S teaches Data Structures on Monday and Wednesday mornings, and '
+        'Dr. G Dhivyasri handles Software Engineering for the B.Tech and MTech batches. '
+    ) * 12,
+    'mixed': (
+        'ನಮಸ್ಕಾರ! CSE ವಿಭಾಗವು ಎರಡನೇ ಮಹಡಿಯಲ್ಲಿದೆ. Prof. Lakshmi Durga N is available after 2 PM. '
+        'ದಯವಿಟ್ಟು reception desk ನಲ್ಲಿ ನೋಂದಾಯಿಸಿ. '
+    ) * 4,
+}
+
+# Differences below this many seconds are treated as timer noise, whatever the ratio
+NOISE_FLOOR = 5e-6
+
+
+def measure(function, repeat):
+    """Median seconds per call over repeat rounds of an auto-ranged loop"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(repeat=repeat, number=number)) / number
+
+
+async def chunked(audio, size):
+    """audio as an async stream of size-byte chunks, as synthesis delivers it"""
+    for start in range(0, len(audio), size):
+        yield audio[start:start + size]
+
+
+def run_stages(service, text, repeat, loop, audio_format, chunk_bytes):
+    """Time every stage for one input, each fed the previous stage's output"""
+    results = {}
+
+    cleaned = service.clean_text(text)
+    results['clean_text'] = measure(lambda: service.clean_text(text), repeat)
+
+    language = service.detect_language(cleaned)
+    rewriter = service._lexicon_rewriter(language)
+    rewritten = rewriter.rewrite(cleaned)
+    results['lexicon'] = measure(lambda: rewriter.rewrite(cleaned), repeat)
+
+    # The kiosk always names the language, so its own rules apply too
+    enhanced = service.enhance_pronunciation(rewritten, language)
+    results['enhancements'] = measure(lambda: service.enhance_pronunciation(rewritten, language), repeat)
+
+    results['detect_language'] = measure(lambda: service.detect_language(cleaned), repeat)
+
+    voice = service.get_voice(language)
+
+    async def synthesize():
+        return b''.join([chunk async for chunk in service._synthesis_stream(enhanced, voice, language)])
+
+    audio = loop.run_until_complete(synthesize())
+    results['synthesis'] = measure(lambda: loop.run_until_complete(synthesize()), repeat)
+
+    def transcode():
+        return loop.run_until_complete(service.transcode_stream(chunked(audio, chunk_bytes), audio_format=audio_format))
+
+    encoded, _ = transcode()
+    # Without ffmpeg the raw audio is delivered untouched, which is not worth timing
+    if encoded is not None:
+        results['transcode'] = measure(transcode, repeat)
+    else:
+        encoded = audio
+
+    results['base64'] = measure(lambda: base64.b64encode(encoded).decode('utf-8'), repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List (input, stage, baseline, current) for every stage over its budget"""
+    regressions = []
+    for name, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(name, {}).get(stage)
+            if previous is None:
+                continue
+            if current > previous * (1 + tolerance) and current - previous > NOISE_FLOOR:
+                regressions.append((name, stage, previous, current))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage Edge TTS pipeline benchmarks')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown ratio per stage')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per stage')
+    parser.add_argument('--chunk-rate', type=float, default=0, help='fake backend chunks per second (0 = unthrottled)')
+    parser.add_argument('--chunk-bytes', type=int, default=fakeEdgeTTS.CHUNK_BYTES, help='fake backend chunk size')
+    parser.add_argument('--backend-format', choices=('mp3', 'opus'), default=fakeEdgeTTS.AUDIO_FORMAT,
+                        help='audio the fake backend streams (edge_tts streams mp3)')
+    parser.add_argument('--format', choices=tuple(edgeTTS.AUDIO_FORMATS), default=edgeTTS.DEFAULT_AUDIO_FORMAT,
+                        help='delivered audio format')
+    args = parser.parse_args()
+    if not args.save and not os.path.exists(args.baseline):
+        print(f'❌ No baseline at {args.baseline}; record one with --save', file=sys.stderr)
+        return 1
+
+    fakeEdgeTTS.configure(chunk_bytes=args.chunk_bytes, chunks_per_second=args.chunk_rate, audio_format=args.backend_format)
+    # Timings must not be served from the audio cache or a phrase bank
+    os.environ['EDGE_TTS_CACHE'] = '0'
+    service = EdgeTTSService()
+    service.phrase_bank = None
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = {
+            name: run_stages(service, text, args.repeat, loop, args.format, args.chunk_bytes)
+            for name, text in INPUTS.items()
+        }
+    finally:
+        loop.close()
+
+    print(f"{'stage':<18}" + ''.join(f'{name + " us":>14}' for name in INPUTS))
+    for stage in STAGES:
+        cells = [results[name].get(stage) for name in INPUTS]
+        print(f'{stage:<18}' + ''.join(f'{cell * 1e6:>14.1f}' if cell is not None else f'{"-":>14}' for cell in cells))
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'ffmpeg': edgeTTS.ffmpeg_available(),
+            'chunk_rate': args.chunk_rate,
+            'chunk_bytes': args.chunk_bytes,
+            'backend_format': args.backend_format,
+            'format': args.format
+        },
+        'results': results
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('chunk_rate') != args.chunk_rate:
+        print('\n⚠️ Baseline was recorded with a different --chunk-rate; synthesis timings are not comparable')
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f'\nRegressions over {args.tolerance:.0%} against {args.baseline}:')
+        for name, stage, previous, current in regressions:
+            print(f'  {name}/{stage}: {previous * 1e6:.1f} us -> {current * 1e6:.1f} us')
+        return 1
+    print(f'\nNo stage slower than {args.tolerance:.0%} over {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the edge_tts package used by the benchmarks
+Streams canned audio in fixed-size chunks at a configurable rate: 48 kbps MP3,
+as edge_tts does, or Ogg/Opus or raw PCM
+
+install() registers this module as `edge_tts`, so it must run before
+services/edgeTTS.py is imported.
+"""
+
+import asyncio
+import random
+import shutil
+import subprocess
+import sys
+
+# Chunk size and pacing of the stream; CHUNKS_PER_SECOND = 0 streams unthrottled
+CHUNK_BYTES = 4096
+CHUNKS_PER_SECOND = 0
+# Delay before the first chunk, standing in for the service's time to first byte
+FIRST_CHUNK_DELAY = 0.0
+# Each stream's first chunk delay is scaled by a random factor in 1 +/- FIRST_CHUNK_JITTER
+FIRST_CHUNK_JITTER = 0.0
+# Fraction of streams whose first chunk is held back a further SLOW_FIRST_CHUNK_DELAY,
+# standing in for the service's occasional slow turns
+SLOW_FRACTION = 0.0
+SLOW_FIRST_CHUNK_DELAY = 0.0
+# While OUTAGE is set every stream fails after OUTAGE_DELAY, standing in for an
+# unreachable service's connect timeout
+OUTAGE = False
+OUTAGE_DELAY = 0.0
+# Roughly 24 kbps Opus at 15 characters per second of speech
+BYTES_PER_CHARACTER = 200
+# Format Communicate streams: mp3 (edge_tts's audio-24khz-48kbitrate-mono-mp3), opus or pcm
+AUDIO_FORMAT = 'mp3'
+
+# ffmpeg encoder arguments for each canned format, all 24 kHz mono
+CANNED_ENCODERS = {
+    'mp3': ['-codec:a', 'libmp3lame', '-b:a', '48k', '-f', 'mp3'],
+    'opus': ['-codec:a', 'libopus', '-b:a', '24k', '-f', 'ogg'],
+    'pcm': ['-f', 's16le'],
+}
+# Stand-ins when ffmpeg is missing: MPEG-2 Layer III 48 kbps frames, Ogg pages, silence
+PLACEHOLDERS = {
+    'mp3': (b'\xff\xf3\x64\xc4' + bytes(140)) * 32,
+    'opus': (b'OggS' + bytes(range(256)) * 16)[:4096],
+    'pcm': bytes(4096),
+}
+
+_canned_audio = {}
+_random = random.Random(0)
+# Streams started since the last configure(), for load accounting
+stats = {'streams': 0}
+
+
+def canned_audio(audio_format=None):
+    """A few seconds of real audio in audio_format when ffmpeg is around, placeholder bytes otherwise"""
+    audio_format = audio_format or AUDIO_FORMAT
+    if audio_format not in _canned_audio:
+        audio = None
+        if shutil.which('ffmpeg'):
+            try:
+                audio = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                     '-f', 'lavfi', '-i', 'sine=frequency=220:duration=5:sample_rate=24000',
+                     '-ac', '1', *CANNED_ENCODERS[audio_format], 'pipe:1'],
+                    capture_output=True, timeout=30, check=True
+                ).stdout
+            except (OSError, subprocess.SubprocessError) as e:
+                sys.stderr.write(f'⚠️ Could not render canned {audio_format} audio: {str(e)}\n')
+        _canned_audio[audio_format] = audio or PLACEHOLDERS[audio_format]
+    return _canned_audio[audio_format]
+
+
+def configure(chunk_bytes=None, chunks_per_second=None, first_chunk_delay=None, audio_format=None,
+              first_chunk_jitter=None, slow_fraction=None, slow_first_chunk_delay=None, seed=None,
+              outage=None, outage_delay=None):
+    """Override the stream shape for every Communicate created afterwards
+
+    seed makes the jitter and the choice of slow streams repeatable.
+    """
+    global CHUNK_BYTES, CHUNKS_PER_SECOND, FIRST_CHUNK_DELAY, AUDIO_FORMAT
+    global FIRST_CHUNK_JITTER, SLOW_FRACTION, SLOW_FIRST_CHUNK_DELAY, OUTAGE, OUTAGE_DELAY
+    stats['streams'] = 0
+    if chunk_bytes is not None:
+        CHUNK_BYTES = chunk_bytes
+    if chunks_per_second is not None:
+        CHUNKS_PER_SECOND = chunks_per_second
+    if first_chunk_delay is not None:
+        FIRST_CHUNK_DELAY = first_chunk_delay
+    if audio_format is not None:
+        AUDIO_FORMAT = audio_format
+    if first_chunk_jitter is not None:
+        FIRST_CHUNK_JITTER = first_chunk_jitter
+    if slow_fraction is not None:
+        SLOW_FRACTION = slow_fraction
+    if slow_first_chunk_delay is not None:
+        SLOW_FIRST_CHUNK_DELAY = slow_first_chunk_delay
+    if outage is not None:
+        OUTAGE = outage
+    if outage_delay is not None:
+        OUTAGE_DELAY = outage_delay
+    if seed is not None:
+        _random.seed(seed)
+
+
+def install():
+    """Register this module as edge_tts for anything imported afterwards"""
+    sys.modules['edge_tts'] = sys.modules[__name__]
+
+
+class Communicate:
+    """Mimics edge_tts.Communicate: audio chunks sized to the text, then a word boundary"""
+
+    def __init__(self, text, voice, rate='+0%', pitch='+0Hz', volume='+0%', **kwargs):
+        self.text = text
+        self.voice = voice
+
+    async def stream(self):
+        audio = canned_audio()
+        total = max(len(self.text) * BYTES_PER_CHARACTER, 1)
+        interval = 1.0 / CHUNKS_PER_SECOND if CHUNKS_PER_SECOND else 0
+
+        stats['streams'] += 1
+        if OUTAGE:
+            await asyncio.sleep(OUTAGE_DELAY)
+            raise ConnectionError('Cannot connect to host speech.platform.bing.com')
+        delay = FIRST_CHUNK_DELAY
+        if FIRST_CHUNK_JITTER:
+            delay *= 1 + _random.uniform(-FIRST_CHUNK_JITTER, FIRST_CHUNK_JITTER)
+        if SLOW_FRACTION and _random.random() < SLOW_FRACTION:
+            delay += SLOW_FIRST_CHUNK_DELAY
+        if delay:
+            await asyncio.sleep(delay)
+        sent = 0
+        while sent < total:
+            size = min(CHUNK_BYTES, total - sent)
+            start = sent % len(audio)
+            chunk = audio[start:start + size]
+            sent += len(chunk)
+            yield {'type': 'audio', 'data': chunk}
+            # Always yield to the loop, as a real network stream would
+            await asyncio.sleep(interval)
+        yield {'type': 'WordBoundary', 'offset': 0, 'duration': 0, 'text': self.text}
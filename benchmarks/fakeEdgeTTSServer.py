@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Local WebSocket stand-in for the Edge TTS speech service
+Speaks the service's streaming protocol (speech.config, then ssml turns answered
+by turn.start, audio frames and turn.end), so the session pool can be exercised
+and benchmarked offline. Requires aiohttp.
+
+Usage: python benchmarks/fakeEdgeTTSServer.py [--port <n>] [--handshake-delay <s>]
+                                              [--first-chunk-delay <s>] [--turns-per-connection <n>]
+
+Point the worker at it with EDGE_TTS_POOL_URL=ws://127.0.0.1:<port>/ (and
+EDGE_TTS_POOL_SIZE above 0). GET /stats returns the connection and turn counts.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+import uuid
+from xml.sax.saxutils import unescape
+
+from aiohttp import WSMsgType, web  # pyright: ignore[reportMissingImports]
+
+import fakeEdgeTTS
+
+SSML_TEXT = re.compile(r'<prosody[^>]*>(.*)</prosody>', re.S)
+
+# Canned audio flavour and Content-Type for each Edge TTS outputFormat served
+OUTPUT_FORMATS = {
+    'audio-24khz-48kbitrate-mono-mp3': ('mp3', 'audio/mpeg'),
+    'ogg-24khz-16bit-mono-opus': ('opus', 'audio/ogg; codecs=opus'),
+    'raw-24khz-16bit-mono-pcm': ('pcm', 'audio/x-wav'),
+}
+
+
+class FakeEdgeTTSServer:
+    """Serves synthesis turns with canned audio sized to the text
+
+    handshake_delay holds each WebSocket upgrade back, standing in for the TLS
+    and WebSocket set-up cost of the real service; turns_per_connection closes a
+    connection after that many turns (0 = never), to exercise session recycling.
+    """
+
+    def __init__(self, handshake_delay=0.15, first_chunk_delay=0.0, chunk_bytes=fakeEdgeTTS.CHUNK_BYTES,
+                 chunks_per_second=0, turns_per_connection=0):
+        self.handshake_delay = handshake_delay
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_bytes = chunk_bytes
+        self.chunks_per_second = chunks_per_second
+        self.turns_per_connection = turns_per_connection
+        self.stats = {'connections': 0, 'open_connections': 0, 'turns': 0, 'max_concurrent_turns': 0}
+        self._active_turns = 0
+        self.runner = None
+        self.url = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_get('/{tail:.*}', self.handle_socket)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; returns the ws:// URL to connect to"""
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.url = f'ws://{host}:{self.runner.addresses[0][1]}/'
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+    async def handle_socket(self, request):
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats['connections'] += 1
+        self.stats['open_connections'] += 1
+        output_format = None
+        turns = set()
+        served = 0
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                head, _, body = message.data.partition('\r\n\r\n')
+                headers = dict(line.split(':', 1) for line in head.split('\r\n') if ':' in line)
+                if headers.get('Path') == 'speech.config':
+                    try:
+                        output_format = json.loads(body)['context']['synthesis']['audio']['outputFormat']
+                    except (ValueError, KeyError, TypeError):
+                        output_format = None
+                    if output_format not in OUTPUT_FORMATS:
+                        await ws.close(code=1007, message=b'Unsupported outputFormat')
+                        break
+                elif headers.get('Path') == 'ssml':
+                    if output_format is None:
+                        await ws.close(code=1008, message=b'speech.config must come first')
+                        break
+                    served += 1
+                    last = self.turns_per_connection and served >= self.turns_per_connection
+                    turn = asyncio.create_task(
+                        self.turn(ws, headers.get('X-RequestId', ''), body, output_format, close_after=last)
+                    )
+                    turns.add(turn)
+                    turn.add_done_callback(turns.discard)
+        finally:
+            for turn in turns:
+                turn.cancel()
+            self.stats['open_connections'] -= 1
+        return ws
+
+    async def turn(self, ws, request_id, ssml, output_format, close_after=False):
+        """Answer one ssml message the way the service does"""
+        self.stats['turns'] += 1
+        self._active_turns += 1
+        self.stats['max_concurrent_turns'] = max(self.stats['max_concurrent_turns'], self._active_turns)
+        try:
+            match = SSML_TEXT.search(ssml)
+            text = unescape(match.group(1)) if match else ''
+            canned, content_type = OUTPUT_FORMATS[output_format]
+            audio = fakeEdgeTTS.canned_audio(canned)
+            total = max(len(text) * fakeEdgeTTS.BYTES_PER_CHARACTER, 1)
+            interval = 1.0 / self.chunks_per_second if self.chunks_per_second else 0
+            stream_id = uuid.uuid4().hex
+
+            await ws.send_str(self.text_message(request_id, 'turn.start', '{"context":{"serviceTag":"fake"}}'))
+            await ws.send_str(self.text_message(request_id, 'response', '{"context":{"serviceTag":"fake"}}'))
+            if self.first_chunk_delay:
+                await asyncio.sleep(self.first_chunk_delay)
+            sent = 0
+            while sent < total:
+                size = min(self.chunk_bytes, total - sent)
+                start = sent % len(audio)
+                chunk = audio[start:start + size]
+                sent += len(chunk)
+                await ws.send_bytes(self.audio_message(
+                    f'X-RequestId:{request_id}\r\nContent-Type:{content_type}\r\nX-StreamId:{stream_id}\r\nPath:audio\r\n', chunk
+                ))
+                await asyncio.sleep(interval)
+            await ws.send_bytes(self.audio_message(f'X-RequestId:{request_id}\r\nX-StreamId:{stream_id}\r\nPath:audio\r\n', b''))
+            await ws.send_str(self.text_message(request_id, 'turn.end', '{}'))
+            if close_after:
+                await ws.close()
+        except ConnectionResetError:
+            pass
+        finally:
+            self._active_turns -= 1
+
+    @staticmethod
+    def text_message(request_id, path, body):
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+        return (f'X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n'
+                f'X-Timestamp:{timestamp}\r\nPath:{path}\r\n\r\n{body}')
+
+    @staticmethod
+    def audio_message(headers, audio):
+        encoded = headers.encode('utf-8')
+        return len(encoded).to_bytes(2, 'big') + encoded + audio
+
+
+async def run(args):
+    server = FakeEdgeTTSServer(
+        handshake_delay=args.handshake_delay, first_chunk_delay=args.first_chunk_delay,
+        turns_per_connection=args.turns_per_connection
+    )
+    url = await server.start(args.host, args.port)
+    print(f'Fake Edge TTS service listening on {url}', flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Edge TTS WebSocket service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--handshake-delay', type=float, default=0.15, help='seconds added to every connection set-up')
+    parser.add_argument('--first-chunk-delay', type=float, default=0.0, help='seconds before the first audio frame of a turn')
+    parser.add_argument('--turns-per-connection', type=int, default=0, help='close connections after this many turns (0 = never)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
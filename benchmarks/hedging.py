@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Hedged request benchmark for the Edge TTS backend
+Runs the same text_to_speech load against the offline fake backend twice, with
+hedging off and on, while a fraction of streams get a slow first chunk, and
+reports latency percentiles and how many extra streams hedging started
+
+Usage: python benchmarks/hedging.py [--requests <n>] [--concurrency <n>]
+                                    [--first-chunk-delay <s>] [--jitter <ratio>] [--slow-fraction <ratio>]
+                                    [--slow-delay <s>] [--max-ratio <ratio>] [--seed <n>]
+
+Requests ask for mp3-low, the fake backend's own format, so ffmpeg stays out
+of the measurement.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'services'))
+
+# Every request must reach the backend
+os.environ['EDGE_TTS_CACHE'] = '0'
+os.environ['EDGE_TTS_PHRASE_BANK'] = os.path.join(BENCHMARK_DIR, 'missing.pack')
+
+import fakeEdgeTTS  # noqa: E402
+
+fakeEdgeTTS.install()
+
+from edgeTTS import EdgeTTSService, HedgePolicy  # noqa: E402
+
+UTTERANCES = (
+    'Hello! How can I help you today?',
+    'The CSE department is on the second floor.',
+    'Please register at the reception desk.',
+    'The library is open until eight in the evening.',
+)
+
+
+async def run_requests(service, count, concurrency, hedge):
+    """Per-request seconds for count distinct requests"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(index):
+        # Numbered texts keep identical requests from being coalesced
+        text = f'{UTTERANCES[index % len(UTTERANCES)]} Request {index}.'
+        async with semaphore:
+            started = time.perf_counter()
+            result = await service.text_to_speech(text, language='en', encoding='raw', audio_format='mp3-low', hedge=hedge)
+            if not result['success']:
+                raise RuntimeError(result['error'])
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return samples
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def benchmark(args):
+    fakeEdgeTTS.configure(
+        first_chunk_delay=args.first_chunk_delay, first_chunk_jitter=args.jitter, chunks_per_second=args.chunk_rate,
+        slow_fraction=args.slow_fraction, slow_first_chunk_delay=args.slow_delay
+    )
+    results = {}
+    for mode, hedge in (('off', False), ('hedged', True)):
+        service = EdgeTTSService()
+        service.hedge_policy = HedgePolicy(enabled=hedge, max_ratio=args.max_ratio)
+        # Warm the time to first chunk window so the adaptive delay is in use from the start
+        await run_requests(service, HedgePolicy.MIN_SAMPLES, args.concurrency, False)
+        fakeEdgeTTS.configure(seed=args.seed)
+        samples = await run_requests(service, args.requests, args.concurrency, hedge)
+        streams = fakeEdgeTTS.stats['streams']
+        counters = service.metrics.counters
+        hedges = {dict(labels)['outcome']: value for (name, labels), value in counters.items() if name == 'hedges_total'}
+        skipped = {dict(labels)['reason']: value for (name, labels), value in counters.items() if name == 'hedges_skipped_total'}
+        results[mode] = {
+            'samples': samples, 'streams': streams, 'hedges': hedges, 'skipped': skipped,
+            'delay': service.hedge_policy.delay()
+        }
+
+    print(f'{args.requests} requests, concurrency {args.concurrency}, first chunk {args.first_chunk_delay * 1e3:.0f} ms, '
+          f'{args.slow_fraction:.0%} slowed by {args.slow_delay * 1e3:.0f} ms, hedge budget {args.max_ratio:.0%}')
+    print(f"{'mode':<8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'delay ms':>10}{'extra':>8}  hedges")
+    for mode, result in results.items():
+        samples = result['samples']
+        extra = sum(result['hedges'].values()) / (result['streams'] - sum(result['hedges'].values()))
+        print(f'{mode:<8}'
+              f'{statistics.median(samples) * 1e3:>10.1f}'
+              f'{percentile(samples, 0.9) * 1e3:>10.1f}'
+              f'{percentile(samples, 0.99) * 1e3:>10.1f}'
+              f'{max(samples) * 1e3:>10.1f}'
+              f"{result['delay'] * 1e3:>10.1f}"
+              f'{extra:>8.1%}  '
+              + ', '.join(f'{name}={value}' for name, value in sorted(result['hedges'].items()))
+              + ''.join(f', skipped {name}={value}' for name, value in sorted(result['skipped'].items())))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS hedged request benchmark')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--first-chunk-delay', type=float, default=0.08, help='typical backend time to first chunk in seconds')
+    parser.add_argument('--jitter', type=float, default=0.3, help='first chunk delay varies by this fraction either way')
+    parser.add_argument('--chunk-rate', type=float, default=100, help='backend chunks per second')
+    parser.add_argument('--slow-fraction', type=float, default=0.05, help='fraction of streams with a slow first chunk')
+    parser.add_argument('--slow-delay', type=float, default=1.0, help='extra seconds before a slow stream starts')
+    parser.add_argument('--max-ratio', type=float, default=HedgePolicy.MAX_RATIO, help='hedge budget as a fraction of streams')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
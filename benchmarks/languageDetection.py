@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Language detection benchmark for the Edge TTS service
+Compares EdgeTTSService.detect_language against the previous regex chain on long inputs
+
+Usage: python benchmarks/languageDetection.py [--repeat <n>]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import EdgeTTSService  # noqa: E402
+
+
+def legacy_detect_language(text):
+    """detect_language as it was before the codepoint table (sequential regexes)"""
+    text = text.strip()
+    
+    # Check for specific language patterns
+    if re.search(r'[а-яё]', text, re.IGNORECASE):
+        return 'ru'
+    elif re.search(r'[一-龯]', text):
+        if re.search(r'[繁體中文]', text):
+            return 'zh-TW'
+        return 'zh-CN'
+    elif re.search(r'[ひらがなカタカナ]', text):
+        return 'ja'
+    elif re.search(r'[가-힣]', text):
+        return 'ko'
+    elif re.search(r'[ا-ي]', text):
+        return 'ar'
+    elif re.search(r'[α-ω]', text, re.IGNORECASE):
+        return 'el'
+    elif re.search(r'[א-ת]', text):
+        return 'he'
+    elif re.search(r'[ก-๙]', text):
+        return 'th'
+    elif re.search(r'[àáâãäåæçèéêëìíîïðñòóôõöøùúûüýþÿ]', text, re.IGNORECASE):
+        return 'es'  # Default to Spanish for accented characters
+    elif re.search(r'[äöüß]', text, re.IGNORECASE):
+        return 'de'
+    elif re.search(r'[àèéìíîòóù]', text, re.IGNORECASE):
+        return 'it'
+    elif re.search(r'[àáâãçéêíóôõú]', text, re.IGNORECASE):
+        return 'pt'
+    elif re.search(r'[àâäéèêëïîôöùûüÿç]', text, re.IGNORECASE):
+        return 'fr'
+    elif re.search(r'[ąćęłńóśźż]', text, re.IGNORECASE):
+        return 'pl'
+    elif re.search(r'[áčďéěíňóřšťúůýž]', text, re.IGNORECASE):
+        return 'cs'
+    elif re.search(r'[áéíóöőúüű]', text, re.IGNORECASE):
+        return 'hu'
+    elif re.search(r'[ăâîșț]', text, re.IGNORECASE):
+        return 'ro'
+    elif re.search(r'[абвгдежзийклмнопрстуфхцчшщъьюя]', text, re.IGNORECASE):
+        return 'bg'
+    elif re.search(r'[čćđšž]', text, re.IGNORECASE):
+        return 'hr'
+    elif re.search(r'[áäčďéíĺľňóôŕšťúýž]', text, re.IGNORECASE):
+        return 'sk'
+    elif re.search(r'[čšž]', text, re.IGNORECASE):
+        return 'sl'
+    elif re.search(r'[äõöü]', text, re.IGNORECASE):
+        return 'et'
+    elif re.search(r'[āčēģīķļņšūž]', text, re.IGNORECASE):
+        return 'lv'
+    elif re.search(r'[ąčęėįšųūž]', text, re.IGNORECASE):
+        return 'lt'
+    elif re.search(r'[çğıöşü]', text, re.IGNORECASE):
+        return 'tr'
+    elif re.search(r'[àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]', text, re.IGNORECASE):
+        return 'vi'
+    elif re.search(r'[àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]', text, re.IGNORECASE):
+        return 'id'
+    else:
+        return 'en'  # Default to English
+
+
+# Long inputs near the 5000-character limit of /api/tts/speak
+SAMPLES = {
+    'english': ('Welcome to the college reception, how can I help you today? ' * 90)[:5000],
+    'english_no_i': ('Hello! We are open at the weekend, come along. ' * 110)[:5000],
+    'spanish': ('¿Dónde está la oficina del profesor? Está en el edificio principal. ' * 80)[:5000],
+    'russian': ('Добро пожаловать в колледж, чем я могу помочь? ' * 110)[:5000],
+    'kannada': ('ನಮಸ್ಕಾರ, ನಾನು ನಿಮಗೆ ಹೇಗೆ ಸಹಾಯ ಮಾಡಬಹುದು? ' * 130)[:5000],
+    'hindi_mixed': ('Computer Science विभाग दूसरी मंज़िल पर है, please visit. ' * 90)[:5000],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS language detection benchmark')
+    parser.add_argument('--repeat', type=int, default=200, help='detections timed per input')
+    repeat = parser.parse_args().repeat
+    service = EdgeTTSService()
+
+    print(f"{'input':<14}{'legacy':>8}{'table':>8}{'legacy us':>12}{'table us':>12}{'speedup':>10}")
+    for name, text in SAMPLES.items():
+        legacy_time = timeit.timeit(lambda: legacy_detect_language(text), number=repeat) / repeat
+        table_time = timeit.timeit(lambda: service.detect_language(text), number=repeat) / repeat
+        print(
+            f"{name:<14}{legacy_detect_language(text):>8}{service.detect_language(text):>8}"
+            f"{legacy_time * 1e6:>12.1f}{table_time * 1e6:>12.1f}{legacy_time / table_time:>9.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Replay load test for the Edge TTS worker
+Starts `edgeTTS.py --serve` (or a supervisor with --workers) on the offline fake
+backend, replays a request log through it at each concurrency level in turn,
+each level on a fresh process with a cold audio cache, and reports throughput,
+latency percentiles, and the peak resident memory, open file descriptors and
+ffmpeg processes of the worker's process tree
+
+Usage: python benchmarks/loadTest.py [--log <requests.jsonl>] [--levels <n,n,...>] [--requests <n>]
+                                     [--workers <n>] [--format <format>] [--json-lines]
+                                     [--first-chunk-delay <s>] [--chunk-rate <chunks/s>]
+                                     [--save] [--baseline <path>] [--tolerance <ratio>]
+
+The log is JSON lines with text, language and emotional_context (and
+optionally format), the same fields as a worker request, so captured worker
+traffic replays as is. Without --log a synthetic kiosk mix is used: repeated
+greetings among numbered questions in English, Hindi and Kannada. Clients are
+closed-loop: each sends its next request once the previous one is answered,
+cycling through the log in order.
+
+Each level's results are compared with the baseline; a run fails (exit status 1)
+when throughput drops or p99 latency rises by more than the tolerance, or when
+there is no baseline. Baselines are machine specific, so record one with --save
+first. Process sampling needs
+Linux /proc; elsewhere those columns are left empty.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.normpath(os.path.join(BENCHMARK_DIR, '..', 'services'))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baselines', 'loadTest.json')
+sys.path.insert(0, SERVICES_DIR)
+
+from edgeTTSFrames import read_frame  # noqa: E402
+
+SAMPLE_INTERVAL = 0.02
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Every process loads the fake backend, shaped by sys.argv[1] (configure() keyword
+# arguments as JSON), before edgeTTS
+FAKE_BOOT = (
+    'import asyncio, json, sys; '
+    f'sys.path[:0] = [{BENCHMARK_DIR!r}, {SERVICES_DIR!r}]; '
+    'import fakeEdgeTTS; fakeEdgeTTS.install(); fakeEdgeTTS.configure(**json.loads(sys.argv.pop(1))); '
+)
+WORKER_BOOT = FAKE_BOOT + 'import edgeTTS; asyncio.run(edgeTTS.main())'
+SUPERVISOR_BOOT = FAKE_BOOT + (
+    'from edgeTTS import TTSMetrics; from edgeTTSSupervisor import TTSSupervisor; '
+    'workers, framed, shape = int(sys.argv[1]), sys.argv[2] == "framed", sys.argv[3]; '
+    'command = [sys.executable, "-c", sys.argv[4], shape, "--serve", "--workers", "1"] + (["--framed"] if framed else []); '
+    'asyncio.run(TTSSupervisor(workers, TTSMetrics(), framed=framed, command=command).serve_stdio())'
+)
+
+GREETINGS = (
+    ('Hello! How can I help you today?', 'en', 'greeting'),
+    ('नमस्ते! आज मैं आपकी कैसे मदद कर सकती हूँ?', 'hi', 'greeting'),
+    ('ನಮಸ್ಕಾರ! ಇಂದು ನಾನು ನಿಮಗೆ ಹೇಗೆ ಸಹಾಯ ಮಾಡಲಿ?', 'kn', 'greeting'),
+    ('Please register at the reception desk before visiting the departments.', 'en', 'helpful'),
+)
+QUESTIONS = (
+    ('The CSE department is on the second floor, room {n}.', 'en', 'helpful'),
+    ('Prof. Anitha C S is available in cabin {n} until four in the afternoon.', 'en', 'professional'),
+    ('The library is open until eight in the evening; your token number is {n}.', 'en', 'casual'),
+    ('प्रवेश कार्यालय कमरा {n} में है।', 'hi', 'helpful'),
+    ('ಗ್ರಂಥಾಲಯ ಕೊಠಡಿ {n} ರಲ್ಲಿದೆ.', 'kn', 'helpful'),
+)
+
+
+def synthetic_log(count, seed):
+    """A kiosk-like mix: a third repeated greetings, the rest questions with varying details"""
+    chooser = random.Random(seed)
+    log = []
+    for index in range(count):
+        if chooser.random() < 0.33:
+            text, language, context = chooser.choice(GREETINGS)
+        else:
+            template, language, context = chooser.choice(QUESTIONS)
+            text = template.format(n=chooser.randint(1, count))
+        log.append({'text': text, 'language': language, 'emotional_context': context})
+    return log
+
+
+def load_log(path):
+    log = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry.get('text'):
+                    log.append(entry)
+    if not log:
+        raise ValueError(f'No requests with text in {path}')
+    return log
+
+
+def process_tree(root):
+    """Pids of root and all its descendants, from /proc"""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                # The parent pid follows the parenthesised command name
+                parent = int(f.read().rpartition(')')[2].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(name))
+    pids, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, ()))
+    return pids
+
+
+def is_ffmpeg(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            argv = f.read().split(b'\0')
+    except OSError:
+        return False
+    # An interpreted stand-in runs as `sh /path/to/ffmpeg ...`
+    return any(os.path.basename(arg) == b'ffmpeg' for arg in argv[:2])
+
+
+def sample_tree(root):
+    """(resident bytes, open file descriptors, ffmpeg processes) summed over root's process tree"""
+    rss = fds = ffmpeg = 0
+    for pid in process_tree(root):
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                rss += int(f.read().split()[1]) * PAGE_SIZE
+            fds += len(os.listdir(f'/proc/{pid}/fd'))
+        except (OSError, IndexError, ValueError):
+            continue
+        ffmpeg += is_ffmpeg(pid)
+    return rss, fds, ffmpeg
+
+
+async def watch_tree(root, peaks):
+    """Keep peaks updated with the process tree's largest samples until cancelled"""
+    while True:
+        for name, value in zip(('rss', 'fds', 'ffmpeg'), sample_tree(root)):
+            peaks[name] = max(peaks[name], value)
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+class WorkerClient:
+    """Sends requests to a worker process and matches its replies by id"""
+
+    def __init__(self, process, framed):
+        self.process = process
+        self.framed = framed
+        self.pending = {}
+        self.next_id = 1
+        self.reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        stdout = self.process.stdout
+        while True:
+            if self.framed:
+                try:
+                    response = await read_frame(stdout)
+                except asyncio.IncompleteReadError:
+                    break
+            else:
+                line = await stdout.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+            future = self.pending.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.pending.values():
+            future.set_exception(RuntimeError('Worker exited'))
+
+    async def request(self, payload):
+        request_id = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.process.stdin.write((json.dumps(dict(payload, id=request_id)) + '\n').encode('utf-8'))
+        await self.process.stdin.drain()
+        return await future
+
+    async def close(self):
+        self.process.stdin.close()
+        await self.process.wait()
+        await self.reader
+
+
+async def run_level(args, log, concurrency):
+    """Replay args.requests requests from log with concurrency clients on a fresh worker"""
+    shape = json.dumps({
+        'first_chunk_delay': args.first_chunk_delay, 'first_chunk_jitter': args.jitter,
+        'chunks_per_second': args.chunk_rate, 'seed': args.seed
+    })
+    framed = not args.json_lines
+    if args.workers > 1:
+        command = ['-c', SUPERVISOR_BOOT, shape, str(args.workers), 'framed' if framed else 'lines', shape, WORKER_BOOT]
+    else:
+        command = ['-c', WORKER_BOOT, shape, '--serve', '--workers', '1'] + (['--framed'] if framed else [])
+
+    with tempfile.TemporaryDirectory(prefix='clara-load-') as cache_dir:
+        env = dict(os.environ, EDGE_TTS_CACHE_DIR=cache_dir, EDGE_TTS_OUTPUT_DIR=cache_dir)
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, *command, cwd=SERVICES_DIR, env=env, limit=2 ** 26,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        client = WorkerClient(process, framed)
+        sampling = os.path.isdir('/proc')
+        peaks = {'rss': 0, 'fds': 0, 'ffmpeg': 0}
+        watcher = None
+        try:
+            # Wait until every worker answers, so start-up stays out of the timing
+            for _ in range(args.workers):
+                await client.request({'op': 'metrics', 'format': 'json'})
+            if sampling:
+                watcher = asyncio.ensure_future(watch_tree(process.pid, peaks))
+
+            latencies, errors = [], {}
+            position = iter(range(args.requests))
+
+            async def replay():
+                for index in position:
+                    entry = log[index % len(log)]
+                    payload = {
+                        'text': entry['text'], 'language': entry.get('language'),
+                        'emotional_context': entry.get('emotional_context') or 'casual',
+                        'format': entry.get('format') or args.format,
+                    }
+                    started = time.perf_counter()
+                    response = await client.request(payload)
+                    if response.get('success'):
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        reason = response.get('reason') or response.get('error') or 'error'
+                        errors[reason] = errors.get(reason, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(replay() for _ in range(concurrency)))
+            wall = time.perf_counter() - started
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            await client.close()
+
+    ordered = sorted(latencies) or [0.0]
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        'concurrency': concurrency,
+        'requests': args.requests,
+        'throughput': len(latencies) / wall,
+        'p50': percentile(0.5),
+        'p90': percentile(0.9),
+        'p99': percentile(0.99),
+        'max': ordered[-1],
+        'mean': statistics.fmean(ordered),
+        'errors': errors,
+        'peak_rss': peaks['rss'] if sampling else None,
+        'peak_fds': peaks['fds'] if sampling else None,
+        'peak_ffmpeg': peaks['ffmpeg'] if sampling else None,
+    }
+
+
+def print_level(level):
+    def optional(value, scale=1, width=10, digits=0):
+        return f'{value / scale:>{width}.{digits}f}' if value is not None else f"{'-':>{width}}"
+
+    print(f"{level['concurrency']:>6}{level['throughput']:>10.1f}"
+          f"{level['p50'] * 1e3:>10.1f}{level['p90'] * 1e3:>10.1f}{level['p99'] * 1e3:>10.1f}{level['max'] * 1e3:>10.1f}"
+          f"{optional(level['peak_rss'], 2 ** 20, digits=1)}{optional(level['peak_fds'], width=8)}{optional(level['peak_ffmpeg'], width=8)}"
+          f"{sum(level['errors'].values()):>8}")
+
+
+async def benchmark(args):
+    log = load_log(args.log) if args.log else synthetic_log(args.synthetic, args.seed)
+    levels = [int(value) for value in args.levels.split(',')]
+    print(f"{args.requests} requests per level from {args.log or 'the synthetic mix'} ({len(log)} entries), "
+          f"{args.workers} worker(s), {args.format}, {'JSON lines' if args.json_lines else 'framed'}, "
+          f'{os.cpu_count()} CPUs')
+    print(f"{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"{'RSS MiB':>10}{'fds':>8}{'ffmpeg':>8}{'errors':>8}")
+    results = []
+    for concurrency in levels:
+        level = await run_level(args, log, concurrency)
+        print_level(level)
+        for reason, count in sorted(level['errors'].items()):
+            print(f'{"":>6}  {count} x {reason}')
+        results.append(level)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Levels whose throughput or p99 latency is worse than baseline by more than tolerance"""
+    previous = {level['concurrency']: level for level in baseline}
+    regressions = []
+    for level in results:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        if level['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append((level['concurrency'], 'req/s', before['throughput'], level['throughput']))
+        if level['p99'] > before['p99'] * (1 + tolerance):
+            regressions.append((level['concurrency'], 'p99 ms', before['p99'] * 1e3, level['p99'] * 1e3))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS worker replay load test')
+    parser.add_argument('--log', help='JSON lines request log to replay; a synthetic mix by default')
+    parser.add_argument('--synthetic', type=int, default=500, help='entries in the synthetic log')
+    parser.add_argument('--levels', default='1,4,16,64', help='comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=400, help='requests per level')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes behind a supervisor')
+    parser.add_argument('--format', default='mp3', help='audio format for entries that name none')
+    parser.add_argument('--json-lines', action='store_true', help='JSON line replies instead of binary frames')
+    parser.add_argument('--first-chunk-delay', type=float, default=0.15, help='stand-in time to first chunk in seconds')
+    parser.add_argument('--jitter', type=float, default=0.3, help='stand-in first chunk jitter ratio')
+    parser.add_argument('--chunk-rate', type=float, default=50, help='stand-in chunks per second')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed throughput drop or p99 rise ratio')
+    args = parser.parse_args()
+    if not args.save and not os.path.exists(args.baseline):
+        print(f'❌ No baseline at {args.baseline}; record one with --save', file=sys.stderr)
+        return 1
+    os.environ.setdefault('EDGE_TTS_PHRASE_BANK', os.path.join(BENCHMARK_DIR, 'missing.pack'))
+
+    results = asyncio.run(benchmark(args))
+    report = {
+        'meta': {
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'log': args.log or f'synthetic:{args.synthetic}:{args.seed}', 'requests': args.requests,
+            'workers': args.workers, 'format': args.format, 'framed': not args.json_lines,
+            'first_chunk_delay': args.first_chunk_delay, 'jitter': args.jitter, 'chunk_rate': args.chunk_rate,
+        },
+        'results': results
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}) != report['meta']:
+        print(f'\n⚠️ {args.baseline} was recorded with different settings; comparing anyway')
+    regressions = compare(results, baseline.get('results', []), args.tolerance)
+    if regressions:
+        print(f'\nRegressions over {args.tolerance:.0%} against {args.baseline}:')
+        for concurrency, name, previous, current in regressions:
+            print(f'  concurrency {concurrency} {name}: {previous:.1f} -> {current:.1f}')
+        return 1
+    print(f'\nNo level worse than {args.tolerance:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Warm session pool benchmark for the Edge TTS backend
+Runs the same short utterances against the local stand-in service twice: once
+opening a fresh connection per request (what edge_tts.Communicate does) and
+once over services/edgeTTSSessions.py's warm pool, and reports time to first
+audio, total time and connection counts. Requires aiohttp.
+
+Usage: python benchmarks/sessionPool.py [--requests <n>] [--concurrency <n>] [--pool-size <n>]
+                                        [--streams-per-session <n>] [--handshake-delay <s>]
+                                        [--turns-per-connection <n>]
+
+--turns-per-connection makes the stand-in drop connections after that many
+turns, which exercises the pool's recycling and reconnect fallback.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'services'))
+
+from edgeTTS import TTSMetrics  # noqa: E402
+from edgeTTSSessions import DirectCommunicate, EdgeSessionPool  # noqa: E402
+from fakeEdgeTTSServer import FakeEdgeTTSServer  # noqa: E402
+
+UTTERANCES = (
+    'Hello! How can I help you today?',
+    'The CSE department is on the second floor.',
+    'Please register at the reception desk.',
+    'ನಮಸ್ಕಾರ! ನಾನು ಕ್ಲಾರಾ.',
+)
+VOICES = ('en-IN-NeerjaNeural', 'en-IN-NeerjaNeural', 'en-IN-PrabhatNeural', 'kn-IN-SapnaNeural')
+
+
+async def run_requests(pool, count, concurrency):
+    """Per-request (first chunk, total) seconds and the wall time for count requests"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(index):
+        text, voice = UTTERANCES[index % len(UTTERANCES)], VOICES[index % len(VOICES)]
+        async with semaphore:
+            started = time.perf_counter()
+            first = None
+            audio = 0
+            communicate = pool.communicate(text, voice, lambda: DirectCommunicate(pool, text, voice))
+            async for chunk in communicate.stream():
+                if first is None:
+                    first = time.perf_counter() - started
+                audio += len(chunk['data'])
+            if not audio:
+                raise RuntimeError('No audio received')
+            samples.append((first, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def wait_warm(pool, timeout=30):
+    deadline = time.monotonic() + timeout
+    while sum(session.usable() for session in pool.sessions) < pool.size:
+        if time.monotonic() > deadline:
+            raise RuntimeError('Pool did not warm up')
+        await asyncio.sleep(0.01)
+
+
+async def benchmark(args):
+    server = FakeEdgeTTSServer(handshake_delay=args.handshake_delay, turns_per_connection=args.turns_per_connection)
+    url = await server.start()
+    results = {}
+    try:
+        for mode in ('fresh', 'pooled'):
+            metrics = TTSMetrics()
+            size = args.pool_size if mode == 'pooled' else 0
+            pool = EdgeSessionPool(size=size, streams_per_session=args.streams_per_session, url=url, metrics=metrics)
+            connections = server.stats['connections']
+            if size:
+                pool.start()
+                await wait_warm(pool)
+            try:
+                samples, wall = await run_requests(pool, args.requests, args.concurrency)
+            finally:
+                await pool.close()
+            streams = {dict(labels).get('result'): value for (name, labels), value in metrics.counters.items()
+                       if name == 'pool_streams_total'}
+            results[mode] = {
+                'first_chunk': [first for first, _ in samples],
+                'total': [total for _, total in samples],
+                'wall': wall,
+                'connections': server.stats['connections'] - connections,
+                'streams': streams
+            }
+        max_concurrent = server.stats['max_concurrent_turns']
+    finally:
+        await server.stop()
+
+    print(f'{args.requests} requests, concurrency {args.concurrency}, handshake {args.handshake_delay * 1e3:.0f} ms, '
+          f'pool size {args.pool_size} x {args.streams_per_session} streams')
+    print(f"{'mode':<8}{'first p50 ms':>14}{'first p95 ms':>14}{'total p50 ms':>14}{'req/s':>10}{'connections':>13}  streams")
+    for mode, result in results.items():
+        print(f"{mode:<8}"
+              f"{statistics.median(result['first_chunk']) * 1e3:>14.1f}"
+              f"{percentile(result['first_chunk'], 0.95) * 1e3:>14.1f}"
+              f"{statistics.median(result['total']) * 1e3:>14.1f}"
+              f"{args.requests / result['wall']:>10.1f}"
+              f"{result['connections']:>13}  "
+              + ', '.join(f'{name}={value}' for name, value in sorted(result['streams'].items())))
+    print(f'Most turns in flight at once on the stand-in: {max_concurrent}')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS warm session pool benchmark')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--streams-per-session', type=int, default=1)
+    parser.add_argument('--handshake-delay', type=float, default=0.15, help='stand-in connection set-up cost in seconds')
+    parser.add_argument('--turns-per-connection', type=int, default=0, help='stand-in drops connections after this many turns')
+    args = parser.parse_args()
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for services/edgeTTS.py
+Measures fresh-interpreter start-up on the usage path, the import of edgeTTS
+(via -X importtime) and EdgeTTSService construction, and checks that modules
+meant to load lazily stay out of those paths
+
+Usage: python benchmarks/startupTime.py [--save] [--baseline <path>] [--tolerance <ratio>] [--runs <n>]
+
+Without --save the run fails (exit status 1) when a measurement is slower than
+its baseline by more than the tolerance, when a lazy module is imported
+eagerly, or when there is no baseline. Baselines are machine specific, so
+record one with --save first.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.normpath(os.path.join(BENCHMARK_DIR, '..', 'services'))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baselines', 'startupTime.json')
+
+# Modules that must not be imported until a request actually needs them
+LAZY_MODULES = ('edge_tts',)
+
+# Differences below this many seconds are treated as process start-up noise
+NOISE_FLOOR = 0.003
+
+CONSTRUCT_SCRIPT = (
+    'import json, sys, edgeTTS; edgeTTS.EdgeTTSService(); '
+    'print(json.dumps(sorted(sys.modules)))'
+)
+
+
+def run_python(args, env):
+    """Run a fresh interpreter in the services directory; returns (seconds, stdout, stderr)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable] + args, cwd=SERVICES_DIR, env=env,
+        capture_output=True, text=True, encoding='utf-8'
+    )
+    return time.perf_counter() - started, result.stdout, result.stderr
+
+
+def median_run(args, env, runs):
+    return statistics.median(run_python(args, env)[0] for _ in range(runs))
+
+
+def parse_importtime(stderr):
+    """Map module name to (self, cumulative) seconds from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='edgeTTS.py cold start benchmark')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown ratio per measurement')
+    parser.add_argument('--runs', type=int, default=15, help='interpreter launches per measurement')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    args = parser.parse_args()
+    if not args.save and not os.path.exists(args.baseline):
+        print(f'❌ No baseline at {args.baseline}; record one with --save', file=sys.stderr)
+        return 1
+
+    # Keep the audio cache and phrase bank out of the measurement
+    env = dict(os.environ, EDGE_TTS_CACHE='0', EDGE_TTS_PHRASE_BANK=os.path.join(BENCHMARK_DIR, 'missing.pack'), PYTHONDONTWRITEBYTECODE='1')
+
+    results = {
+        'interpreter': median_run(['-c', 'pass'], env, args.runs),
+        'usage_path': median_run(['edgeTTS.py'], env, args.runs),
+        'import': median_run(['-c', 'import edgeTTS'], env, args.runs),
+        'construct': median_run(['-c', CONSTRUCT_SCRIPT], env, args.runs),
+    }
+
+    _, _, importtime = run_python(['-X', 'importtime', '-c', 'import edgeTTS'], env)
+    modules = parse_importtime(importtime)
+    if 'edgeTTS' in modules:
+        results['import_cumulative'] = modules['edgeTTS'][1]
+
+    _, loaded, errors = run_python(['-c', CONSTRUCT_SCRIPT], env)
+    try:
+        eager = [name for name in LAZY_MODULES if name in json.loads(loaded)]
+    except ValueError:
+        print(f'Could not construct EdgeTTSService:\n{errors}')
+        return 1
+
+    print(f"{'measurement':<20}{'ms':>10}")
+    for name, seconds in results.items():
+        print(f'{name:<20}{seconds * 1e3:>10.1f}')
+    print('\nSlowest imports (self time) under import edgeTTS:')
+    for name, (self_time, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {name:<40}{self_time * 1e3:>8.1f} ms self {cumulative * 1e3:>8.1f} ms cumulative')
+
+    failed = False
+    if eager:
+        print(f'\n❌ Imported eagerly at start-up: {", ".join(eager)}')
+        failed = True
+
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'runs': args.runs},
+        'results': results
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return 1 if failed else 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f).get('results', {})
+    regressions = [
+        (name, baseline[name], current) for name, current in results.items()
+        if name in baseline and current > baseline[name] * (1 + args.tolerance) and current - baseline[name] > NOISE_FLOOR
+    ]
+    if regressions:
+        print(f'\nRegressions over {args.tolerance:.0%} against {args.baseline}:')
+        for name, previous, current in regressions:
+            print(f'  {name}: {previous * 1e3:.1f} ms -> {current * 1e3:.1f} ms')
+        failed = True
+    elif not failed:
+        print(f'\nNo measurement slower than {args.tolerance:.0%} over {args.baseline}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Multi-process supervisor throughput benchmark
+Pushes the same batch of CPU-heavy requests (long texts, cache off, base64
+output) through services/edgeTTSSupervisor.py with different worker counts,
+every worker running on the offline fake backend, and reports requests per
+second and the speed-up over one worker
+
+Usage: python benchmarks/supervisor.py [--workers <n,n,...>] [--requests <n>] [--concurrency <n>] [--framed]
+
+Gains flatten out at the number of cores; os.cpu_count() is printed for reference.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.normpath(os.path.join(BENCHMARK_DIR, '..', 'services'))
+sys.path.insert(0, SERVICES_DIR)
+
+from edgeTTS import TTSMetrics  # noqa: E402
+from edgeTTSSupervisor import TTSSupervisor  # noqa: E402
+
+# Each worker installs the fake backend before loading edgeTTS, then serves as usual
+WORKER_BOOT = (
+    'import asyncio, sys; '
+    f'sys.path[:0] = [{BENCHMARK_DIR!r}, {SERVICES_DIR!r}]; '
+    'import fakeEdgeTTS; fakeEdgeTTS.install(); '
+    'import edgeTTS; asyncio.run(edgeTTS.main())'
+)
+
+TEXT = (
+    'The CSE department is on the second floor, next to the AICTE approved ECE labs. '
+    'Prof. Anitha C S teaches Data Structures on Monday and Wednesday mornings. '
+) * 3
+
+
+async def run_batch(workers, count, concurrency, framed):
+    """Seconds to answer count distinct requests through a supervisor with workers processes"""
+    supervisor = TTSSupervisor(
+        workers, TTSMetrics(), framed=framed,
+        command=[sys.executable, '-c', WORKER_BOOT, '--serve', '--workers', '1']
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def emit(response):
+        if not response.get('success'):
+            failures.append(response.get('error'))
+
+    async def one(index):
+        # Numbered texts keep identical requests from being coalesced
+        line = json.dumps({'id': index, 'text': f'{TEXT} Request {index}.', 'language': 'en', 'format': 'mp3-low'})
+        async with semaphore:
+            await supervisor.handle_line(line, emit)
+
+    await supervisor.start()
+    try:
+        # One request per worker first, so start-up and first imports stay out of the timing
+        await asyncio.gather(*(one(-index - 1) for index in range(workers * 2)))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(count)))
+        wall = time.perf_counter() - started
+    finally:
+        await supervisor.drain()
+    if failures:
+        raise RuntimeError(f'{len(failures)} requests failed, first: {failures[0]}')
+    return wall
+
+
+async def benchmark(args):
+    counts = [int(value) for value in args.workers.split(',')]
+    print(f'{args.requests} requests, concurrency {args.concurrency}, '
+          f"{'framed' if args.framed else 'JSON lines'}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'req/s':>10}{'speed-up':>10}")
+    baseline = None
+    for workers in counts:
+        wall = await run_batch(workers, args.requests, args.concurrency, args.framed)
+        throughput = args.requests / wall
+        baseline = baseline or throughput
+        print(f'{workers:>8}{throughput:>10.1f}{throughput / baseline:>9.2f}x')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS multi-process supervisor benchmark')
+    parser.add_argument('--workers', default='1,2,4', help='comma separated worker counts to compare')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--framed', action='store_true', help='use binary frames between supervisor and workers')
+    args = parser.parse_args()
+    os.environ.setdefault('EDGE_TTS_CACHE', '0')
+    os.environ.setdefault('EDGE_TTS_PHRASE_BANK', os.path.join(BENCHMARK_DIR, 'missing.pack'))
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
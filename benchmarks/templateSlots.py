@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Template slot synthesis benchmark
+Speaks one template with different slot values through
+EdgeTTSService.template_to_speech and compares each sentence with
+synthesizing the slot value alone and the whole sentence with text_to_speech.
+Runs over the session pool against the local stand-in service, which serves
+PCM natively. Requires aiohttp.
+
+Usage: python benchmarks/templateSlots.py [--rounds <n>] [--first-chunk-delay <s>] [--chunk-rate <chunks/s>]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import statistics
+import struct
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'services'))
+
+# Every request must reach the backend
+os.environ['EDGE_TTS_CACHE'] = '0'
+os.environ['EDGE_TTS_PHRASE_BANK'] = os.path.join(BENCHMARK_DIR, 'missing.pack')
+
+import fakeEdgeTTS  # noqa: E402
+
+fakeEdgeTTS.install()
+
+from edgeTTS import EdgeTTSService  # noqa: E402
+from edgeTTSSessions import EdgeSessionPool  # noqa: E402
+from fakeEdgeTTSServer import FakeEdgeTTSServer  # noqa: E402
+
+TEMPLATE = 'Professor {name} is available in room {room} at the main block.'
+NAMES = ('Anitha', 'Lakshmi', 'Ravi', 'Dhivya', 'Suresh', 'Meena')
+ROOMS = ('A12', 'B7', 'C3', 'D14', 'E2', 'F9')
+PCM_FORMAT = 'raw-24khz-16bit-mono-pcm'
+
+
+async def timed(call):
+    started = time.perf_counter()
+    result = await call
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return time.perf_counter() - started
+
+
+async def benchmark(args):
+    # A tone rather than silence, so splicing has speech to keep
+    fakeEdgeTTS._canned_audio['pcm'] = b''.join(
+        struct.pack('<h', int(8000 * math.sin(index / 10))) for index in range(24000)
+    )
+    server = FakeEdgeTTSServer(handshake_delay=0.05, first_chunk_delay=args.first_chunk_delay, chunks_per_second=args.chunk_rate)
+    url = await server.start()
+    service = EdgeTTSService()
+    service.session_pool = EdgeSessionPool(size=4, url=url, metrics=service.metrics, formats=(PCM_FORMAT,))
+    service.session_pool.start()
+    samples = {'template': [], 'slot alone': [], 'whole sentence': []}
+    try:
+        # Renders the fixed fragments once and warms the pool
+        await timed(service.template_to_speech(TEMPLATE, {'name': 'Kiran', 'room': 'G1'}, language='en', encoding='raw', audio_format='pcm'))
+        for index in range(args.rounds):
+            name, room = NAMES[index % len(NAMES)], f'{ROOMS[index % len(ROOMS)]}{index}'
+            samples['template'].append(await timed(service.template_to_speech(
+                TEMPLATE, {'name': name, 'room': room}, language='en', encoding='raw', audio_format='pcm'
+            )))
+            samples['slot alone'].append(await timed(service.text_to_speech(
+                f'{room} {index}', language='en', encoding='raw', audio_format='pcm'
+            )))
+            samples['whole sentence'].append(await timed(service.text_to_speech(
+                TEMPLATE.format(name=name, room=f'{room}.{index}'), language='en', encoding='raw', audio_format='pcm'
+            )))
+    finally:
+        await service.session_pool.close()
+        await server.stop()
+
+    print(f'{args.rounds} sentences, first chunk {args.first_chunk_delay * 1e3:.0f} ms, {args.chunk_rate:g} chunks/s')
+    print(f"{'request':<16}{'p50 ms':>10}{'max ms':>10}")
+    for name, values in samples.items():
+        print(f'{name:<16}{statistics.median(values) * 1e3:>10.1f}{max(values) * 1e3:>10.1f}')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Edge TTS template slot synthesis benchmark')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--first-chunk-delay', type=float, default=0.15, help='stand-in time to first chunk in seconds')
+    parser.add_argument('--chunk-rate', type=float, default=50, help='stand-in chunks per second')
+    args = parser.parse_args()
+    return asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
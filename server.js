@@ -30,6 +30,10 @@ const { routeVoice } = require('./services/voices');
 
 // Import Edge TTS service
 const { spawn, exec } = require('child_process');
+const EdgeTTSWorker = require('./services/edgeTTSWorker');
+const edgeTTSWorker = new EdgeTTSWorker();
+// Audio formats services/edgeTTS.py can deliver (see AUDIO_FORMATS there)
+const EDGE_TTS_FORMATS = ['mp3', 'mp3-low', 'opus', 'pcm'];
 
 // Import Gemini AI
 const { queryGemini } = require('./geminiApi');
@@ -3456,7 +3460,7 @@ app.get('/api/qr/test', (req, res) => {
 // Edge TTS API endpoint
 app.post('/api/tts/speak', async (req, res) => {
   try {
-    const { text, language, voice, rate = '+0%', pitch = '+0Hz', emotionalContext } = req.body;
+    const { text, language, voice, rate = '+0%', pitch = '+0Hz', emotionalContext, timings, format } = req.body;
     
     if (!text || typeof text !== 'string' || text.trim().length === 0) {
       return res.status(400).json({
@@ -3473,6 +3477,31 @@ app.post('/api/tts/speak', async (req, res) => {
       });
     }
 
+    // Delivered audio format; MP3 unless the client can play something cheaper to produce
+    if (format !== undefined && !EDGE_TTS_FORMATS.includes(format)) {
+      return res.status(400).json({
+        success: false,
+        error: `Unsupported format. Use one of: ${EDGE_TTS_FORMATS.join(', ')}`
+      });
+    }
+
+    // Prefer the persistent Edge TTS worker; fall back to a one-shot process if it fails
+    try {
+      // Kiosk replies are interactive and go ahead of any bulk rendering queued on the worker
+      const result = await edgeTTSWorker.speak({ text, language, voice, emotionalContext, timings, format, priority: 'interactive' });
+      if (result.success) {
+        // Framed worker replies carry raw audio; the browser API still expects base64
+        if (Buffer.isBuffer(result.audio)) {
+          result.audio = result.audio.toString('base64');
+        }
+        return res.json(result);
+      }
+      // The worker's circuit breaker refused without trying Edge TTS: answer at once so the browser falls back
+      return res.status(result.fallback ? 503 : 500).json(result);
+    } catch (workerError) {
+      console.error('Edge TTS worker error, falling back to one-shot process:', workerError.message);
+    }
+
         // Use temporary file approach for better Unicode handling
         const fs = require('fs');
         const path = require('path');
@@ -3486,7 +3515,8 @@ app.post('/api/tts/speak', async (req, res) => {
           fs.writeFileSync(tempFile, '\uFEFF' + text, 'utf8');
           
           // Call Python script with file path and emotional context
-          const command = `python "${__dirname}/services/edgeTTS.py" "${tempFile}" "${language || ''}" "${voice || ''}" "${emotionalContext || 'casual'}"`;
+          const formatArgs = format ? `--format ${format} ` : '';
+          const command = `python "${__dirname}/services/edgeTTS.py" ${formatArgs}"${tempFile}" "${language || ''}" "${voice || ''}" "${emotionalContext || 'casual'}"`;
           
           exec(command, { encoding: 'utf8' }, (error, stdout, stderr) => {
             // Clean up temporary file
@@ -3823,6 +3853,27 @@ app.get('/api/sarvam-tts/usage', (req, res) => {
   }
 });
 
+// Edge TTS worker metrics (Prometheus text by default, ?format=json for JSON)
+app.get('/api/tts/metrics', async (req, res) => {
+  try {
+    const format = req.query.format === 'json' ? 'json' : 'prometheus';
+    const result = await edgeTTSWorker.metrics(format);
+    if (!result.success) {
+      return res.status(500).json(result);
+    }
+    if (format === 'json') {
+      return res.json({ success: true, metrics: result.metrics });
+    }
+    res.type('text/plain; version=0.0.4').send(result.metrics);
+  } catch (error) {
+    console.error('❌ TTS metrics error:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Failed to get TTS metrics'
+    });
+  }
+});
+
 // Get available voices endpoint
 app.get('/api/tts/voices', (req, res) => {
   try {
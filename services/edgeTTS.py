@@ -8,363 +8,1436 @@ import asyncio
 import sys
 import json
 import os
-import edge_tts  # pyright: ignore[reportMissingImports]
-import io
-import base64
+import bisect
+import hashlib
 import re
-import json
-import subprocess
-import tempfile
+import mmap
+import struct
+import time
+from collections import deque
+from types import MappingProxyType
+
+from edgeTTSCircuit import BackendUnavailable, CircuitBreaker
+from edgeTTSFrames import pack_frame
+from edgeTTSProfiler import RequestProfiler
+from edgeTTSScheduler import AdmissionRejected, TTSScheduler
+from edgeTTSSettings import env_flag, env_fraction, env_limit
+
+# edge_tts, tempfile, base64 and shutil are imported where they are
+# used, so the usage path, cache hits and phrase bank hits never load them
 
 # Fix Windows console encoding issues
 if sys.platform == 'win32':
+    sys.stdin.reconfigure(encoding='utf-8')
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-class EdgeTTSService:
+_ffmpeg_available = None
+
+def _edge_tts():
+    """The edge_tts module, imported on the first synthesis rather than at startup"""
+    import edge_tts  # pyright: ignore[reportMissingImports]
+    return edge_tts
+
+def ffmpeg_available():
+    """Probe for ffmpeg once per process instead of on every conversion"""
+    global _ffmpeg_available
+    if _ffmpeg_available is None:
+        import shutil
+        _ffmpeg_available = shutil.which('ffmpeg') is not None
+        if not _ffmpeg_available:
+            sys.stderr.write('⚠️ ffmpeg not found: opus and pcm requests that need converting get Edge TTS MP3 instead\n')
+    return _ffmpeg_available
+
+class AudioCache:
+    """Content-addressed on-disk audio cache with size-bounded LRU eviction
+
+    Entries are keyed by a hash of the normalized text, voice, prosody and output
+    format. Writes go to a temp file that is renamed into place, so several
+    processes can share one cache directory. Recency is tracked through file
+    mtimes, which every hit refreshes.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from EDGE_TTS_CACHE* variables, or None when disabled"""
+        if not env_flag('EDGE_TTS_CACHE', True):
+            return None
+        import tempfile
+        directory = os.environ.get('EDGE_TTS_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'clara-tts-cache')
+        return cls(directory, env_limit('EDGE_TTS_CACHE_MAX_BYTES', cls.DEFAULT_MAX_BYTES))
+
+    @staticmethod
+    def make_key(text, voice, params, output_format, segment_language=None):
+        """Hash everything that affects the rendered audio
+
+        segment_language is set when mixed-script runs get per-language voices.
+        """
+        payload = json.dumps(
+            [text, voice, params.get('rate'), params.get('pitch'), params.get('volume'), output_format, segment_language],
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.audio')
+
+    def get(self, key):
+        """Return cached audio bytes, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Atomically store audio bytes and evict old entries if over budget"""
+        import tempfile
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            sys.stderr.write(f'⚠️ Audio cache write failed: {str(e)}\n')
+            return
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        """List (mtime, size, path) for every entry, clearing abandoned temp files"""
+        entries = []
+        now = time.time()
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                files = list(os.scandir(shard.path))
+            except OSError:
+                continue
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith('.audio'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif entry.name.endswith('.tmp') and now - stat.st_mtime > self.STALE_TEMP_SECONDS:
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
+        return entries
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is under 90% of its budget"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Already evicted by another process sharing the directory
+                continue
+            total -= size
+        self._size = total
+
+
+class PhraseBank:
+    """Read-only pack of prerendered audio, memory-mapped at startup
+
+    Layout: a fixed header (magic, version, slot count, entry count), an
+    open-addressing hash index of fixed-size slots (SHA-256 digest of the
+    AudioCache key, data offset, data length), then the audio itself. A lookup
+    is one hash probe and returns a view into the mapping, so nothing is copied
+    and every worker process maps the same pages from the OS cache.
+    """
+
+    MAGIC = b'CLTTSPK1'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIII4x')
+    SLOT = struct.Struct('<32sQI4x')
+    EMPTY_DIGEST = bytes(32)
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.HEADER.size:
+                raise ValueError(f'{path} is not a phrase bank pack')
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slot_count, self.entry_count = self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC or version != self.VERSION or not self.slot_count:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a phrase bank pack')
+        # Every slot and the audio it points at must lie inside the file
+        index_end = self.HEADER.size + self.slot_count * self.SLOT.size
+        size = len(self._mmap)
+        if index_end > size or any(
+            offset + length > size
+            for _, offset, length in self.SLOT.iter_unpack(self._mmap[self.HEADER.size:index_end])
+        ):
+            self._mmap.close()
+            raise ValueError(f'{path} is truncated')
+        self._view = memoryview(self._mmap)
+
+    @staticmethod
+    def default_path():
+        return os.environ.get('EDGE_TTS_PHRASE_BANK') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phraseBank.pack')
+
+    @classmethod
+    def from_env(cls):
+        """Map the pack named by EDGE_TTS_PHRASE_BANK (or the default), or None if absent"""
+        path = cls.default_path()
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f'⚠️ Phrase bank not loaded: {str(e)}\n')
+            return None
+
+    @classmethod
+    def _home_slot(cls, digest, slot_count):
+        return int.from_bytes(digest[:8], 'little') % slot_count
+
+    def get(self, key):
+        """Return a zero-copy view of the prerendered audio for key, or None"""
+        digest = bytes.fromhex(key)
+        slot = self._home_slot(digest, self.slot_count)
+        for _ in range(self.slot_count):
+            slot_digest, offset, length = self.SLOT.unpack_from(self._mmap, self.HEADER.size + slot * self.SLOT.size)
+            if slot_digest == digest:
+                return self._view[offset:offset + length]
+            if slot_digest == self.EMPTY_DIGEST:
+                return None
+            slot = (slot + 1) % self.slot_count
+        return None
+
+    @classmethod
+    def write(cls, path, entries):
+        """Atomically write a pack from a {key: audio bytes} mapping"""
+        entries = {key: audio for key, audio in entries.items() if audio}
+        # Keep the index at most half full so probes stay short
+        slot_count = 8
+        while slot_count < 2 * len(entries):
+            slot_count *= 2
+
+        slots = [None] * slot_count
+        offset = cls.HEADER.size + slot_count * cls.SLOT.size
+        for key, audio in entries.items():
+            digest = bytes.fromhex(key)
+            slot = cls._home_slot(digest, slot_count)
+            while slots[slot] is not None:
+                slot = (slot + 1) % slot_count
+            slots[slot] = (digest, offset, len(audio))
+            offset += len(audio)
+
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, slot_count, len(entries)))
+                for slot in slots:
+                    f.write(cls.SLOT.pack(*(slot or (cls.EMPTY_DIGEST, 0, 0))))
+                for audio in entries.values():
+                    f.write(audio)
+            # mkstemp creates 0600; the pack is meant to be read by other workers
+            os.chmod(temp_path, 0o644)
+            # Replacing the file leaves processes that mapped the old pack untouched
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return len(entries)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+
+class TTSMetrics:
+    """Process-wide counters and latency histograms for the TTS pipeline
+
+    Every request feeds its per-stage timings in here, so a long-running worker
+    can export them as Prometheus text or JSON. Everything runs on the worker's
+    event loop, so no locking is needed.
+    """
+
+    # Histogram bucket upper bounds, in seconds
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    # Result timing fields and the stage label each one is exported under
+    STAGES = (
+        ('normalize_ms', 'normalize'),
+        ('detect_ms', 'detect'),
+        ('first_chunk_ms', 'first_chunk'),
+        ('synthesis_ms', 'synthesis'),
+        ('transcode_ms', 'transcode'),
+        ('encode_ms', 'encode'),
+        ('total_ms', 'total'),
+    )
+    BYTE_FIELDS = ('input_bytes', 'audio_bytes', 'output_bytes')
+    PREFIX = 'clara_tts_'
+
     def __init__(self):
-        self.voice_mapping = {
-            # English voices (enhanced premium voices for Clara)
-            'en': 'en-US-AvaNeural',  # Upgraded to premium voice
-            'en-US': 'en-US-AvaNeural',  # Premium, natural, clear
-            'en-GB': 'en-GB-SoniaNeural',  # British accent, professional
-            'en-AU': 'en-AU-NatashaNeural',  # Australian accent
-            'en-CA': 'en-CA-ClaraNeural',  # Perfect match for Clara name
-            'en-IN': 'en-IN-NeerjaNeural',  # Indian English, optimized
-            
-            # Spanish voices
-            'es': 'es-ES-ElviraNeural',
-            'es-ES': 'es-ES-ElviraNeural',
-            'es-MX': 'es-MX-DaliaNeural',
-            'es-AR': 'es-AR-ElenaNeural',
-            
-            # French voices
-            'fr': 'fr-FR-DeniseNeural',
-            'fr-FR': 'fr-FR-DeniseNeural',
-            'fr-CA': 'fr-CA-SylvieNeural',
-            
-            # German voices
-            'de': 'de-DE-KatjaNeural',
-            'de-DE': 'de-DE-KatjaNeural',
-            
-            # Italian voices
-            'it': 'it-IT-ElsaNeural',
-            'it-IT': 'it-IT-ElsaNeural',
-            
-            # Portuguese voices
-            'pt': 'pt-BR-FranciscaNeural',
-            'pt-BR': 'pt-BR-FranciscaNeural',
-            'pt-PT': 'pt-PT-RaquelNeural',
-            
-            # Indian Languages (Priority 1 - highest accuracy priority)
-            'kn': 'kn-IN-SapnaNeural',  # Kannada - optimized for clarity and fluency
-            'kn-IN': 'kn-IN-SapnaNeural',
-            'hi': 'hi-IN-SwaraNeural',  # Hindi - optimized for natural pronunciation
-            'hi-IN': 'hi-IN-SwaraNeural',
-            'te': 'te-IN-ShrutiNeural',  # Telugu - optimized for regional accents
-            'te-IN': 'te-IN-ShrutiNeural',
-            'ta': 'ta-IN-PallaviNeural',  # Tamil - optimized for clarity
-            'ta-IN': 'ta-IN-PallaviNeural',
-            'ml': 'ml-IN-SobhanaNeural',  # Malayalam - optimized for fluency
-            'ml-IN': 'ml-IN-SobhanaNeural',
-            'mr': 'mr-IN-AarohiNeural',  # Marathi - optimized for natural tone
-            'mr-IN': 'mr-IN-AarohiNeural',
-            
-            # Japanese voices
-            'ja': 'ja-JP-NanamiNeural',
-            'ja-JP': 'ja-JP-NanamiNeural',
-            
-            # Chinese voices
-            'zh': 'zh-CN-XiaoxiaoNeural',
-            'zh-CN': 'zh-CN-XiaoxiaoNeural',
-            'zh-TW': 'zh-TW-HsiaoyuNeural',
-            
-            # Korean voices
-            'ko': 'ko-KR-SunHiNeural',
-            'ko-KR': 'ko-KR-SunHiNeural',
-            
-            # Arabic voices
-            'ar': 'ar-SA-ZariyahNeural',
-            'ar-SA': 'ar-SA-ZariyahNeural',
-            
-            # Russian voices
-            'ru': 'ru-RU-SvetlanaNeural',
-            'ru-RU': 'ru-RU-SvetlanaNeural',
-            
-            # Dutch voices
-            'nl': 'nl-NL-ColetteNeural',
-            'nl-NL': 'nl-NL-ColetteNeural',
-            
-            # Swedish voices
-            'sv': 'sv-SE-SofieNeural',
-            'sv-SE': 'sv-SE-SofieNeural',
-            
-            # Norwegian voices
-            'no': 'nb-NO-IselinNeural',
-            'nb-NO': 'nb-NO-IselinNeural',
-            
-            # Danish voices
-            'da': 'da-DK-ChristelNeural',
-            'da-DK': 'da-DK-ChristelNeural',
-            
-            # Finnish voices
-            'fi': 'fi-FI-NooraNeural',
-            'fi-FI': 'fi-FI-NooraNeural',
-            
-            # Polish voices
-            'pl': 'pl-PL-AgnieszkaNeural',
-            'pl-PL': 'pl-PL-AgnieszkaNeural',
-            
-            # Czech voices
-            'cs': 'cs-CZ-VlastaNeural',
-            'cs-CZ': 'cs-CZ-VlastaNeural',
-            
-            # Hungarian voices
-            'hu': 'hu-HU-NoemiNeural',
-            'hu-HU': 'hu-HU-NoemiNeural',
-            
-            # Romanian voices
-            'ro': 'ro-RO-AlinaNeural',
-            'ro-RO': 'ro-RO-AlinaNeural',
-            
-            # Bulgarian voices
-            'bg': 'bg-BG-KalinaNeural',
-            'bg-BG': 'bg-BG-KalinaNeural',
-            
-            # Croatian voices
-            'hr': 'hr-HR-GabrijelaNeural',
-            'hr-HR': 'hr-HR-GabrijelaNeural',
-            
-            # Slovak voices
-            'sk': 'sk-SK-ViktoriaNeural',
-            'sk-SK': 'sk-SK-ViktoriaNeural',
-            
-            # Slovenian voices
-            'sl': 'sl-SI-PetraNeural',
-            'sl-SI': 'sl-SI-PetraNeural',
-            
-            # Estonian voices
-            'et': 'et-EE-AnuNeural',
-            'et-EE': 'et-EE-AnuNeural',
-            
-            # Latvian voices
-            'lv': 'lv-LV-EveritaNeural',
-            'lv-LV': 'lv-LV-EveritaNeural',
-            
-            # Lithuanian voices
-            'lt': 'lt-LT-OnaNeural',
-            'lt-LT': 'lt-LT-OnaNeural',
-            
-            # Greek voices
-            'el': 'el-GR-AthinaNeural',
-            'el-GR': 'el-GR-AthinaNeural',
-            
-            # Turkish voices
-            'tr': 'tr-TR-EmelNeural',
-            'tr-TR': 'tr-TR-EmelNeural',
-            
-            # Hebrew voices
-            'he': 'he-IL-HilaNeural',
-            'he-IL': 'he-IL-HilaNeural',
-            
-            # Thai voices
-            'th': 'th-TH-PremwadeeNeural',
-            'th-TH': 'th-TH-PremwadeeNeural',
-            
-            # Vietnamese voices
-            'vi': 'vi-VN-HoaiMyNeural',
-            'vi-VN': 'vi-VN-HoaiMyNeural',
-            
-            # Indonesian voices
-            'id': 'id-ID-GadisNeural',
-            'id-ID': 'id-ID-GadisNeural',
-            
-            # Malay voices
-            'ms': 'ms-MY-YasminNeural',
-            'ms-MY': 'ms-MY-YasminNeural',
-            
-            # Filipino voices
-            'fil': 'fil-PH-BlessicaNeural',
-            'fil-PH': 'fil-PH-BlessicaNeural',
-            
-            # Ukrainian voices
-            'uk': 'uk-UA-PolinaNeural',
-            'uk-UA': 'uk-UA-PolinaNeural',
-        }
-        
-        # Professional speech parameters for clear, consistent communication
-        self.speech_parameters = {
-            # English - slower, human-like pacing
-            'en':   {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'en-US':{'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'en-GB':{'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'en-IN':{'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
-
-            # International Languages - slower, natural pacing
-            'es': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'fr': {'rate': '-9%', 'pitch': '-2Hz', 'volume': '+0%'},
-            'de': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'it': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'pt': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'ja': {'rate': '-6%', 'pitch': '+0Hz', 'volume': '+0%'},
-            'zh': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'ko': {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'ar': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'ru': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'}
-        }
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
 
-        # Professional emotional tone parameters for clear, consistent communication
-        self.emotional_parameters = {
-            'greeting':    {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'casual':      {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'professional':{'rate': '-4%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'helpful':     {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
-            'excited':     {'rate': '-3%', 'pitch': '+0Hz', 'volume': '+0%'},
-            'calm':        {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'}
+    def set_gauge(self, name, value, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def add_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = {'buckets': [0] * len(self.LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        index = bisect.bisect_left(self.LATENCY_BUCKETS, seconds)
+        if index < len(self.LATENCY_BUCKETS):
+            histogram['buckets'][index] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+    def record_request(self, kind, timings, success, cache_hit=False):
+        """Fold one finished request's timings into the counters and histograms"""
+        self.inc('requests_total', kind=kind, outcome='success' if success else 'error',
+                 cache='hit' if cache_hit else 'miss')
+        for field, stage in self.STAGES:
+            if field in timings:
+                self.observe('stage_seconds', timings[field] / 1000, kind=kind, stage=stage)
+        for field in self.BYTE_FIELDS:
+            if field in timings:
+                self.inc(field + '_total', timings[field], kind=kind)
+
+    def to_json(self):
+        def labelled(key):
+            name, labels = key
+            return {'name': self.PREFIX + name, 'labels': dict(labels)}
+
+        return {
+            'counters': [dict(labelled(key), value=value) for key, value in sorted(self.counters.items())],
+            'gauges': [dict(labelled(key), value=value) for key, value in sorted(self.gauges.items())],
+            'histograms': [
+                dict(labelled(key), buckets=dict(zip(self.LATENCY_BUCKETS, histogram['buckets'])),
+                     sum=histogram['sum'], count=histogram['count'])
+                for key, histogram in sorted(self.histograms.items())
+            ]
         }
-        
-        # Enhanced pronunciation patterns for Indian names and technical terms
-        # Load shared server lexicon (for simple English acronyms and local spell-outs)
-        self.server_lexicon = self._load_server_lexicon()
-
-        self.pronunciation_enhancements = {
-            # Staff names and technical terms enhancement
-            'staff_names': {
-                'patterns': [
-                    (r'\bProf\.?\s+Anitha\s+C\.?\s*S\.?\b', 'Professor Anitha C S'),
-                    (r'\bDr\.?\s+G\s+Dhivyasri\b', 'Doctor G Dhivyasri'),
-                    (r'\bProf\.?\s+Lakshmi\s+Durga\s*N\.?\b', 'Professor Lakshmi Durga N'),
-                    (r'\bProf\.?\s+Bhavya\s+T\.?\s*N\.?\b', 'Professor Bhavya T N'),
-                    (r'\bProf\.?\s+Nisha\s+S\.?\s*K\.?\b', 'Professor Nisha S K'),
-                    (r'\bComputer\s+Science\b', 'Computer Science Engineering'),
-                    (r'\bData\s+Structures\b', 'Data Structures and Algorithms'),
-                    (r'\bSoftware\s+Engineering\b', 'Software Engineering and Project Management'),
-                ]
-            },
-            'en': {
-                'patterns': []
-            },
-            'kn': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Long vowel enhancement for Kannada
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                    (r'\b(\w+)ii\b', r'\1ī'),
-                    (r'\b(\w+)uu\b', r'\1ū'),
-                ]
-            },
-            'hi': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Devanagari vowel enhancement
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                    (r'\b(\w+)ii\b', r'\1ī'),
-                    (r'\b(\w+)uu\b', r'\1ū'),
-                ]
-            },
-            'te': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Telugu vowel enhancement
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                ]
-            },
-            'ta': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Tamil vowel enhancement
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                ]
-            },
-            'ml': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Malayalam vowel enhancement
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                ]
-            },
-            'mr': {
-                'patterns': [
-                    (r'\b(\w+)aa\b', r'\1ā'),  # Marathi vowel enhancement
-                    (r'\b(\w+)ee\b', r'\1ī'),
-                    (r'\b(\w+)oo\b', r'\1ū'),
-                ]
+
+    def merge(self, snapshot, **labels):
+        """Add another process's to_json() snapshot, with labels added to every series"""
+        def key(entry):
+            name = entry['name']
+            if name.startswith(self.PREFIX):
+                name = name[len(self.PREFIX):]
+            return (name, tuple(sorted(dict(entry['labels'], **labels).items())))
+
+        for entry in snapshot.get('counters', ()):
+            self.inc(key(entry)[0], entry['value'], **dict(key(entry)[1]))
+        for entry in snapshot.get('gauges', ()):
+            self.gauges[key(entry)] = entry['value']
+        for entry in snapshot.get('histograms', ()):
+            histogram = self.histograms.setdefault(
+                key(entry), {'buckets': [0] * len(self.LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            )
+            for index, count in enumerate(list(entry['buckets'].values())[:len(self.LATENCY_BUCKETS)]):
+                histogram['buckets'][index] += count
+            histogram['sum'] += entry['sum']
+            histogram['count'] += entry['count']
+
+    def to_prometheus(self):
+        """Render everything in the Prometheus text exposition format"""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+            return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+        lines = []
+        for kind, metrics in (('counter', self.counters), ('gauge', self.gauges)):
+            declared = set()
+            for (name, labels), value in sorted(metrics.items()):
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f'# TYPE {self.PREFIX}{name} {kind}')
+                lines.append(f'{self.PREFIX}{name}{label_text(labels)} {value}')
+
+        declared = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {self.PREFIX}{name} histogram')
+            cumulative = 0
+            for bound, count in zip(self.LATENCY_BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(f'{self.PREFIX}{name}_bucket{label_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.PREFIX}{name}_bucket{label_text(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{self.PREFIX}{name}_sum{label_text(labels)} {histogram["sum"]}')
+            lines.append(f'{self.PREFIX}{name}_count{label_text(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _elapsed_ms(started, finished):
+    """Milliseconds between two perf_counter readings, rounded for JSON output"""
+    return round((finished - started) * 1000, 3)
+
+
+# Language detection table. Rules are listed in priority order: when a text
+# contains characters from several rules, the earliest rule wins. The middle
+# column names the script, used to split mixed-script text into runs.
+_SCRIPT_RULES = (
+    ('ru', 'cyrillic', ((0x0400, 0x052F),)),
+    ('ja', 'cjk', ((0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F))),  # Kana
+    ('zh-TW', 'cjk', '繁體中文'),                                          # Traditional markers
+    ('zh-CN', 'cjk', ((0x3400, 0x4DBF), (0x4E00, 0x9FFF))),               # CJK ideographs
+    ('ko', 'hangul', ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF))),
+    ('ar', 'arabic', ((0x0600, 0x06FF), (0x0750, 0x077F))),
+    ('el', 'greek', ((0x0370, 0x03FF), (0x1F00, 0x1FFF))),
+    ('he', 'hebrew', ((0x0590, 0x05FF),)),
+    ('th', 'thai', ((0x0E00, 0x0E7F),)),
+    ('kn', 'kannada', ((0x0C80, 0x0CFF),)),
+    ('ta', 'tamil', ((0x0B80, 0x0BFF),)),
+    ('te', 'telugu', ((0x0C00, 0x0C7F),)),
+    ('ml', 'malayalam', ((0x0D00, 0x0D7F),)),
+    ('hi', 'devanagari', ((0x0900, 0x097F),)),
+    ('es', 'latin', 'àáâãäåæçèéêëìíîïðñòóôõöøùúûüýþÿ'),  # Default to Spanish for accented characters
+    ('de', 'latin', 'äöüß'),
+    ('it', 'latin', 'àèéìíîòóù'),
+    ('pt', 'latin', 'àáâãçéêíóôõú'),
+    ('fr', 'latin', 'àâäéèêëïîôöùûüÿç'),
+    ('pl', 'latin', 'ąćęłńóśźż'),
+    ('cs', 'latin', 'áčďéěíňóřšťúůýž'),
+    ('hu', 'latin', 'áéíóöőúüű'),
+    ('ro', 'latin', 'ăâîșț'),
+    ('hr', 'latin', 'čćđšž'),
+    ('sk', 'latin', 'áäčďéíĺľňóôŕšťúýž'),
+    ('sl', 'latin', 'čšž'),
+    ('et', 'latin', 'äõöü'),
+    ('lv', 'latin', 'āčēģīķļņšūž'),
+    ('lt', 'latin', 'ąčęėįšųūž'),
+    ('tr', 'latin', 'çğıöşü'),
+    ('vi', 'latin', 'àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ'),
+)
+
+# Indian languages whose replies read embedded English with an Indian English voice
+_INDIC_LANGUAGES = frozenset(('kn', 'hi', 'te', 'ta', 'ml', 'mr'))
+
+# Script each language is written in, by primary subtag; anything not listed is Latin
+_LANGUAGE_SCRIPTS = dict(
+    {language.split('-')[0]: script for language, script, _ in reversed(_SCRIPT_RULES) if script != 'latin'},
+    mr='devanagari', ne='devanagari', bg='cyrillic', uk='cyrillic', sr='cyrillic', mk='cyrillic',
+    fa='arabic', ur='arabic'
+)
+
+def _language_script(language):
+    return _LANGUAGE_SCRIPTS.get(language.split('-')[0].lower(), 'latin')
+
+def _build_language_tables():
+    """Flatten _SCRIPT_RULES into a per-character rank map and a sorted range table"""
+    languages = tuple(language for language, _, _ in _SCRIPT_RULES)
+    scripts = tuple(script for _, script, _ in _SCRIPT_RULES)
+    char_ranks = {}
+    ranges = []
+    for rank, (_, _, spec) in enumerate(_SCRIPT_RULES):
+        if isinstance(spec, str):
+            for ch in spec:
+                # Accent rules are case-insensitive; ASCII never identifies a language
+                for variant in {ch, ch.lower(), ch.upper()}:
+                    if len(variant) == 1 and not variant.isascii():
+                        char_ranks.setdefault(variant, rank)
+        else:
+            ranges.extend((start, end, rank) for start, end in spec)
+    ranges.sort()
+    return languages, scripts, char_ranks, tuple(ranges), tuple(start for start, _, _ in ranges)
+
+_LANGUAGES, _SCRIPTS, _CHAR_RANKS, _SCRIPT_RANGES, _SCRIPT_RANGE_STARTS = _build_language_tables()
+_RANKED_PATTERNS = {}
+
+def _language_rank(ch):
+    """Rank of the first rule matching ch, or len(_LANGUAGES) when none does"""
+    rank = _CHAR_RANKS.get(ch)
+    if rank is not None:
+        return rank
+    codepoint = ord(ch)
+    index = bisect.bisect_right(_SCRIPT_RANGE_STARTS, codepoint) - 1
+    if index >= 0 and codepoint <= _SCRIPT_RANGES[index][1]:
+        return _SCRIPT_RANGES[index][2]
+    return len(_LANGUAGES)
+
+def _script_of(ch):
+    """Script name for a letter, or None for characters outside the table"""
+    if ch.isascii():
+        return 'latin'
+    rank = _language_rank(ch)
+    return _SCRIPTS[rank] if rank < len(_SCRIPTS) else None
+
+def _ranked_pattern(rank):
+    """Character class matching every character ranked better than rank"""
+    pattern = _RANKED_PATTERNS.get(rank)
+    if pattern is None:
+        members = [re.escape(ch) for ch, ch_rank in _CHAR_RANKS.items() if ch_rank < rank]
+        members.extend(
+            f'\\U{start:08x}-\\U{end:08x}' for start, end, range_rank in _SCRIPT_RANGES if range_rank < rank
+        )
+        pattern = re.compile('[' + ''.join(members) + ']')
+        _RANKED_PATTERNS[rank] = pattern
+    return pattern
+
+# Sentence and clause boundaries used to split long texts; CJK punctuation
+# is not followed by a space, so those breaks are zero-width
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?।॥])\s+|(?<=[。！？])')
+_CLAUSE_BREAK = re.compile(r'(?<=[,;:،])\s+|(?<=[、，；])')
+_ABBREVIATION_END = re.compile(r'(?:\b(?:Dr|Prof|Mr|Mrs|Ms|St|No|vs|etc|e\.g|i\.e)|\b[A-Z])\.$')
+
+_WORD_CHAR = re.compile(r'\w')
+
+def _is_word_char(ch):
+    return _WORD_CHAR.match(ch) is not None
+
+def _placements_compatible(placements, implied=None):
+    """Whether strings placed at offsets can all match within one text
+
+    placements is a list of (offset, string, anchored); anchored strings must
+    have a regex word boundary at both ends. implied fixes the word/non-word
+    class of positions that are not covered by any placed string.
+    """
+    chars = {}
+    for offset, string, _ in placements:
+        for index, ch in enumerate(string):
+            if chars.setdefault(offset + index, ch) != ch:
+                return False
+    wordness = dict(implied or {})
+    for position, ch in chars.items():
+        if wordness.setdefault(position, _is_word_char(ch)) != _is_word_char(ch):
+            return False
+    for offset, string, anchored in placements:
+        if not anchored:
+            continue
+        for edge in (offset, offset + len(string)):
+            before = wordness.get(edge - 1)
+            after = wordness.get(edge)
+            if before is not None and before == after:
+                return False
+    return True
+
+def _trie_pattern(tokens):
+    """Build a regex alternation that shares common prefixes between tokens"""
+    trie = {}
+    for token in tokens:
+        node = trie
+        for ch in token:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if '' in node:
+            # Greedy optional group tries the longer token before the shorter one
+            return '(?:' + '|'.join(branches) + ')?'
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+
+class LexiconRewriter:
+    """Single-pass rewrite engine for one language's merged server lexicon
+
+    All tokens are compiled into one trie-shaped alternation, so a rewrite is a
+    single scan whatever the lexicon size. Output matches applying
+    re.sub(rf"\\b{token}\\b", replacement) once per entry in order. Entries that
+    could interact under that sequential reading (overlapping tokens, or a
+    replacement that a later token could match into) are marked risky; a text in
+    which one of them matches is rewritten entry by entry instead.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+        self.pattern = None
+        self.risky = set()
+        self.edge_changing = False
+        self.sequential = None
+        if not self.mapping:
+            return
+        for token, replacement in self.mapping.items():
+            # re.sub would expand templates in the replacement; keep those sequential
+            if not token or not isinstance(replacement, str) or not replacement or '\\' in replacement:
+                return
+
+        self.pattern = re.compile(r'\b(?:' + _trie_pattern(self.mapping) + r')\b')
+        self.risky = self._find_risky_tokens()
+        # A replacement that flips the word class of its first or last character
+        # changes the \b check for a token touching it on that side
+        self.edge_changing = any(
+            _is_word_char(token[0]) != _is_word_char(replacement[0])
+            or _is_word_char(token[-1]) != _is_word_char(replacement[-1])
+            for token, replacement in self.mapping.items()
+        )
+
+    def _find_risky_tokens(self):
+        tokens = list(self.mapping)
+        by_first_char = {}
+        by_char = {}
+        for order, token in enumerate(tokens):
+            by_first_char.setdefault(token[0], []).append((order, token))
+            for index, ch in enumerate(token):
+                if index:
+                    by_char.setdefault(ch, []).append((order, token, index))
+
+        risky = set()
+        for order, token in enumerate(tokens):
+            # Two different tokens whose matches could overlap in the same text
+            for offset, ch in enumerate(token):
+                for _, other in by_first_char.get(ch, ()):
+                    overlap = min(len(token) - offset, len(other))
+                    if other == token or token[offset:offset + overlap] != other[:overlap]:
+                        continue
+                    if _placements_compatible([(0, token, True), (offset, other, True)]):
+                        risky.update((token, other))
+
+            # A later token matching into (or across the edge of) this replacement
+            replacement = self.mapping[token]
+            implied = {
+                -1: not _is_word_char(token[0]),
+                len(replacement): not _is_word_char(token[-1])
             }
-        }
+            candidates = []
+            for offset, ch in enumerate(replacement):
+                for later, other in by_first_char.get(ch, ()):
+                    overlap = min(len(replacement) - offset, len(other))
+                    if later > order and replacement[offset:offset + overlap] == other[:overlap]:
+                        candidates.append((other, offset))
+            for later, other, index in by_char.get(replacement[0], ()):
+                overlap = min(len(other) - index, len(replacement))
+                if later > order and other[index:index + overlap] == replacement[:overlap]:
+                    candidates.append((other, -index))
+            for other, offset in candidates:
+                if _placements_compatible([(0, replacement, False), (offset, other, True)], implied):
+                    # Only a match of this token can set up the chain
+                    risky.add(token)
+        return risky
+
+    def rewrite(self, text):
+        """Apply every lexicon entry to text"""
+        if self.pattern is None:
+            return self._rewrite_sequential(text)
+
+        pieces = []
+        position = 0
+        for match in self.pattern.finditer(text):
+            token = match.group(0)
+            if token in self.risky or (self.edge_changing and pieces and match.start() == position):
+                return self._rewrite_sequential(text)
+            pieces.append(text[position:match.start()])
+            pieces.append(self.mapping[token])
+            position = match.end()
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+    def _rewrite_sequential(self, text):
+        if self.sequential is None:
+            self.sequential = [
+                (re.compile(rf"\b{re.escape(token)}\b"), replacement)
+                for token, replacement in self.mapping.items()
+            ]
+        for pattern, replacement in self.sequential:
+            try:
+                text = pattern.sub(replacement, text)
+            except Exception:
+                # A malformed entry stops the rewrite, keeping what was applied so far
+                break
+        return text
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Static voice, prosody and pronunciation tables, built once per process and
+# shared read-only by every EdgeTTSService
+VOICE_MAPPING = _freeze({
+    # English voices (enhanced premium voices for Clara)
+    'en': 'en-US-AvaNeural',  # Upgraded to premium voice
+    'en-US': 'en-US-AvaNeural',  # Premium, natural, clear
+    'en-GB': 'en-GB-SoniaNeural',  # British accent, professional
+    'en-AU': 'en-AU-NatashaNeural',  # Australian accent
+    'en-CA': 'en-CA-ClaraNeural',  # Perfect match for Clara name
+    'en-IN': 'en-IN-NeerjaNeural',  # Indian English, optimized
+    
+    # Spanish voices
+    'es': 'es-ES-ElviraNeural',
+    'es-ES': 'es-ES-ElviraNeural',
+    'es-MX': 'es-MX-DaliaNeural',
+    'es-AR': 'es-AR-ElenaNeural',
+    
+    # French voices
+    'fr': 'fr-FR-DeniseNeural',
+    'fr-FR': 'fr-FR-DeniseNeural',
+    'fr-CA': 'fr-CA-SylvieNeural',
+    
+    # German voices
+    'de': 'de-DE-KatjaNeural',
+    'de-DE': 'de-DE-KatjaNeural',
+    
+    # Italian voices
+    'it': 'it-IT-ElsaNeural',
+    'it-IT': 'it-IT-ElsaNeural',
+    
+    # Portuguese voices
+    'pt': 'pt-BR-FranciscaNeural',
+    'pt-BR': 'pt-BR-FranciscaNeural',
+    'pt-PT': 'pt-PT-RaquelNeural',
+    
+    # Indian Languages (Priority 1 - highest accuracy priority)
+    'kn': 'kn-IN-SapnaNeural',  # Kannada - optimized for clarity and fluency
+    'kn-IN': 'kn-IN-SapnaNeural',
+    'hi': 'hi-IN-SwaraNeural',  # Hindi - optimized for natural pronunciation
+    'hi-IN': 'hi-IN-SwaraNeural',
+    'te': 'te-IN-ShrutiNeural',  # Telugu - optimized for regional accents
+    'te-IN': 'te-IN-ShrutiNeural',
+    'ta': 'ta-IN-PallaviNeural',  # Tamil - optimized for clarity
+    'ta-IN': 'ta-IN-PallaviNeural',
+    'ml': 'ml-IN-SobhanaNeural',  # Malayalam - optimized for fluency
+    'ml-IN': 'ml-IN-SobhanaNeural',
+    'mr': 'mr-IN-AarohiNeural',  # Marathi - optimized for natural tone
+    'mr-IN': 'mr-IN-AarohiNeural',
+    
+    # Japanese voices
+    'ja': 'ja-JP-NanamiNeural',
+    'ja-JP': 'ja-JP-NanamiNeural',
+    
+    # Chinese voices
+    'zh': 'zh-CN-XiaoxiaoNeural',
+    'zh-CN': 'zh-CN-XiaoxiaoNeural',
+    'zh-TW': 'zh-TW-HsiaoyuNeural',
+    
+    # Korean voices
+    'ko': 'ko-KR-SunHiNeural',
+    'ko-KR': 'ko-KR-SunHiNeural',
+    
+    # Arabic voices
+    'ar': 'ar-SA-ZariyahNeural',
+    'ar-SA': 'ar-SA-ZariyahNeural',
+    
+    # Russian voices
+    'ru': 'ru-RU-SvetlanaNeural',
+    'ru-RU': 'ru-RU-SvetlanaNeural',
+    
+    # Dutch voices
+    'nl': 'nl-NL-ColetteNeural',
+    'nl-NL': 'nl-NL-ColetteNeural',
+    
+    # Swedish voices
+    'sv': 'sv-SE-SofieNeural',
+    'sv-SE': 'sv-SE-SofieNeural',
+    
+    # Norwegian voices
+    'no': 'nb-NO-IselinNeural',
+    'nb-NO': 'nb-NO-IselinNeural',
+    
+    # Danish voices
+    'da': 'da-DK-ChristelNeural',
+    'da-DK': 'da-DK-ChristelNeural',
+    
+    # Finnish voices
+    'fi': 'fi-FI-NooraNeural',
+    'fi-FI': 'fi-FI-NooraNeural',
+    
+    # Polish voices
+    'pl': 'pl-PL-AgnieszkaNeural',
+    'pl-PL': 'pl-PL-AgnieszkaNeural',
+    
+    # Czech voices
+    'cs': 'cs-CZ-VlastaNeural',
+    'cs-CZ': 'cs-CZ-VlastaNeural',
+    
+    # Hungarian voices
+    'hu': 'hu-HU-NoemiNeural',
+    'hu-HU': 'hu-HU-NoemiNeural',
+    
+    # Romanian voices
+    'ro': 'ro-RO-AlinaNeural',
+    'ro-RO': 'ro-RO-AlinaNeural',
+    
+    # Bulgarian voices
+    'bg': 'bg-BG-KalinaNeural',
+    'bg-BG': 'bg-BG-KalinaNeural',
+    
+    # Croatian voices
+    'hr': 'hr-HR-GabrijelaNeural',
+    'hr-HR': 'hr-HR-GabrijelaNeural',
+    
+    # Slovak voices
+    'sk': 'sk-SK-ViktoriaNeural',
+    'sk-SK': 'sk-SK-ViktoriaNeural',
+    
+    # Slovenian voices
+    'sl': 'sl-SI-PetraNeural',
+    'sl-SI': 'sl-SI-PetraNeural',
+    
+    # Estonian voices
+    'et': 'et-EE-AnuNeural',
+    'et-EE': 'et-EE-AnuNeural',
+    
+    # Latvian voices
+    'lv': 'lv-LV-EveritaNeural',
+    'lv-LV': 'lv-LV-EveritaNeural',
+    
+    # Lithuanian voices
+    'lt': 'lt-LT-OnaNeural',
+    'lt-LT': 'lt-LT-OnaNeural',
+    
+    # Greek voices
+    'el': 'el-GR-AthinaNeural',
+    'el-GR': 'el-GR-AthinaNeural',
+    
+    # Turkish voices
+    'tr': 'tr-TR-EmelNeural',
+    'tr-TR': 'tr-TR-EmelNeural',
+    
+    # Hebrew voices
+    'he': 'he-IL-HilaNeural',
+    'he-IL': 'he-IL-HilaNeural',
+    
+    # Thai voices
+    'th': 'th-TH-PremwadeeNeural',
+    'th-TH': 'th-TH-PremwadeeNeural',
+    
+    # Vietnamese voices
+    'vi': 'vi-VN-HoaiMyNeural',
+    'vi-VN': 'vi-VN-HoaiMyNeural',
+    
+    # Indonesian voices
+    'id': 'id-ID-GadisNeural',
+    'id-ID': 'id-ID-GadisNeural',
+    
+    # Malay voices
+    'ms': 'ms-MY-YasminNeural',
+    'ms-MY': 'ms-MY-YasminNeural',
+    
+    # Filipino voices
+    'fil': 'fil-PH-BlessicaNeural',
+    'fil-PH': 'fil-PH-BlessicaNeural',
+    
+    # Ukrainian voices
+    'uk': 'uk-UA-PolinaNeural',
+    'uk-UA': 'uk-UA-PolinaNeural',
+})
+
+# Professional speech parameters for clear, consistent communication
+SPEECH_PARAMETERS = _freeze({
+    # English - slower, human-like pacing
+    'en':   {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'en-US':{'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'en-GB':{'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'en-IN':{'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
+
+    # International Languages - slower, natural pacing
+    'es': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'fr': {'rate': '-9%', 'pitch': '-2Hz', 'volume': '+0%'},
+    'de': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'it': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'pt': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'ja': {'rate': '-6%', 'pitch': '+0Hz', 'volume': '+0%'},
+    'zh': {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'ko': {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'ar': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'ru': {'rate': '-7%', 'pitch': '-1Hz', 'volume': '+0%'}
+})
+
+# Professional emotional tone parameters for clear, consistent communication
+EMOTIONAL_PARAMETERS = _freeze({
+    'greeting':    {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'casual':      {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'professional':{'rate': '-4%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'helpful':     {'rate': '-6%', 'pitch': '-1Hz', 'volume': '+0%'},
+    'excited':     {'rate': '-3%', 'pitch': '+0Hz', 'volume': '+0%'},
+    'calm':        {'rate': '-8%', 'pitch': '-1Hz', 'volume': '+0%'}
+})
+
+# Fixed utterances rendered into the phrase bank by --build-pack
+GREETING_PHRASES = _freeze({
+    'en': "Hello! I'm Clara, your receptionist at Sai Vidya Institute of Technology. How can I help you today?",
+    'hi': 'नमस्ते! मैं क्लारा हूँ, साई विद्या इंस्टीट्यूट ऑफ टेक्नोलॉजी की रिसेप्शनिस्ट। आज मैं आपकी कैसे मदद कर सकती हूँ?',
+    'kn': 'ನಮಸ್ಕಾರ! ನಾನು ಕ್ಲಾರಾ, ಸಾಯಿ ವಿದ್ಯಾ ಇನ್ಸ್ಟಿಟ್ಯೂಟ್ ಆಫ್ ಟೆಕ್ನಾಲಜಿಯ ರಿಸೆಪ್ಷನಿಸ್ಟ್. ಇಂದು ನಾನು ನಿಮಗೆ ಹೇಗೆ ಸಹಾಯ ಮಾಡಲಿ?'
+})
+# Mirrors the department names in config/college.js
+DEPARTMENT_NAMES = (
+    'Computer Science & Engineering',
+    'CSE (Data Science)',
+    'CSE (AI & ML)',
+    'Mechanical Engineering',
+    'Civil Engineering',
+    'Electronics & Communication Engineering',
+    'Information Science & Engineering'
+)
+# Mirrors the staff names in staff-profiles.js
+STAFF_NAMES = (
+    'Prof. Lakshmi Durga N',
+    'Prof. Anitha C S',
+    'Dr. G Dhivyasri',
+    'Prof. Nisha S K',
+    'Prof. Amarnath B Patil',
+    'Dr. Nagashree N',
+    'Prof. Anil Kumar K V',
+    'Prof. Jyoti Kumari',
+    'Prof. Vidyashree R',
+    'Dr. Bhavana A',
+    'Prof. Bhavya T N'
+)
+# None stands for requests that leave the language to detection
+PHRASE_BANK_LANGUAGES = (None, 'en', 'en-IN', 'kn', 'hi', 'te', 'ta', 'ml', 'mr')
+
+# Enhanced pronunciation patterns for Indian names and technical terms
+PRONUNCIATION_ENHANCEMENTS = _freeze({
+    # Staff names and technical terms enhancement
+    'staff_names': {
+        'patterns': [
+            (r'\bProf\.?\s+Anitha\s+C\.?\s*S\.?\b', 'Professor Anitha C S'),
+            (r'\bDr\.?\s+G\s+Dhivyasri\b', 'Doctor G Dhivyasri'),
+            (r'\bProf\.?\s+Lakshmi\s+Durga\s*N\.?\b', 'Professor Lakshmi Durga N'),
+            (r'\bProf\.?\s+Bhavya\s+T\.?\s*N\.?\b', 'Professor Bhavya T N'),
+            (r'\bProf\.?\s+Nisha\s+S\.?\s*K\.?\b', 'Professor Nisha S K'),
+            # Terms already spelled out in full are left alone
+            (r'\bComputer\s+Science\b(?!\s+(?:(?:&|and)\s+)?Engineering\b)', 'Computer Science Engineering'),
+            (r'\bData\s+Structures\b(?!\s+(?:&|and)\s+Algorithms\b)', 'Data Structures and Algorithms'),
+            (r'\bSoftware\s+Engineering\b(?!\s+(?:&|and)\s+Project\s+Management\b)', 'Software Engineering and Project Management'),
+        ]
+    },
+    'en': {
+        'patterns': []
+    },
+    'kn': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Long vowel enhancement for Kannada
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+            (r'\b(\w+)ii\b', r'\1ī'),
+            (r'\b(\w+)uu\b', r'\1ū'),
+        ]
+    },
+    'hi': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Devanagari vowel enhancement
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+            (r'\b(\w+)ii\b', r'\1ī'),
+            (r'\b(\w+)uu\b', r'\1ū'),
+        ]
+    },
+    'te': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Telugu vowel enhancement
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+        ]
+    },
+    'ta': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Tamil vowel enhancement
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+        ]
+    },
+    'ml': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Malayalam vowel enhancement
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+        ]
+    },
+    'mr': {
+        'patterns': [
+            (r'\b(\w+)aa\b', r'\1ā'),  # Marathi vowel enhancement
+            (r'\b(\w+)ee\b', r'\1ī'),
+            (r'\b(\w+)oo\b', r'\1ū'),
+        ]
+    }
+})
+
+# Audio formats text_to_speech can deliver. encoder: ffmpeg output arguments;
+# edge_format: the Edge TTS outputFormat that already needs no transcoding,
+# asked for directly over the session pool; accepts: formats (as named by
+# sniff_audio_format) that pass through unchanged
+AUDIO_FORMATS = _freeze({
+    # iOS Safari only plays MP3; any MP3 from the backend already plays there
+    'mp3': {
+        'mime_type': 'audio/mpeg',
+        'extension': '.mp3',
+        'encoder': ['-codec:a', 'libmp3lame', '-b:a', '128k', '-ar', '24000', '-ac', '1', '-f', 'mp3'],
+        'edge_format': 'audio-24khz-48kbitrate-mono-mp3',
+        'accepts': ['mp3', 'mp3-low']
+    },
+    'mp3-low': {
+        'mime_type': 'audio/mpeg',
+        'extension': '.mp3',
+        'encoder': ['-codec:a', 'libmp3lame', '-b:a', '48k', '-ar', '24000', '-ac', '1', '-f', 'mp3'],
+        'edge_format': 'audio-24khz-48kbitrate-mono-mp3',
+        'accepts': ['mp3-low']
+    },
+    'opus': {
+        'mime_type': 'audio/ogg; codecs=opus',
+        'extension': '.ogg',
+        'encoder': ['-codec:a', 'libopus', '-b:a', '24k', '-ar', '24000', '-ac', '1', '-f', 'ogg'],
+        'edge_format': 'ogg-24khz-16bit-mono-opus',
+        'accepts': ['opus']
+    },
+    # 16-bit little-endian samples, 24 kHz mono, no header
+    'pcm': {
+        'mime_type': 'audio/L16; rate=24000; channels=1',
+        'extension': '.pcm',
+        'encoder': ['-f', 's16le', '-ar', '24000', '-ac', '1'],
+        'edge_format': 'raw-24khz-16bit-mono-pcm',
+        'accepts': ['pcm']
+    }
+})
+DEFAULT_AUDIO_FORMAT = 'mp3'
+
+# What each Edge TTS outputFormat above is, in AUDIO_FORMATS terms
+EDGE_OUTPUT_FORMATS = MappingProxyType({
+    'audio-24khz-48kbitrate-mono-mp3': 'mp3-low',
+    'ogg-24khz-16bit-mono-opus': 'opus',
+    'raw-24khz-16bit-mono-pcm': 'pcm',
+})
+
+# Layer III bitrates in kbps by header bitrate index, for MPEG-1 and for MPEG-2/2.5
+MP3_BITRATES = (
+    (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+)
+LOW_MP3_KBPS = 48
+
+def sniff_audio_format(data):
+    """Name the AUDIO_FORMATS entry audio already is from its first bytes, or None
+
+    Raw PCM has no signature, so it is never recognised here.
+    """
+    data = bytes(data[:4096])
+    if data.startswith(b'OggS'):
+        return 'opus'
+    offset = 0
+    if data.startswith(b'ID3') and len(data) >= 10:
+        # Skip the ID3v2 tag: syncsafe size, plus a footer when flagged
+        size = (data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f)
+        offset = 10 + size + (10 if data[5] & 0x10 else 0)
+    if len(data) < offset + 3 or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        # A tag with its first frame beyond the sniffed bytes is still MP3
+        return 'mp3' if offset else None
+    version, layer = (data[offset + 1] >> 3) & 3, (data[offset + 1] >> 1) & 3
+    bitrate_index = data[offset + 2] >> 4
+    if layer != 1 or bitrate_index == 15:
+        return None
+    kbps = MP3_BITRATES[0 if version == 3 else 1][bitrate_index]
+    return 'mp3-low' if 0 < kbps <= LOW_MP3_KBPS else 'mp3'
+
+def delivered_format_name(audio_format):
+    """What results call audio that no request format was asked of
+
+    Streams and unconverted fallbacks name their audio as text_to_speech names
+    the same bytes passed through for the default format, so MP3 of any
+    bitrate is 'mp3'; other formats keep the name sniff_audio_format gives them.
+    """
+    if audio_format in AUDIO_FORMATS[DEFAULT_AUDIO_FORMAT]['accepts']:
+        return DEFAULT_AUDIO_FORMAT
+    return audio_format
+
+# Ogg pages carry a CRC-32 with polynomial 0x04c11db7, not reflected
+_OGG_CRC_TABLE = []
+for _index in range(256):
+    _crc = _index << 24
+    for _ in range(8):
+        _crc = (_crc << 1) ^ 0x04c11db7 if _crc & 0x80000000 else _crc << 1
+    _OGG_CRC_TABLE.append(_crc & 0xffffffff)
+del _index, _crc
+
+def _ogg_crc(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xffffffff) ^ _OGG_CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+def _ogg_pages(data):
+    """(flags, granule, serial, lacing values, body) for each page of an Ogg stream"""
+    offset = 0
+    while offset < len(data):
+        if data[offset:offset + 4] != b'OggS' or len(data) < offset + 27:
+            raise ValueError('not an Ogg page')
+        flags, granule, serial = struct.unpack_from('<xBqI', data, offset + 4)
+        count = data[offset + 26]
+        lacing = data[offset + 27:offset + 27 + count]
+        start = offset + 27 + count
+        end = start + sum(lacing)
+        if len(lacing) < count or end > len(data):
+            raise ValueError('truncated Ogg page')
+        yield flags, granule, serial, lacing, data[start:end]
+        offset = end
+
+def _opus_packet_samples(packet):
+    """Samples at 48 kHz in an Opus packet, from its TOC byte (RFC 6716 section 3.1)"""
+    config, code = packet[0] >> 3, packet[0] & 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:
+        frame = (480, 960)[config % 2]
+    else:
+        frame = (120, 240, 480, 960)[config % 4]
+    frames = 1 if code == 0 else 2 if code < 3 else (packet[1] & 0x3f if len(packet) > 1 else 0)
+    return frame * frames
+
+def join_ogg_opus(data):
+    """Remux chained Ogg Opus (one logical stream after another) into one stream
+
+    Each synthesis piece is its own Ogg stream, and some players stop at the
+    end of the first link. Later links lose their header pages and continue the
+    first one's serial number, page sequence and granule positions; their
+    pre-skip samples (a few ms of encoder warm-up) are played rather than
+    dropped. Audio that is a single stream, or not Ogg Opus throughout, is
+    returned unchanged.
+    """
+    try:
+        pages = list(_ogg_pages(data))
+    except ValueError:
+        return data
+    if sum(1 for page in pages if page[0] & 0x02) < 2:
+        return data
+
+    links = []
+    for page in pages:
+        if page[0] & 0x02:
+            # OpusHead: version, channel count, pre-skip, rate, gain, mapping family
+            if not page[4].startswith(b'OpusHead') or len(page[4]) < 19:
+                return data
+            links.append({'head': page[4], 'pages': []})
+        links[-1]['pages'].append(page)
+    head = links[0]['head']
+    if any(link['head'][9] != head[9] or link['head'][18] != head[18] for link in links):
+        return data
+
+    output = []
+    serial = pages[0][2]
+    # Granule positions count every decoded sample, pre-skip included
+    total = 0
+    for number, link in enumerate(links):
+        last_link = number == len(links) - 1
+        samples = 0
+        # The OpusHead page, then OpusTags up to the page that completes it
+        header_pages = 1
+        while header_pages < len(link['pages']) and link['pages'][header_pages][3][-1:] == b'\xff':
+            header_pages += 1
+        header_pages = min(header_pages + 1, len(link['pages']))
+        packet_start = b''
+        for index, (flags, granule, _, lacing, body) in enumerate(link['pages']):
+            if index < header_pages:
+                if number:
+                    continue
+                new_granule = granule
+            else:
+                completed = 0
+                position = 0
+                for size in lacing:
+                    if len(packet_start) < 2:
+                        packet_start += body[position:position + min(size, 2 - len(packet_start))]
+                    position += size
+                    if size < 255:
+                        if packet_start:
+                            samples += _opus_packet_samples(packet_start)
+                            total += _opus_packet_samples(packet_start)
+                        packet_start = b''
+                        completed += 1
+                new_granule = total if completed else -1
+                if last_link and granule >= 0 and index == len(link['pages']) - 1:
+                    # Keep the end trimming of the final link
+                    new_granule -= max(0, samples - granule)
+            flags &= 0x01
+            if not output:
+                flags |= 0x02
+            if last_link and index == len(link['pages']) - 1:
+                flags |= 0x04
+            header = struct.pack('<4sBBqIII', b'OggS', 0, flags, new_granule, serial, len(output), 0)
+            page = bytearray(header + bytes([len(lacing)]) + lacing + body)
+            struct.pack_into('<I', page, 22, _ogg_crc(page))
+            output.append(bytes(page))
+    return b''.join(output)
+
+def ffmpeg_command(audio_format, input_format=None):
+    """ffmpeg pipeline from Edge TTS audio on stdin to audio_format on stdout
+
+    MP3 and Ogg input is probed; raw PCM (input_format 'pcm') has no header, so
+    its layout is spelled out.
+    """
+    source = AUDIO_FORMATS['pcm']['encoder'] if input_format == 'pcm' else []
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', *source, '-i', 'pipe:0',
+            *AUDIO_FORMATS[audio_format]['encoder'], 'pipe:1']
+
+# Sample rate of every AUDIO_FORMATS entry; PCM is 16-bit mono at this rate
+PCM_SAMPLE_RATE = 24000
+# Samples quieter than this (of 32767) count as silence when splicing
+SPLICE_SILENCE_LEVEL = 300
+
+def _pcm_samples(data):
+    from array import array
+    samples = array('h')
+    samples.frombytes(bytes(data[:len(data) - len(data) % 2]))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+def _speech_bounds(samples, window=240):
+    """(start, end) of samples once leading and trailing silence is left out"""
+    def loud(start):
+        block = samples[start:start + window]
+        return max(block) > SPLICE_SILENCE_LEVEL or min(block) < -SPLICE_SILENCE_LEVEL
+
+    start = 0
+    while start < len(samples) and not loud(start):
+        start += window
+    end = len(samples)
+    while end > start and not loud(max(start, end - window)):
+        end -= window
+    return start, max(start, end)
+
+def splice_pcm(pieces, crossfade_ms=10, pause_ms=40):
+    """Join 16-bit mono PCM pieces into one utterance
+
+    Silence at each joint is cut down to pause_ms on either side, and
+    consecutive pieces overlap by crossfade_ms with a linear crossfade so the
+    joints don't click. The first piece's lead-in and the last piece's tail
+    are kept as synthesized.
+    """
+    from array import array
+    crossfade = PCM_SAMPLE_RATE * crossfade_ms // 1000
+    pause = PCM_SAMPLE_RATE * pause_ms // 1000
+    output = array('h')
+    pieces = [_pcm_samples(piece) for piece in pieces]
+    for index, samples in enumerate(pieces):
+        start, end = _speech_bounds(samples)
+        if start == end:
+            continue
+        first, last = not output, index == len(pieces) - 1
+        samples = samples[0 if first else max(0, start - pause):len(samples) if last else min(len(samples), end + pause)]
+        overlap = min(crossfade, len(output), len(samples))
+        for offset in range(overlap):
+            weight = (offset + 1) / (overlap + 1)
+            position = len(output) - overlap + offset
+            output[position] = int(output[position] * (1 - weight) + samples[offset] * weight)
+        output.extend(samples[overlap:])
+    if sys.byteorder == 'big':
+        output.byteswap()
+    return output.tobytes()
+
+_enhancement_rules = None
+
+def _compiled_enhancement_rules():
+    """PRONUNCIATION_ENHANCEMENTS compiled on first use; applied in order, as before"""
+    global _enhancement_rules
+    if _enhancement_rules is None:
+        _enhancement_rules = MappingProxyType({
+            key: tuple((re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in group['patterns'])
+            for key, group in PRONUNCIATION_ENHANCEMENTS.items()
+        })
+    return _enhancement_rules
+
+
+# Parsed lexicons and their compiled rewriters per pronunciations.json path, shared
+# by every service in the process and rebuilt only when the file's mtime or size changes
+_LEXICON_CACHE = {}
+
+def _lexicon_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _load_lexicon(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            return data.get('serverLexicon', {})
+    except Exception:
+        return {}
+
+
+class EdgeTTSService:
+    # Frame size used when replaying cached audio through stream_speech
+    STREAM_FRAME_BYTES = 16 * 1024
+    # Upper bound for ffmpeg to finish once all audio has been fed in
+    TRANSCODE_TIMEOUT = 10
+    # Texts longer than CHUNK_MIN_CHARS are split into pieces of up to CHUNK_CHARS
+    # and synthesized with at most SYNTHESIS_CONCURRENCY Edge TTS streams at once
+    CHUNK_MIN_CHARS = 300
+    CHUNK_CHARS = 400
+    SYNTHESIS_CONCURRENCY = 4
+    # Process-wide caps on open Edge TTS streams and running ffmpeg processes,
+    # overridable with EDGE_TTS_SYNTHESIS_LIMIT and EDGE_TTS_TRANSCODE_LIMIT
+    SYNTHESIS_LIMIT = 16
+    TRANSCODE_LIMIT = os.cpu_count() or 2
+    # Memory for the PCM of fixed template fragments; least recently used go first
+    FRAGMENT_CACHE_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, session_pool=None):
+        self.voice_mapping = VOICE_MAPPING
+        self.speech_parameters = SPEECH_PARAMETERS
+        self.emotional_parameters = EMOTIONAL_PARAMETERS
+
+        # Shared server lexicon (for simple English acronyms and local spell-outs), loaded on first use
+        base_dir = os.path.dirname(__file__)
+        self.lexicon_path = os.path.normpath(os.path.join(base_dir, '..', 'public', 'config', 'pronunciations.json'))
+
+        # Persistent audio cache shared by every process on this host
+        self.audio_cache = AudioCache.from_env()
+
+        # Prerendered high-frequency phrases, mapped read-only and shared between workers
+        self.phrase_bank = PhraseBank.from_env()
+
+        # Per-stage latency histograms and throughput counters for every request
+        self.metrics = TTSMetrics()
+
+        # Synthesis tasks in flight, by cache key, shared by identical requests
+        self._in_flight = {}
+
+        # Edge TTS streams and ffmpeg processes are limited separately across all requests
+        self.synthesis_slots = asyncio.Semaphore(env_limit('EDGE_TTS_SYNTHESIS_LIMIT', self.SYNTHESIS_LIMIT))
+        self.transcode_slots = asyncio.Semaphore(env_limit('EDGE_TTS_TRANSCODE_LIMIT', self.TRANSCODE_LIMIT))
+
+        # Optional edgeTTSSessions.EdgeSessionPool of warm backend connections
+        self.session_pool = session_pool
+
+        # Time to first chunk of recent streams, and the budget for hedging slow ones
+        self.hedge_policy = HedgePolicy.from_env()
+
+        # Fails new syntheses fast while the backend is down or slow
+        self.circuit = CircuitBreaker.from_env(metrics=self.metrics)
+
+        # Profiles a sample of speech requests when EDGE_TTS_PROFILE is set
+        self.profiler = RequestProfiler.from_env(metrics=self.metrics)
+
+        # Fixed template fragments as PCM, by cache key (see template_to_speech)
+        self._fragment_audio = {}
+        self._fragment_bytes = 0
+
+        # Fixed utterances rendered into the phrase bank by --build-pack
+        self.greeting_phrases = GREETING_PHRASES
+        self.staff_names = STAFF_NAMES
+        self.department_names = DEPARTMENT_NAMES
+        self.phrase_bank_languages = PHRASE_BANK_LANGUAGES
+
+        self.pronunciation_enhancements = PRONUNCIATION_ENHANCEMENTS
+
+    @property
+    def enhancement_rules(self):
+        return _compiled_enhancement_rules()
 
     def detect_language(self, text):
-        """Simple language detection based on character patterns"""
-        text = text.strip()
-        
-        # Check for specific language patterns
-        if re.search(r'[а-яё]', text, re.IGNORECASE):
-            return 'ru'
-        elif re.search(r'[一-龯]', text):
-            if re.search(r'[繁體中文]', text):
-                return 'zh-TW'
-            return 'zh-CN'
-        elif re.search(r'[ひらがなカタカナ]', text):
-            return 'ja'
-        elif re.search(r'[가-힣]', text):
-            return 'ko'
-        elif re.search(r'[ا-ي]', text):
-            return 'ar'
-        elif re.search(r'[α-ω]', text, re.IGNORECASE):
-            return 'el'
-        elif re.search(r'[א-ת]', text):
-            return 'he'
-        elif re.search(r'[ก-๙]', text):
-            return 'th'
-        elif re.search(r'[àáâãäåæçèéêëìíîïðñòóôõöøùúûüýþÿ]', text, re.IGNORECASE):
-            return 'es'  # Default to Spanish for accented characters
-        elif re.search(r'[äöüß]', text, re.IGNORECASE):
-            return 'de'
-        elif re.search(r'[àèéìíîòóù]', text, re.IGNORECASE):
-            return 'it'
-        elif re.search(r'[àáâãçéêíóôõú]', text, re.IGNORECASE):
-            return 'pt'
-        elif re.search(r'[àâäéèêëïîôöùûüÿç]', text, re.IGNORECASE):
-            return 'fr'
-        elif re.search(r'[ąćęłńóśźż]', text, re.IGNORECASE):
-            return 'pl'
-        elif re.search(r'[áčďéěíňóřšťúůýž]', text, re.IGNORECASE):
-            return 'cs'
-        elif re.search(r'[áéíóöőúüű]', text, re.IGNORECASE):
-            return 'hu'
-        elif re.search(r'[ăâîșț]', text, re.IGNORECASE):
-            return 'ro'
-        elif re.search(r'[абвгдежзийклмнопрстуфхцчшщъьюя]', text, re.IGNORECASE):
-            return 'bg'
-        elif re.search(r'[čćđšž]', text, re.IGNORECASE):
-            return 'hr'
-        elif re.search(r'[áäčďéíĺľňóôŕšťúýž]', text, re.IGNORECASE):
-            return 'sk'
-        elif re.search(r'[čšž]', text, re.IGNORECASE):
-            return 'sl'
-        elif re.search(r'[äõöü]', text, re.IGNORECASE):
-            return 'et'
-        elif re.search(r'[āčēģīķļņšūž]', text, re.IGNORECASE):
-            return 'lv'
-        elif re.search(r'[ąčęėįšųūž]', text, re.IGNORECASE):
-            return 'lt'
-        elif re.search(r'[çğıöşü]', text, re.IGNORECASE):
-            return 'tr'
-        elif re.search(r'[àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]', text, re.IGNORECASE):
-            return 'vi'
-        elif re.search(r'[àáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]', text, re.IGNORECASE):
-            return 'id'
-        else:
+        """Language detection from a single forward scan of the text
+
+        Each step searches on from the last hit for a character ranked better
+        than the best rule seen so far, so the text is read once and the scan
+        stops early on a top-ranked script. Plain ASCII is English.
+        """
+        if text.isascii():
             return 'en'  # Default to English
 
-    def _load_server_lexicon(self):
-        try:
-            base_dir = os.path.dirname(__file__)
-            json_path = os.path.normpath(os.path.join(base_dir, '..', 'public', 'config', 'pronunciations.json'))
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('serverLexicon', {})
-        except Exception:
-            return {}
+        best = len(_LANGUAGES)
+        position = 0
+        while best > 0:
+            match = _ranked_pattern(best).search(text, position)
+            if match is None:
+                break
+            best = _language_rank(match.group())
+            position = match.end()
+        return _LANGUAGES[best] if best < len(_LANGUAGES) else 'en'
+
+    def _lexicon_entry(self):
+        """The cached lexicon for self.lexicon_path, reloaded when the file changes"""
+        stamp = _lexicon_stamp(self.lexicon_path)
+        entry = _LEXICON_CACHE.get(self.lexicon_path)
+        if entry is None or entry['stamp'] != stamp:
+            entry = {'stamp': stamp, 'lexicon': _load_lexicon(self.lexicon_path), 'rewriters': {}}
+            _LEXICON_CACHE[self.lexicon_path] = entry
+        return entry
+
+    @property
+    def server_lexicon(self):
+        return self._lexicon_entry()['lexicon']
+
+    def _lexicon_rewriter(self, lang):
+        """Compiled lexicon rewriter for lang, rebuilt when pronunciations.json changes"""
+        entry = self._lexicon_entry()
+        lexicon = entry['lexicon']
+
+        # Languages without their own entries share the default-only rewriter
+        key = lang if lang in lexicon else None
+        rewriter = entry['rewriters'].get(key)
+        if rewriter is None:
+            merged = {}
+            if 'default' in lexicon:
+                merged.update(lexicon['default'])
+            if key is not None:
+                merged.update(lexicon[key])
+            rewriter = LexiconRewriter(merged)
+            entry['rewriters'][key] = rewriter
+        return rewriter
 
     def get_voice(self, language=None, text=None):
         """Get the best voice for the given language or detected from text"""
@@ -376,179 +1449,919 @@ class EdgeTTSService:
         else:
             return self.voice_mapping['en']
 
-    async def text_to_speech(self, text, voice=None, language=None, rate='+0%', pitch='+0Hz', emotional_context='casual'):
-        """Convert text to speech using Edge TTS with advanced fluency optimization"""
+    def enhance_pronunciation(self, text, language=None):
+        """Apply the staff name rules, then the rules for an explicit language"""
+        for pattern, replacement in self.enhancement_rules.get('staff_names', ()):
+            text = pattern.sub(replacement, text)
+        if language:
+            for pattern, replacement in self.enhancement_rules.get(language, ()):
+                text = pattern.sub(replacement, text)
+        return text
+
+    def prepare_speech(self, text, voice=None, language=None, rate='+0%', pitch='+0Hz', emotional_context='casual', timings=None):
+        """Normalize text and resolve the voice and prosody for one request
+
+        Returns (text, voice, params, language). The language is detected once,
+        on the cleaned text, and reused for the lexicon, voice and result. When a
+        timings dict is given, normalize_ms and detect_ms are recorded in it.
+        """
+        started = time.perf_counter()
+        # Clean text for better TTS
+        cleaned_text = self.clean_text(text)
+        detect_started = time.perf_counter()
+        lang = language or self.detect_language(cleaned_text)
+        detect_finished = time.perf_counter()
+
+        # Apply server lexicon spell-outs (language-aware)
+        try:
+            cleaned_text = self._lexicon_rewriter(lang).rewrite(cleaned_text)
+        except Exception:
+            pass
+        
+        # Get voice
+        if not voice:
+            voice = self.get_voice(lang)
+        
+        # Apply pronunciation enhancements for better clarity
+        cleaned_text = self.enhance_pronunciation(cleaned_text, language)
+        
+        # Get base speech parameters for the language
+        base_params = self.speech_parameters.get(language, {'rate': rate, 'pitch': pitch, 'volume': '+0%'})
+        emotional_params = self.emotional_parameters.get(emotional_context, {'rate': '+0%', 'pitch': '+0Hz', 'volume': '+0%'})
+        
+        # Combine base and emotional parameters for human-like speech
+        combined_params = {
+            'rate': base_params['rate'],
+            'pitch': base_params['pitch'],
+            'volume': base_params['volume']
+        }
+        
+        # Apply emotional adjustments
+        if emotional_context != 'casual':
+            combined_params['rate'] = emotional_params['rate']
+            combined_params['pitch'] = emotional_params['pitch']
+            combined_params['volume'] = emotional_params['volume']
+
+        if timings is not None:
+            finished = time.perf_counter()
+            timings['normalize_ms'] = _elapsed_ms(started, finished) - _elapsed_ms(detect_started, detect_finished)
+            timings['detect_ms'] = _elapsed_ms(detect_started, detect_finished)
+        return cleaned_text, voice, combined_params, lang
+
+    async def text_to_speech(self, text, voice=None, language=None, rate='+0%', pitch='+0Hz', emotional_context='casual', timings=False, encoding='base64', audio_format=DEFAULT_AUDIO_FORMAT, hedge=None):
+        """Convert text to speech using Edge TTS with advanced fluency optimization
+
+        Per-stage timings and byte counts are always fed to self.metrics; with
+        timings=True they are also returned in the result's timings field. With
+        encoding='raw' the result's audio is the raw bytes (possibly a view into
+        the phrase bank) rather than a base64 string, for binary output paths.
+
+        audio_format is one of AUDIO_FORMATS. Backend audio that already is that
+        format skips ffmpeg; the result's format and mime_type name what was
+        actually delivered, which differs only when transcoding failed.
+
+        hedge (self.hedge_policy.enabled when None) starts a duplicate Edge TTS
+        stream for a piece whose first chunk is late, within the HedgePolicy budget.
+        A sample of requests is profiled by self.profiler (see RequestProfiler).
+        """
+        return await self._speech_result(
+            'speak', text,
+            lambda stage_timings: self._sentence_audio(
+                text, voice, language, rate, pitch, emotional_context, audio_format, hedge, stage_timings
+            ),
+            timings, encoding, audio_format,
+            details={'language': language, 'voice': voice, 'emotional_context': emotional_context}
+        )
+
+    async def _speech_result(self, kind, text, produce, timings=False, encoding='base64', audio_format=DEFAULT_AUDIO_FORMAT, details=None):
+        """Run one speech request of kind and shape its result
+
+        Shared by text_to_speech and template_to_speech. Once audio_format is
+        known to be valid, produce(stage_timings) returns a dict of audio,
+        format (as delivered), voice, language, text and cache_hit. This
+        encodes the audio, records metrics and the in_flight gauge, profiles
+        sampled requests (details joins the profile metadata) and turns any
+        failure into an error result carrying text.
+        """
+        started = time.perf_counter()
+        stage_timings = {'input_bytes': len(text.encode('utf-8')) if isinstance(text, str) else 0}
+        outcome = None
+        result = None
+        profile = self.profiler.sample()
+        self.metrics.add_gauge('in_flight', 1, kind=kind)
         try:
-            # Clean text for better TTS
-            cleaned_text = self.clean_text(text)
+            if audio_format not in AUDIO_FORMATS:
+                raise ValueError(f'Unsupported audio format: {audio_format} (use one of {", ".join(AUDIO_FORMATS)})')
+            outcome = await produce(stage_timings)
+            audio_data = outcome['audio']
+            delivered_format = outcome['format']
 
-            # Apply server lexicon spell-outs (language-aware)
-            try:
-                lang = language or self.detect_language(cleaned_text)
-                merged = {}
-                if 'default' in self.server_lexicon:
-                    merged.update(self.server_lexicon['default'])
-                if lang in self.server_lexicon:
-                    merged.update(self.server_lexicon[lang])
-                for token, replacement in merged.items():
-                    cleaned_text = re.sub(rf"\b{re.escape(token)}\b", replacement, cleaned_text)
-            except Exception:
-                pass
-            
-            # Get voice
-            if not voice:
-                voice = self.get_voice(language, cleaned_text)
-            
-            # Apply pronunciation enhancements for better clarity
-            # First apply staff names enhancement (language independent)
-            if 'staff_names' in self.pronunciation_enhancements:
-                enhanced_text = cleaned_text
-                for pattern, replacement in self.pronunciation_enhancements['staff_names']['patterns']:
-                    enhanced_text = re.sub(pattern, replacement, enhanced_text, flags=re.IGNORECASE)
-                cleaned_text = enhanced_text
-            
-            # Then apply language-specific enhancements
-            if language and language in self.pronunciation_enhancements:
-                enhanced_text = cleaned_text
-                for pattern, replacement in self.pronunciation_enhancements[language]['patterns']:
-                    enhanced_text = re.sub(pattern, replacement, enhanced_text, flags=re.IGNORECASE)
-                cleaned_text = enhanced_text
-            
-            # Get base speech parameters for the language
-            base_params = self.speech_parameters.get(language, {'rate': rate, 'pitch': pitch, 'volume': '+0%'})
-            emotional_params = self.emotional_parameters.get(emotional_context, {'rate': '+0%', 'pitch': '+0Hz', 'volume': '+0%'})
-            
-            # Combine base and emotional parameters for human-like speech
-            combined_params = {
-                'rate': base_params['rate'],
-                'pitch': base_params['pitch'],
-                'volume': base_params['volume']
-            }
-            
-            # Apply emotional adjustments
-            if emotional_context != 'casual':
-                combined_params['rate'] = emotional_params['rate']
-                combined_params['pitch'] = emotional_params['pitch']
-                combined_params['volume'] = emotional_params['volume']
-            
-            # Generate speech with plain text to avoid SSML version issues
-            # Use plain text instead of SSML to prevent unwanted speech messages
-            communicate = edge_tts.Communicate(cleaned_text, voice)
-            
-            # Convert to bytes
-            audio_data = b""
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_data += chunk["data"]
-            
-            # Convert OGG/Opus to MP3 for iOS compatibility
-            # iOS Safari doesn't support OGG/Opus, so we convert to MP3
-            audio_data = self._convert_to_mp3(audio_data)
-            
             # Convert to base64 for JSON transmission
-            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-            
-            return {
+            encode_started = time.perf_counter()
+            if encoding == 'raw':
+                audio = audio_data
+            else:
+                import base64
+                audio = base64.b64encode(audio_data).decode('utf-8')
+            stage_timings['encode_ms'] = _elapsed_ms(encode_started, time.perf_counter())
+            stage_timings['output_bytes'] = len(audio_data)
+            stage_timings['total_ms'] = _elapsed_ms(started, time.perf_counter())
+            self.metrics.record_request(kind, stage_timings, True, outcome['cache_hit'])
+
+            result = {
+                'success': True,
+                'audio': audio,
+                'voice': outcome['voice'],
+                'language': outcome['language'],
+                'text': outcome['text'],
+                'cache_hit': outcome['cache_hit'],
+                'format': delivered_format,
+                'mime_type': AUDIO_FORMATS[delivered_format]['mime_type'] if delivered_format in AUDIO_FORMATS else None
+            }
+            if timings:
+                result['timings'] = stage_timings
+            return result
+
+        except Exception as e:
+            stage_timings['total_ms'] = _elapsed_ms(started, time.perf_counter())
+            self.metrics.record_request(kind, stage_timings, False, False)
+            result = {
+                'success': False,
+                'error': str(e),
+                'text': text
+            }
+            if isinstance(e, BackendUnavailable):
+                result.update(reason=e.reason, fallback='browser_tts')
+            if timings:
+                result['timings'] = stage_timings
+            return result
+        finally:
+            self.metrics.add_gauge('in_flight', -1, kind=kind)
+            if profile is not None:
+                self.profiler.finish(profile, dict(
+                    details or {},
+                    kind=kind,
+                    text=text[:200] if isinstance(text, str) else None,
+                    format=audio_format,
+                    success=bool(result and result['success']),
+                    error=result.get('error') if result else 'cancelled',
+                    cache_hit=bool(outcome and outcome['cache_hit']),
+                    timings=stage_timings,
+                    # cProfile sees the whole loop, so their work is in the profile too
+                    concurrent_syntheses=len(self._in_flight)
+                ))
+
+    async def _sentence_audio(self, text, voice, language, rate, pitch, emotional_context, audio_format, hedge, stage_timings):
+        """Audio for text from the phrase bank, the audio cache or a coalesced synthesis"""
+        if hedge is None:
+            hedge = self.hedge_policy.enabled
+        explicit_voice = voice
+        cleaned_text, voice, combined_params, detected_language = self.prepare_speech(
+            text, voice, language, rate, pitch, emotional_context, timings=stage_timings
+        )
+        # An explicit voice reads everything; otherwise each script run gets its own
+        segment_language = None if explicit_voice else detected_language
+
+        # Serve prerendered phrases and repeated utterances without synthesizing
+        cache_key = AudioCache.make_key(cleaned_text, voice, combined_params, audio_format, segment_language)
+        audio_data = self.phrase_bank.get(cache_key) if self.phrase_bank else None
+        if audio_data is None and self.audio_cache:
+            audio_data = self.audio_cache.get(cache_key)
+        cache_hit = audio_data is not None
+        delivered_format = audio_format
+
+        if not cache_hit:
+            # Identical requests already in flight share one synthesis
+            audio_data, delivered_format, synthesis_timings = await self._coalesced_synthesis(
+                cache_key, cleaned_text, voice, segment_language, audio_format, hedge
+            )
+            stage_timings.update(synthesis_timings)
+        return {
+            'audio': audio_data,
+            'format': delivered_format,
+            'voice': voice,
+            'language': detected_language,
+            'text': cleaned_text,
+            'cache_hit': cache_hit
+        }
+
+    async def _coalesced_synthesis(self, key, text, voice, segment_language, audio_format=DEFAULT_AUDIO_FORMAT, hedge=False):
+        """Synthesize and transcode once per cache key, however many callers ask at once
+
+        Requests that arrive while an identical one is being synthesized await
+        the same task instead of opening their own Edge TTS stream and ffmpeg.
+        Waiters await it through asyncio.shield, so cancelling one waiter never
+        cancels the synthesis for the others. Only a new synthesis asks
+        self.circuit for admission, and its outcome is counted once.
+        Returns (audio, delivered format, timings).
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            probe = self.circuit.admit(key)
+            task = asyncio.ensure_future(self._synthesize_audio(key, text, voice, segment_language, audio_format, hedge))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._synthesis_done(key, done, probe))
+        else:
+            self.metrics.inc('coalesced_total', kind='speak')
+        return await asyncio.shield(task)
+
+    def _synthesis_done(self, key, task, probe=False):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled():
+            self.circuit.release(probe)
+            return
+        # Also marks the failure retrieved even if every waiter was cancelled
+        error = task.exception()
+        first_chunk_ms = None if error is not None else task.result()[2].get('first_chunk_ms')
+        self.circuit.record(
+            probe, first_chunk_ms / 1000 if first_chunk_ms is not None else None, error, key
+        )
+
+    async def _synthesize_audio(self, key, text, voice, segment_language, audio_format=DEFAULT_AUDIO_FORMAT, hedge=False):
+        """One synthesis plus transcode, cached by key; returns (audio, delivered format, timings)"""
+        timings = {}
+        # With a session pool the backend is asked for audio_format itself; otherwise
+        # edge_tts's stream is transcoded while it streams in, unless it already matches
+        # (iOS Safari doesn't support OGG/Opus, so it still gets MP3)
+        edge_format = native_format = None
+        if self.session_pool is not None:
+            edge_format = AUDIO_FORMATS[audio_format]['edge_format']
+            if edge_format != self.session_pool.DEFAULT_OUTPUT_FORMAT:
+                native_format = EDGE_OUTPUT_FORMATS[edge_format]
+        transcode_started = time.perf_counter()
+        audio_data, raw_audio = await self.transcode_stream(
+            self._timed_chunks(self._synthesis_stream(text, voice, segment_language, edge_format, hedge), timings),
+            audio_format=audio_format, native_format=native_format
+        )
+        # ffmpeg runs alongside synthesis; only its start-up and the tail after the last chunk are extra
+        timings['transcode_ms'] = round(
+            _elapsed_ms(transcode_started, time.perf_counter()) - timings.get('synthesis_ms', 0), 3
+        )
+        timings['audio_bytes'] = len(raw_audio)
+
+        # Only cache audio in the requested format, never the unconverted fallback
+        if audio_data is None:
+            return raw_audio, delivered_format_name(native_format or sniff_audio_format(raw_audio)) or 'native', timings
+        if audio_format == 'opus':
+            # Pieces of a long text arrive as one Ogg stream each
+            audio_data = join_ogg_opus(audio_data)
+        if self.audio_cache:
+            self.audio_cache.put(key, audio_data)
+        return audio_data, audio_format, timings
+
+    async def template_to_speech(self, template, slots, voice=None, language=None, rate='+0%', pitch='+0Hz', emotional_context='casual', timings=False, encoding='base64', audio_format=DEFAULT_AUDIO_FORMAT):
+        """Speak a str.format template, synthesizing only its slot values
+
+        template names its slots, as in 'Professor {name} is available in room
+        {room} at {time}', and slots maps each name to its value. The voice and
+        language come from the whole sentence. Fixed fragments are rendered once
+        per voice and parameters and kept in memory (and the audio cache); slot
+        values are synthesized concurrently. Every piece is fetched as PCM (native
+        over the session pool, decoded by ffmpeg otherwise), spliced by
+        splice_pcm and encoded once. Results are shaped like text_to_speech's,
+        with identical sentences served from the audio cache. Without the pool
+        or ffmpeg to get PCM, the whole sentence is synthesized as one text.
+        """
+        return await self._speech_result(
+            'template', template,
+            lambda stage_timings: self._template_audio(
+                template, slots, voice, language, rate, pitch, emotional_context, audio_format, stage_timings
+            ),
+            timings, encoding, audio_format,
+            details={'language': language, 'voice': voice, 'emotional_context': emotional_context}
+        )
+
+    async def _template_audio(self, template, slots, voice, language, rate, pitch, emotional_context, audio_format, stage_timings):
+        """Spliced template audio, shaped for _speech_result"""
+        pieces = self._template_pieces(template, slots)
+        sentence = ''.join(text for text, _ in pieces)
+        stage_timings['input_bytes'] = len(sentence.encode('utf-8'))
+        if self.session_pool is None and not ffmpeg_available():
+            # Pieces can only be had as PCM over the pool or through ffmpeg
+            self.metrics.inc('template_fallbacks_total', reason='no_pcm')
+            return await self._sentence_audio(
+                sentence, voice, language, rate, pitch, emotional_context, audio_format, None, stage_timings
+            )
+
+        cleaned_text, voice, combined_params, detected_language = self.prepare_speech(
+            sentence, voice, language, rate, pitch, emotional_context, timings=stage_timings
+        )
+        sentence_key = AudioCache.make_key(cleaned_text, voice, combined_params, f'{audio_format}:template')
+        audio_data = self.audio_cache.get(sentence_key) if self.audio_cache else None
+        cache_hit = audio_data is not None
+        delivered_format = audio_format
+
+        if not cache_hit:
+            synthesis_started = time.perf_counter()
+            pcm_pieces = await asyncio.gather(*(
+                self._pcm_piece(text, fixed, voice, detected_language, rate, pitch, emotional_context)
+                for text, fixed in pieces if any(ch.isalnum() for ch in text)
+            ))
+            splice_started = time.perf_counter()
+            stage_timings['synthesis_ms'] = _elapsed_ms(synthesis_started, splice_started)
+            pcm = splice_pcm(pcm_pieces)
+            stage_timings['splice_ms'] = _elapsed_ms(splice_started, time.perf_counter())
+            stage_timings['audio_bytes'] = len(pcm)
+
+            transcode_started = time.perf_counter()
+            audio_data = pcm
+            if audio_format != 'pcm':
+                async def spliced():
+                    yield pcm
+                audio_data, _ = await self.transcode_stream(spliced(), audio_format=audio_format, native_format='pcm')
+                if audio_data is None:
+                    audio_data, delivered_format = pcm, 'pcm'
+            stage_timings['transcode_ms'] = _elapsed_ms(transcode_started, time.perf_counter())
+            if delivered_format == audio_format and self.audio_cache:
+                self.audio_cache.put(sentence_key, audio_data)
+
+        return {
+            'audio': audio_data,
+            'format': delivered_format,
+            'voice': voice,
+            'language': detected_language,
+            'text': cleaned_text,
+            'cache_hit': cache_hit
+        }
+
+    def _template_pieces(self, template, slots):
+        """Split template into (text, fixed) pieces with slots filled in"""
+        import string
+
+        if not isinstance(template, str) or not template.strip():
+            raise ValueError('Template is required and must be a non-empty string')
+        if not isinstance(slots, dict):
+            raise ValueError('Template slots must be an object')
+        pieces = []
+        try:
+            parsed = list(string.Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f'Invalid template: {str(e)}')
+        for literal, field, format_spec, conversion in parsed:
+            if literal:
+                pieces.append((literal, True))
+            if field is None:
+                continue
+            if not field or format_spec or conversion:
+                raise ValueError('Template slots must be plain names, as in {name}')
+            if field not in slots or slots[field] is None:
+                raise ValueError(f'Missing template slot: {field}')
+            pieces.append((str(slots[field]), False))
+        return pieces
+
+    async def _pcm_piece(self, text, fixed, voice, language, rate, pitch, emotional_context):
+        """One template piece as PCM; fixed fragments are served from memory after the first time"""
+        cleaned_text, voice, combined_params, _ = self.prepare_speech(text, voice, language, rate, pitch, emotional_context)
+        key = AudioCache.make_key(cleaned_text, voice, combined_params, 'pcm')
+        if fixed and key in self._fragment_audio:
+            # Most recently used fragments go to the end
+            audio = self._fragment_audio.pop(key)
+            self._fragment_audio[key] = audio
+            self.metrics.inc('template_fragments_total', source='memory')
+            return audio
+
+        audio = self.phrase_bank.get(key) if self.phrase_bank else None
+        if audio is None and self.audio_cache:
+            audio = self.audio_cache.get(key)
+        source = 'cache' if audio is not None else 'synthesis'
+        if audio is None:
+            audio, delivered_format, _ = await self._coalesced_synthesis(key, cleaned_text, voice, None, 'pcm')
+            if delivered_format != 'pcm':
+                raise RuntimeError('Could not decode template audio to PCM (is ffmpeg installed?)')
+        if fixed:
+            self.metrics.inc('template_fragments_total', source=source)
+            audio = bytes(audio)
+            previous = self._fragment_audio.pop(key, None)
+            self._fragment_bytes += len(audio) - (len(previous) if previous is not None else 0)
+            self._fragment_audio[key] = audio
+            while self._fragment_bytes > self.FRAGMENT_CACHE_BYTES and len(self._fragment_audio) > 1:
+                self._fragment_bytes -= len(self._fragment_audio.pop(next(iter(self._fragment_audio))))
+        return audio
+
+    async def stream_speech(self, text, voice=None, language=None, rate='+0%', pitch='+0Hz', emotional_context='casual', timings=False):
+        """Yield audio frames as they arrive from Edge TTS
+
+        Yields {'type': 'audio', 'seq': n, 'data': bytes} for each chunk of the
+        backend's native audio stream, then a final {'type': 'end'} frame with the
+        request metadata, including the stream's format (see delivered_format_name). Failures end the stream with a {'type': 'error'} frame.
+        With timings=True the final frame carries the per-stage timings.
+        """
+        started = time.perf_counter()
+        stage_timings = {'input_bytes': len(text.encode('utf-8')) if isinstance(text, str) else 0}
+        cached = None
+        seq = 0
+        self.metrics.add_gauge('in_flight', 1, kind='stream')
+        try:
+            explicit_voice = voice
+            cleaned_text, voice, combined_params, detected_language = self.prepare_speech(
+                text, voice, language, rate, pitch, emotional_context, timings=stage_timings
+            )
+            # An explicit voice reads everything; otherwise each script run gets its own
+            segment_language = None if explicit_voice else detected_language
+
+            cache_key = AudioCache.make_key(cleaned_text, voice, combined_params, 'native', segment_language)
+            if self.phrase_bank:
+                cached = self.phrase_bank.get(
+                    AudioCache.make_key(cleaned_text, voice, combined_params, 'mp3', segment_language)
+                )
+            if cached is None and self.audio_cache:
+                cached = self.audio_cache.get(cache_key)
+
+            if cached is not None:
+                for offset in range(0, len(cached), self.STREAM_FRAME_BYTES):
+                    yield {'type': 'audio', 'seq': seq, 'data': cached[offset:offset + self.STREAM_FRAME_BYTES]}
+                    seq += 1
+                stage_timings['output_bytes'] = len(cached)
+                delivered_format = sniff_audio_format(cached)
+            else:
+                chunks = []
+                probe = self.circuit.admit(cache_key)
+                try:
+                    async for data in self._timed_chunks(self._synthesis_stream(cleaned_text, voice, segment_language), stage_timings):
+                        chunks.append(data)
+                        yield {'type': 'audio', 'seq': seq, 'data': data}
+                        seq += 1
+                except Exception as e:
+                    self.circuit.record(probe, error=e, key=cache_key)
+                    raise
+                except BaseException:
+                    # Cancelled, or the consumer stopped reading
+                    self.circuit.release(probe)
+                    raise
+                first_chunk_ms = stage_timings.get('first_chunk_ms')
+                self.circuit.record(probe, first_chunk_ms / 1000 if first_chunk_ms is not None else None)
+                audio_bytes = sum(len(chunk) for chunk in chunks)
+                stage_timings['audio_bytes'] = stage_timings['output_bytes'] = audio_bytes
+                delivered_format = sniff_audio_format(chunks[0]) if chunks else None
+                if self.audio_cache and chunks:
+                    self.audio_cache.put(cache_key, b"".join(chunks))
+
+            stage_timings['total_ms'] = _elapsed_ms(started, time.perf_counter())
+            self.metrics.record_request('stream', stage_timings, True, cached is not None)
+            end_frame = {
+                'type': 'end',
+                'seq': seq,
                 'success': True,
-                'audio': audio_base64,
                 'voice': voice,
-                'language': language or self.detect_language(text),
-                'text': cleaned_text
+                'language': detected_language,
+                'text': cleaned_text,
+                'cache_hit': cached is not None,
+                'format': delivered_format_name(delivered_format) or 'native'
             }
-            
+            if timings:
+                end_frame['timings'] = stage_timings
+            yield end_frame
+
         except Exception as e:
-            return {
+            stage_timings['total_ms'] = _elapsed_ms(started, time.perf_counter())
+            self.metrics.record_request('stream', stage_timings, False, cached is not None)
+            error_frame = {
+                'type': 'error',
+                'seq': seq,
                 'success': False,
                 'error': str(e),
                 'text': text
             }
+            if isinstance(e, BackendUnavailable):
+                error_frame.update(reason=e.reason, fallback='browser_tts')
+            if timings:
+                error_frame['timings'] = stage_timings
+            yield error_frame
+        finally:
+            self.metrics.add_gauge('in_flight', -1, kind='stream')
+
+    async def _timed_chunks(self, chunks, timings):
+        """Pass audio chunks through, recording first_chunk_ms and synthesis_ms"""
+        started = time.perf_counter()
+        async for chunk in chunks:
+            if 'first_chunk_ms' not in timings:
+                timings['first_chunk_ms'] = _elapsed_ms(started, time.perf_counter())
+            yield chunk
+        timings['synthesis_ms'] = _elapsed_ms(started, time.perf_counter())
 
-    def _convert_to_mp3(self, audio_data):
-        """Convert OGG/Opus audio to MP3 for iOS compatibility"""
+    def phrase_bank_requests(self, languages=None):
+        """List the (text, language, emotional_context) utterances the phrase bank holds
+
+        Greetings are rendered once per emotional context; staff and department
+        names are rendered with each language's voice, spelled as replies
+        contain them (prepare_speech expands them as it would in a reply).
+        """
+        requests = []
+        for language in languages or self.phrase_bank_languages:
+            greeting = self.greeting_phrases.get((language or 'en').split('-')[0], self.greeting_phrases['en'])
+            for emotional_context in self.emotional_parameters:
+                requests.append((greeting, language, emotional_context))
+            for name in dict.fromkeys((*self.staff_names, *self.department_names)):
+                requests.append((name, language, 'casual'))
+        return requests
+
+    async def build_phrase_bank(self, path, languages=None, concurrency=SYNTHESIS_CONCURRENCY):
+        """Render every phrase bank utterance to MP3 and write the pack to path
+
+        Entries are keyed exactly like text_to_speech's cache, so a pack built
+        with a different lexicon or voice table simply stops matching.
+        Returns (written, failed).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        entries = {}
+        seen = set()
+        failed = 0
+
+        async def render(text, language, emotional_context):
+            nonlocal failed
+            cleaned_text, voice, params, lang = self.prepare_speech(text, None, language, emotional_context=emotional_context)
+            key = AudioCache.make_key(cleaned_text, voice, params, 'mp3', lang)
+            if key in seen:
+                return
+            seen.add(key)
+            async with semaphore:
+                try:
+                    mp3_data, _ = await self.transcode_stream(self._synthesis_stream(cleaned_text, voice, lang))
+                except Exception as e:
+                    mp3_data = None
+                    sys.stderr.write(f'⚠️ Failed to render "{cleaned_text}" ({language}): {str(e)}\n')
+            # Only real MP3 goes into the pack, as with the audio cache
+            if mp3_data:
+                entries[key] = mp3_data
+            else:
+                failed += 1
+
+        await asyncio.gather(*(render(*request) for request in self.phrase_bank_requests(languages)))
+        return PhraseBank.write(path, entries), failed
+
+    def split_text(self, text):
+        """Split long text into sentence/clause pieces for parallel synthesis
+
+        The first sentence becomes its own piece so its audio is ready quickly;
+        the rest are packed up to CHUNK_CHARS. Short texts stay whole.
+        """
+        if len(text) <= self.CHUNK_MIN_CHARS:
+            return [text]
+
+        sentences = []
+        for sentence in _SENTENCE_BREAK.split(text):
+            # Keep abbreviations and initials ("Dr.", "C.") attached to what follows
+            if sentences and _ABBREVIATION_END.search(sentences[-1]):
+                sentences[-1] = f'{sentences[-1]} {sentence}'
+            elif sentence.strip():
+                sentences.append(sentence)
+
+        units = []
+        for sentence in sentences:
+            if len(sentence) <= self.CHUNK_CHARS:
+                units.append(sentence)
+                continue
+            for clause in _CLAUSE_BREAK.split(sentence):
+                while len(clause) > self.CHUNK_CHARS:
+                    cut = clause.rfind(' ', 0, self.CHUNK_CHARS)
+                    if cut <= 0:
+                        cut = self.CHUNK_CHARS
+                    units.append(clause[:cut])
+                    clause = clause[cut:].lstrip()
+                if clause.strip():
+                    units.append(clause)
+
+        pieces = [units[0]]
+        current = ''
+        for unit in units[1:]:
+            if current and len(current) + 1 + len(unit) > self.CHUNK_CHARS:
+                pieces.append(current)
+                current = unit
+            else:
+                current = f'{current} {unit}' if current else unit
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def segment_by_script(self, text, language=None):
+        """Split text into single-script runs, each paired with its language
+
+        Spaces, digits and punctuation stay with the run they follow. With a
+        language, runs in that language's script keep it, so accented French or
+        Portuguese is never re-detected as another Latin language; only runs in
+        another script get a language of their own. Latin runs inside a reply
+        in another script are English, Indian English in an Indian language.
+        """
+        if text.isascii():
+            return [(text, language or 'en')]
+
+        runs = []
+        start = 0
+        current = None
+        for index, ch in enumerate(text):
+            if not ch.isalpha():
+                continue
+            script = _script_of(ch)
+            if script is None or script == current:
+                continue
+            if current is not None:
+                runs.append((text[start:index], current))
+                start = index
+            current = script
+        runs.append((text[start:], current))
+
+        requested_script = _language_script(language) if language else None
+        primary = (language or '').split('-')[0]
+        segments = []
+        for run, script in runs:
+            run = run.strip()
+            if not run:
+                continue
+            if requested_script is not None and script in (requested_script, None):
+                run_language = language
+            elif requested_script is not None and script == 'latin':
+                run_language = 'en'
+            else:
+                run_language = self.detect_language(run)
+            if run_language == 'en' and primary in _INDIC_LANGUAGES:
+                run_language = 'en-IN'
+            segments.append((run, run_language))
+        return segments or [(text, language or 'en')]
+
+    def _synthesis_stream(self, text, voice, language=None, output_format=None, hedge=False):
+        """Audio chunks for text, synthesized in parallel pieces when it is long
+
+        With a language, mixed-script text is segmented: the request voice reads
+        every run in the request language's script, and runs in another script
+        are read by the mapped voice for their own language. Without one, the whole text uses voice.
+        output_format is an Edge TTS outputFormat, honoured over the session pool;
+        hedge lets slow pieces get a duplicate stream (see _piece_audio).
+        """
+        if language:
+            segments = []
+            for segment, segment_language in self.segment_by_script(text, language):
+                if segment_language != language:
+                    segment_voice = self.voice_mapping.get(segment_language, voice)
+                else:
+                    segment_voice = voice
+                # Neighbouring runs that end up with the same voice are read together
+                if segments and segments[-1][1] == segment_voice:
+                    segments[-1] = (f'{segments[-1][0]} {segment}', segment_voice)
+                else:
+                    segments.append((segment, segment_voice))
+        else:
+            segments = [(text, voice)]
+
+        pieces = [
+            (piece, segment_voice)
+            for segment, segment_voice in segments
+            for piece in self.split_text(segment)
+        ]
+        # Even a single piece streams from a producer task, so a consumer that is
+        # waiting for a transcode slot never holds a synthesis slot hostage
+        return self._ordered_piece_audio(pieces, output_format, hedge)
+
+    async def _ordered_piece_audio(self, pieces, output_format=None, hedge=False):
+        """Synthesize (text, voice) pieces concurrently and yield their audio in order
+
+        The first piece streams straight through; later pieces buffer until every
+        piece before them has been yielded. Each piece holds one of the
+        request's SYNTHESIS_CONCURRENCY streams and one process-wide synthesis slot.
+        """
+        semaphore = asyncio.Semaphore(self.SYNTHESIS_CONCURRENCY)
+        queues = [asyncio.Queue() for _ in pieces]
+
+        async def synthesize(index, piece, voice):
+            try:
+                async with semaphore:
+                    waited = time.perf_counter()
+                    async with self.synthesis_slots:
+                        self.metrics.observe('slot_wait_seconds', time.perf_counter() - waited, kind='synthesis')
+                        # Generate speech with plain text to avoid SSML version issues
+                        # Use plain text instead of SSML to prevent unwanted speech messages
+                        async for data in self._piece_audio(piece, voice, output_format, hedge):
+                            queues[index].put_nowait(data)
+                queues[index].put_nowait(None)
+            except Exception as e:
+                queues[index].put_nowait(e)
+
+        tasks = [
+            asyncio.create_task(synthesize(index, piece, voice))
+            for index, (piece, voice) in enumerate(pieces)
+        ]
         try:
-            # Check if ffmpeg is available
-            result = subprocess.run(['ffmpeg', '-version'], 
-                                  capture_output=True, 
-                                  timeout=2)
-            if result.returncode != 0:
-                # ffmpeg not available, return original audio
-                sys.stderr.write('⚠️ ffmpeg not available, skipping conversion (iOS may not support OGG)\n')
-                return audio_data
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            # ffmpeg not installed or not in PATH, return original audio
-            sys.stderr.write('⚠️ ffmpeg not found, skipping conversion (iOS may not support OGG)\n')
-            return audio_data
-        
+            for queue in queues:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _piece_audio(self, piece, voice, output_format=None, hedge=False):
+        """Audio chunks for one piece, timing its first chunk for self.hedge_policy
+
+        With hedge, a piece whose first chunk is later than the policy's delay
+        gets a duplicate stream when the hedge budget and a free synthesis slot
+        allow. Both streams then buffer; the first to finish is yielded and the
+        other cancelled. A piece that starts on time streams straight through.
+        """
+        policy = self.hedge_policy
+        if not hedge:
+            started = time.perf_counter()
+            first = True
+            async for data in self._audio_chunks(self._communicate(piece, voice, output_format)):
+                if first:
+                    policy.observe(time.perf_counter() - started)
+                    first = False
+                yield data
+            return
+
+        policy.stream_started()
+        # (pump task, queue of chunks ending in None or an exception, timestamps)
+        streams = []
+
+        def launch(slot=False):
+            queue = asyncio.Queue()
+            marks = {'started': time.perf_counter(), 'ready': asyncio.Event()}
+
+            async def pump():
+                try:
+                    async for data in self._audio_chunks(self._communicate(piece, voice, output_format)):
+                        if 'first' not in marks:
+                            marks['first'] = time.perf_counter()
+                        queue.put_nowait(data)
+                        marks['ready'].set()
+                    queue.put_nowait(None)
+                except Exception as e:
+                    queue.put_nowait(e)
+                    return e
+                finally:
+                    marks['ready'].set()
+                    if slot:
+                        self.synthesis_slots.release()
+
+            streams.append((asyncio.create_task(pump()), queue, marks))
+
         try:
-            # Create temporary files for input (OGG) and output (MP3)
-            with tempfile.NamedTemporaryFile(suffix='.ogg', delete=False) as input_file:
-                input_file.write(audio_data)
-                input_path = input_file.name
-            
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as output_file:
-                output_path = output_file.name
-            
-            # Convert OGG to MP3 using ffmpeg
-            # -i: input file
-            # -codec:a libmp3lame: use MP3 codec
-            # -b:a 128k: bitrate 128kbps (good quality, reasonable file size)
-            # -ar 24000: sample rate 24kHz (sufficient for speech)
-            # -ac 1: mono channel (speech doesn't need stereo)
-            # -y: overwrite output file
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-codec:a', 'libmp3lame',
-                '-b:a', '128k',
-                '-ar', '24000',
-                '-ac', '1',
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, 
-                                  capture_output=True, 
-                                  timeout=10,
-                                  check=True)
-            
-            # Read converted MP3 file
-            with open(output_path, 'rb') as f:
-                mp3_data = f.read()
-            
-            # Clean up temporary files
+            launch()
+            primary, queue, marks = streams[0]
+            delay = policy.delay()
+            self.metrics.set_gauge('hedge_delay_seconds', delay)
             try:
-                os.unlink(input_path)
-                os.unlink(output_path)
-            except:
-                pass
-            
-            sys.stderr.write(f'✅ Converted OGG to MP3: {len(audio_data)} bytes → {len(mp3_data)} bytes\n')
-            return mp3_data
-            
-        except subprocess.CalledProcessError as e:
-            sys.stderr.write(f'⚠️ ffmpeg conversion failed: {e.stderr.decode() if e.stderr else str(e)}\n')
-            # Clean up on error
+                await asyncio.wait_for(marks['ready'].wait(), delay)
+                late = False
+            except asyncio.TimeoutError:
+                late = True
+
+            if late and self.synthesis_slots.locked():
+                self.metrics.inc('hedges_skipped_total', reason='slots')
+            elif late and not policy.try_hedge():
+                self.metrics.inc('hedges_skipped_total', reason='budget')
+            elif late:
+                # locked() was False and nothing has been awaited since, so this never blocks
+                await self.synthesis_slots.acquire()
+                launch(slot=True)
+                pending = {task for task, _, _ in streams}
+                winner = None
+                while pending and winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((entry for entry in streams if entry[0] in done and entry[0].result() is None), None)
+                finished = time.perf_counter()
+                for task, _, stream_marks in streams:
+                    # A loser still waiting for its first chunk counts with what it waited so far
+                    if 'first' in stream_marks or not task.done():
+                        policy.observe(stream_marks.get('first', finished) - stream_marks['started'])
+                if winner is None:
+                    self.metrics.inc('hedges_total', outcome='failed')
+                    raise primary.result()
+                self.metrics.inc('hedges_total', outcome='primary' if winner[0] is primary else 'hedge')
+                queue = winner[1]
+                while True:
+                    item = queue.get_nowait()
+                    if item is None:
+                        return
+                    yield item
+
+            observed = False
+            while True:
+                item = await queue.get()
+                if not observed and 'first' in marks:
+                    policy.observe(marks['first'] - marks['started'])
+                    observed = True
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for task, _, _ in streams:
+                task.cancel()
+            await asyncio.gather(*(task for task, _, _ in streams), return_exceptions=True)
+
+    def _communicate(self, text, voice, output_format=None):
+        """An Edge TTS stream for text, over a warm pooled session when one is free
+
+        output_format needs the session pool; edge_tts itself always streams MP3.
+        """
+        if self.session_pool is None:
+            return _edge_tts().Communicate(text, voice)
+        return self.session_pool.communicate(text, voice, lambda: _edge_tts().Communicate(text, voice), output_format)
+
+    async def _audio_chunks(self, communicate):
+        """Yield only the audio payloads from an Edge TTS stream"""
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+    async def transcode_stream(self, chunks, timeout=None, audio_format=DEFAULT_AUDIO_FORMAT, native_format=None):
+        """Pipe audio chunks through ffmpeg while they are still being synthesized
+
+        Returns (encoded, raw_audio), encoded being audio_format. Audio that
+        already is audio_format (native_format when the caller knows it, else
+        sniffed from the first chunk) passes through without ffmpeg; otherwise
+        ffmpeg starts once a transcode slot is free. encoded is
+        None when ffmpeg is missing, fails or times out, so callers can fall back
+        to the raw audio. The ffmpeg child is always reaped, including on errors
+        and cancellation.
+        """
+        timeout = timeout or self.TRANSCODE_TIMEOUT
+        chunks = chunks.__aiter__()
+        raw_chunks = []
+        async for chunk in chunks:
+            raw_chunks.append(chunk)
+            break
+
+        passthrough = bool(raw_chunks) and (native_format or sniff_audio_format(raw_chunks[0])) in AUDIO_FORMATS[audio_format]['accepts']
+        if passthrough or not ffmpeg_available():
+            async for chunk in chunks:
+                raw_chunks.append(chunk)
+            raw_audio = b"".join(raw_chunks)
+            return (raw_audio if passthrough else None), raw_audio
+
+        # Synthesis keeps streaming into its producer queues while this waits
+        waited = time.perf_counter()
+        await self.transcode_slots.acquire()
+        self.metrics.observe('slot_wait_seconds', time.perf_counter() - waited, kind='transcode')
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_command(audio_format, native_format),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except BaseException:
+            self.transcode_slots.release()
+            raise
+        # Drain both output pipes concurrently so ffmpeg never blocks on a full pipe
+        output_task = asyncio.create_task(process.stdout.read())
+        error_task = asyncio.create_task(process.stderr.read())
+        try:
+            pipe_open = True
+
+            async def feed(chunk):
+                nonlocal pipe_open
+                if pipe_open:
+                    try:
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                    except (BrokenPipeError, ConnectionResetError):
+                        # ffmpeg gave up; keep collecting the raw audio as a fallback
+                        pipe_open = False
+
+            for chunk in raw_chunks:
+                await feed(chunk)
+            async for chunk in chunks:
+                raw_chunks.append(chunk)
+                await feed(chunk)
+            if pipe_open:
+                process.stdin.close()
+
+            raw_audio = b"".join(raw_chunks)
             try:
-                if 'input_path' in locals():
-                    os.unlink(input_path)
-                if 'output_path' in locals():
-                    os.unlink(output_path)
-            except:
-                pass
-            # Return original audio if conversion fails
-            return audio_data
-        except Exception as e:
-            sys.stderr.write(f'⚠️ Audio conversion error: {str(e)}\n')
-            # Clean up on error
+                encoded, error_output = await asyncio.wait_for(
+                    asyncio.gather(output_task, error_task), timeout
+                )
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                sys.stderr.write(f'⚠️ ffmpeg conversion timed out after {timeout}s\n')
+                return None, raw_audio
+
+            if process.returncode != 0 or not encoded:
+                sys.stderr.write(f'⚠️ ffmpeg conversion failed: {error_output.decode("utf-8", "replace").strip()}\n')
+                return None, raw_audio
+
+            sys.stderr.write(f'✅ Converted audio to {audio_format}: {len(raw_audio)} bytes → {len(encoded)} bytes\n')
+            return encoded, raw_audio
+        finally:
             try:
-                if 'input_path' in locals():
-                    os.unlink(input_path)
-                if 'output_path' in locals():
-                    os.unlink(output_path)
-            except:
-                pass
-            # Return original audio if conversion fails
-            return audio_data
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                for task in (output_task, error_task):
+                    if not task.done():
+                        task.cancel()
+            finally:
+                self.transcode_slots.release()
 
     def clean_text(self, text):
         """Clean text for better TTS output"""
@@ -568,20 +2381,526 @@ class EdgeTTSService:
         
         return text.strip()
 
+def audio_output_dir():
+    """Directory for file output: EDGE_TTS_OUTPUT_DIR, else shared memory where available"""
+    directory = os.environ.get('EDGE_TTS_OUTPUT_DIR')
+    if directory:
+        return directory
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    import tempfile
+    return tempfile.gettempdir()
+
+def write_audio_file(audio, audio_format=DEFAULT_AUDIO_FORMAT):
+    """Write raw audio to a new file the caller owns and must delete; returns its path"""
+    import tempfile
+    suffix = AUDIO_FORMATS[audio_format]['extension'] if audio_format in AUDIO_FORMATS else '.bin'
+    fd, path = tempfile.mkstemp(prefix='clara-tts-', suffix=suffix, dir=audio_output_dir())
+    with os.fdopen(fd, 'wb') as f:
+        f.write(audio)
+    return path
+
+def encode_frame(frame, request_id=None, raw=False):
+    """Turn a stream_speech frame into a JSON-safe dict with base64 audio
+
+    With raw=True the audio bytes are kept as they are, for pack_frame.
+    """
+    encoded = {key: value for key, value in frame.items() if key != 'data'}
+    if 'data' in frame:
+        if raw:
+            encoded['audio'] = frame['data']
+        else:
+            import base64
+            encoded['audio'] = base64.b64encode(frame['data']).decode('utf-8')
+    if request_id is not None:
+        encoded['id'] = request_id
+    return encoded
+
+
+class HedgePolicy:
+    """When a slow Edge TTS stream gets a duplicate, and how many it may get
+
+    The hedge delay is the quantile (p90 by default) of the last WINDOW times
+    to first audio chunk, DEFAULT_DELAY until MIN_SAMPLES have been seen and
+    never below MIN_DELAY. Hedges are paid for from a token bucket: every
+    hedge-enabled stream earns max_ratio of a token, up to BURST, and a hedge
+    spends a whole one, so hedging adds at most max_ratio extra streams
+    beyond an initial BURST.
+    """
+
+    WINDOW = 200
+    MIN_SAMPLES = 20
+    QUANTILE = 0.9
+    # Seconds
+    DEFAULT_DELAY = 1.0
+    MIN_DELAY = 0.05
+    # A quantile of 0.9 sends about a tenth of streams past the delay, so the
+    # budget leaves headroom above that for bursts of slow ones
+    MAX_RATIO = 0.15
+    BURST = 10
+
+    def __init__(self, enabled=False, max_ratio=MAX_RATIO, quantile=QUANTILE):
+        self.enabled = enabled
+        self.max_ratio = max_ratio
+        self.quantile = quantile
+        self.samples = deque(maxlen=self.WINDOW)
+        self.tokens = float(self.BURST)
+
+    @classmethod
+    def from_env(cls):
+        """Policy from EDGE_TTS_HEDGE (1 hedges by default), EDGE_TTS_HEDGE_RATIO and EDGE_TTS_HEDGE_QUANTILE"""
+        return cls(
+            enabled=env_flag('EDGE_TTS_HEDGE', False),
+            max_ratio=env_fraction('EDGE_TTS_HEDGE_RATIO', cls.MAX_RATIO),
+            quantile=env_fraction('EDGE_TTS_HEDGE_QUANTILE', cls.QUANTILE)
+        )
+
+    def observe(self, seconds):
+        """Record one stream's time to first chunk"""
+        self.samples.append(seconds)
+
+    def delay(self):
+        """Seconds to wait for a first chunk before hedging"""
+        if len(self.samples) < self.MIN_SAMPLES:
+            return self.DEFAULT_DELAY
+        ordered = sorted(self.samples)
+        return max(self.MIN_DELAY, ordered[int(self.quantile * (len(ordered) - 1))])
+
+    def stream_started(self):
+        self.tokens = min(self.BURST, self.tokens + self.max_ratio)
+
+    def try_hedge(self):
+        """Spend a token on a hedge; False when the budget is used up"""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class TTSWorker:
+    """Long-running JSON-lines worker that keeps one EdgeTTSService warm
+
+    Each request line is a JSON object such as
+    {"id": 1, "text": "...", "language": "en", "voice": null, "emotional_context": "casual"}.
+    Requests run concurrently on one asyncio loop and every response line carries
+    the request id, so replies may come back out of order. Adding "stream": true
+    returns the audio as a series of sequence-numbered frames ending in an end frame,
+    and "timings": true adds per-stage timings to the result. "format" picks the
+    audio format (mp3, the default, mp3-low, opus or pcm; see AUDIO_FORMATS) of a
+    non-streaming request, and "hedge" turns duplicate requests for slow Edge TTS
+    streams on or off for it (see HedgePolicy). A request may give "template" and
+    "slots" instead of "text" (see EdgeTTSService.template_to_speech), such as
+    {"id": 3, "template": "Room {room} is on floor {floor}", "slots": {"room": "A12", "floor": 2}}.
+    Every request passes through a TTSScheduler:
+    "priority" is interactive, normal (the default) or bulk, and "deadline_ms"
+    is the time the caller will wait, after which the request is rejected or
+    cancelled with a "reason". While the service's CircuitBreaker refuses
+    syntheses, failures carry a "reason" of circuit_open or recent_failure and
+    "fallback": "browser_tts". A request of
+    {"id": 2, "op": "metrics", "format": "prometheus"} (or "json") returns the
+    worker's accumulated metrics instead of synthesizing.
+
+    Responses are JSON lines with base64 audio by default. A framed worker
+    writes every response as a pack_frame binary frame with the raw audio
+    instead, and "output": "file" on a request returns an audio_path to a file
+    holding the audio rather than the audio itself.
+    """
+
+    def __init__(self, tts_service=None, framed=False, scheduler=None):
+        self.tts_service = tts_service or EdgeTTSService()
+        self.framed = framed
+        self.scheduler = scheduler or TTSScheduler.from_env(metrics=self.tts_service.metrics)
+
+    async def handle_request(self, request, emit, scheduler=None):
+        """Synthesize one request and emit its id-tagged response line(s)
+
+        The request is admitted by scheduler, self.scheduler by default.
+        """
+        scheduler = scheduler or self.scheduler
+        if not isinstance(request, dict):
+            await emit({'id': None, 'success': False, 'error': 'Request must be a JSON object'})
+            return
+
+        request_id = request.get('id')
+        if request.get('op') == 'metrics':
+            await emit(self.metrics_response(request_id, request.get('format')))
+            return
+
+        text = request.get('text')
+        template = request.get('template')
+        if template is None and (not isinstance(text, str) or not text.strip()):
+            await emit({
+                'id': request_id,
+                'success': False,
+                'error': 'Text is required and must be a non-empty string'
+            })
+            return
+
+        voice = request.get('voice') or None
+        language = request.get('language') or None
+        emotional_context = request.get('emotional_context') or 'casual'
+        timings = bool(request.get('timings'))
+        to_file = request.get('output') == 'file'
+        priority = request.get('priority') or None
+        deadline = None
+        if request.get('deadline_ms') is not None:
+            try:
+                deadline = time.monotonic() + float(request['deadline_ms']) / 1000
+            except (TypeError, ValueError):
+                await emit({'id': request_id, 'success': False, 'error': 'deadline_ms must be a number'})
+                return
+
+        if template is not None and request.get('stream'):
+            await emit({'id': request_id, 'success': False, 'error': 'Template requests cannot be streamed'})
+            return
+
+        if request.get('stream'):
+            async def stream():
+                async for frame in self.tts_service.stream_speech(
+                    text, voice, language, emotional_context=emotional_context, timings=timings
+                ):
+                    await emit(encode_frame(frame, request_id, raw=self.framed))
+
+            try:
+                await scheduler.run(stream, priority, deadline)
+            except (AdmissionRejected, ValueError) as e:
+                await emit(encode_frame(
+                    {'type': 'error', 'success': False, 'error': str(e), 'reason': getattr(e, 'reason', None), 'text': text},
+                    request_id, raw=self.framed
+                ))
+            return
+
+        encoding = 'raw' if self.framed or to_file else 'base64'
+        audio_format = request.get('format') or DEFAULT_AUDIO_FORMAT
+        if template is not None:
+            def synthesize():
+                return self.tts_service.template_to_speech(
+                    template, request.get('slots'), voice, language, emotional_context=emotional_context,
+                    timings=timings, encoding=encoding, audio_format=audio_format
+                )
+        else:
+            def synthesize():
+                return self.tts_service.text_to_speech(
+                    text, voice, language, emotional_context=emotional_context, timings=timings,
+                    encoding=encoding, audio_format=audio_format,
+                    hedge=None if request.get('hedge') is None else bool(request['hedge'])
+                )
+        try:
+            result = await scheduler.run(synthesize, priority, deadline)
+        except (AdmissionRejected, ValueError) as e:
+            result = {'success': False, 'error': str(e), 'reason': getattr(e, 'reason', None), 'text': text or template}
+        if to_file and result.get('success'):
+            try:
+                result['audio_path'] = write_audio_file(result.pop('audio'), result['format'])
+            except OSError as e:
+                result = {'success': False, 'error': f'Failed to write audio file: {str(e)}', 'text': text}
+        result['id'] = request_id
+        await emit(result)
+
+    def serialize(self, response):
+        """Encode a response for the wire: a binary frame or a JSON line"""
+        if self.framed:
+            return pack_frame(response)
+        return (json.dumps(response) + '\n').encode('utf-8')
+
+    def metrics_response(self, request_id, output_format=None):
+        """The service metrics as Prometheus text (the default) or JSON"""
+        metrics = self.tts_service.metrics
+        if output_format == 'json':
+            return {'id': request_id, 'success': True, 'format': 'json', 'metrics': metrics.to_json()}
+        if output_format not in (None, 'prometheus'):
+            return {'id': request_id, 'success': False, 'error': f'Unknown metrics format: {output_format}'}
+        return {'id': request_id, 'success': True, 'format': 'prometheus', 'metrics': metrics.to_prometheus()}
+
+    async def handle_line(self, line, emit, scheduler=None):
+        """Decode one request line and emit the response"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            await emit({'id': None, 'success': False, 'error': f'Invalid JSON request: {str(e)}'})
+            return
+        await self.handle_request(request, emit, scheduler)
+
+    async def run_batch(self, items, emit, concurrency=4):
+        """Run many requests with at most concurrency in flight
+
+        items yields request dicts or raw JSON lines. Results are emitted in
+        completion order, and a failing item is reported on its own line
+        without stopping the rest of the batch. The batch gets a scheduler of
+        its own sized to concurrency, so the worker's queue limit never sheds
+        items the caller sized the batch for; item deadlines still apply.
+        """
+        items = iter(items)
+        concurrency = max(1, concurrency)
+        scheduler = TTSScheduler(max_active=concurrency, max_queue=concurrency, metrics=self.tts_service.metrics)
+
+        async def drain():
+            # Each drain task pulls the next item as soon as its previous one finishes
+            for item in items:
+                try:
+                    if isinstance(item, str):
+                        await self.handle_line(item, emit, scheduler)
+                    else:
+                        await self.handle_request(item, emit, scheduler)
+                except Exception as e:
+                    request_id = item.get('id') if isinstance(item, dict) else None
+                    await emit({'id': request_id, 'success': False, 'error': str(e)})
+
+        await asyncio.gather(*(drain() for _ in range(concurrency)))
+
+    async def serve_stdio(self):
+        """Serve requests from stdin and write responses to stdout until EOF"""
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        async def emit(response):
+            sys.stdout.buffer.write(self.serialize(response))
+            sys.stdout.buffer.flush()
+
+        while True:
+            # Blocking readline runs in a thread so this also works on Windows,
+            # where stdin pipes cannot be attached to the event loop
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self.handle_line(line, emit))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def serve_unix(self, socket_path):
+        """Serve JSON-lines requests on a Unix domain socket"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        async def handle_connection(reader, writer):
+            write_lock = asyncio.Lock()
+            pending = set()
+
+            async def emit(response):
+                async with write_lock:
+                    writer.write(self.serialize(response))
+                    await writer.drain()
+
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+                    task = asyncio.create_task(self.handle_line(line.decode('utf-8'), emit))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle_connection, path=socket_path, limit=2 ** 20)
+        sys.stderr.write(f'Edge TTS worker listening on {socket_path}\n')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
+
+
+async def serve(args):
+    """Run the persistent worker: --serve [--framed] [--socket <path>] [--workers <n>] [--profile <fraction>]
+
+    With EDGE_TTS_POOL_SIZE above 0 the worker keeps that many backend
+    connections warm (see edgeTTSSessions.py) for the life of the process.
+    With more than one worker (--workers, else EDGE_TTS_WORKERS) this process
+    supervises that many worker processes instead (see edgeTTSSupervisor.py).
+    --profile (else EDGE_TTS_PROFILE) profiles that fraction of requests (see
+    RequestProfiler).
+    """
+    usage = 'Usage: python edgeTTS.py --serve [--framed] [--socket <path>] [--workers <n>] [--profile <fraction>]'
+    if '--socket' in args:
+        index = args.index('--socket')
+        if index + 1 >= len(args):
+            print(json.dumps({'success': False, 'error': usage}))
+            return
+        if not hasattr(asyncio, 'start_unix_server'):
+            print(json.dumps({'success': False, 'error': 'Unix sockets are not supported on this platform'}))
+            return
+    workers = env_limit('EDGE_TTS_WORKERS', 1)
+    if '--workers' in args:
+        index = args.index('--workers')
+        try:
+            workers = int(args[index + 1])
+        except (IndexError, ValueError):
+            workers = 0
+        if workers < 1:
+            print(json.dumps({'success': False, 'error': usage}))
+            return
+    if '--profile' in args:
+        index = args.index('--profile')
+        try:
+            fraction = float(args[index + 1])
+        except (IndexError, ValueError):
+            fraction = -1
+        if not 0 <= fraction <= 1:
+            print(json.dumps({'success': False, 'error': usage}))
+            return
+        # Through the environment, so supervised worker processes sample too
+        os.environ['EDGE_TTS_PROFILE'] = str(fraction)
+
+    if workers > 1:
+        from edgeTTSSupervisor import TTSSupervisor
+        supervisor = TTSSupervisor(workers, TTSMetrics(), framed='--framed' in args)
+        if '--socket' in args:
+            await supervisor.serve_unix(args[args.index('--socket') + 1])
+        else:
+            await supervisor.serve_stdio()
+        return
+
+    from edgeTTSSessions import EdgeSessionPool
+    tts_service = EdgeTTSService()
+    tts_service.session_pool = EdgeSessionPool.from_env(metrics=tts_service.metrics)
+    if tts_service.session_pool is not None:
+        tts_service.session_pool.start()
+    worker = TTSWorker(tts_service, framed='--framed' in args)
+    try:
+        if '--socket' in args:
+            await worker.serve_unix(args[args.index('--socket') + 1])
+        else:
+            await worker.serve_stdio()
+    finally:
+        if tts_service.session_pool is not None:
+            await tts_service.session_pool.close()
+
+def _read_batch_items(path):
+    """Yield batch items from a JSON array file or, line by line, from JSONL"""
+    if path == '-':
+        for line in sys.stdin:
+            if line.strip():
+                yield line
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.json'):
+            data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError('Batch JSON file must contain an array of requests')
+            yield from data
+            return
+        for line in f:
+            if line.strip():
+                yield line
+
+async def batch(args):
+    """Run a batch file: --batch <file.json|file.jsonl|-> [--concurrency <n>]"""
+    usage = 'Usage: python edgeTTS.py --batch <file.json|file.jsonl|-> [--concurrency <n>]'
+    concurrency = 4
+    if '--concurrency' in args:
+        index = args.index('--concurrency')
+        try:
+            concurrency = int(args[index + 1])
+        except (IndexError, ValueError):
+            print(json.dumps({'success': False, 'error': usage}))
+            return
+        del args[index:index + 2]
+    if len(args) != 1:
+        print(json.dumps({'success': False, 'error': usage}))
+        return
+
+    counts = {'succeeded': 0, 'failed': 0}
+
+    async def emit(result):
+        counts['succeeded' if result.get('success') else 'failed'] += 1
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+
+    try:
+        await TTSWorker().run_batch(_read_batch_items(args[0]), emit, concurrency)
+    except (OSError, ValueError) as e:
+        print(json.dumps({'success': False, 'error': f'Failed to read batch: {str(e)}'}))
+        return
+    sys.stderr.write(f"Batch finished: {counts['succeeded']} succeeded, {counts['failed']} failed\n")
+
+async def build_pack(args):
+    """Render the phrase bank: --build-pack [path] [--languages <a,b,...>]"""
+    usage = 'Usage: python edgeTTS.py --build-pack [path] [--languages <a,b,...>]'
+    languages = None
+    if '--languages' in args:
+        index = args.index('--languages')
+        if index + 1 >= len(args):
+            print(json.dumps({'success': False, 'error': usage}))
+            return
+        # 'auto' selects the detected-language variant of each phrase
+        languages = [
+            None if language.strip() == 'auto' else language.strip()
+            for language in args[index + 1].split(',') if language.strip()
+        ]
+        del args[index:index + 2]
+    if len(args) > 1:
+        print(json.dumps({'success': False, 'error': usage}))
+        return
+
+    path = args[0] if args else PhraseBank.default_path()
+
+    tts_service = EdgeTTSService()
+    try:
+        written, failed = await tts_service.build_phrase_bank(path, languages)
+    except OSError as e:
+        print(json.dumps({'success': False, 'error': f'Failed to write phrase bank: {str(e)}'}))
+        return
+    print(json.dumps({'success': True, 'path': path, 'entries': written, 'failed': failed}))
+
 async def main():
     """Main function for command line usage"""
-    if len(sys.argv) < 2:
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        await serve(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        await batch(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == '--build-pack':
+        await build_pack(sys.argv[2:])
+        return
+
+    args = sys.argv[1:]
+    stream = '--stream' in args
+    if stream:
+        args.remove('--stream')
+    timings = '--timings' in args
+    if timings:
+        args.remove('--timings')
+    # json (base64 audio, the default), binary (pack_frame frames) or file (audio_path)
+    output = 'json'
+    if '--output' in args:
+        index = args.index('--output')
+        output = args[index + 1] if index + 1 < len(args) else None
+        del args[index:index + 2]
+    # Delivered audio format; streams always carry the backend's own format
+    audio_format = None
+    if '--format' in args:
+        index = args.index('--format')
+        audio_format = args[index + 1] if index + 1 < len(args) else ''
+        del args[index:index + 2]
+
+    if (len(args) < 1 or output not in ('json', 'binary', 'file') or (stream and output == 'file')
+            or (audio_format is not None and (stream or audio_format not in AUDIO_FORMATS))):
         print(json.dumps({
             'success': False,
-            'error': 'Usage: python edgeTTS.py <text_or_file_path> [language] [voice]'
+            'error': 'Usage: python edgeTTS.py [--stream] [--timings] [--output json|binary|file] [--format mp3|mp3-low|opus|pcm] <text_or_file_path> [language] [voice] [emotional_context] | --serve [--framed] [--socket <path>] [--workers <n>] [--profile <fraction>] | --batch <file> [--concurrency <n>] | --build-pack [path] [--languages <a,b>]'
         }))
         return
     
     # Check if first argument is a file path or direct text
-    input_arg = sys.argv[1]
-    language = sys.argv[2] if len(sys.argv) > 2 else None
-    voice = sys.argv[3] if len(sys.argv) > 3 else None
-    emotional_context = sys.argv[4] if len(sys.argv) > 4 else 'casual'
+    input_arg = args[0]
+    language = args[1] if len(args) > 1 else None
+    voice = args[2] if len(args) > 2 else None
+    emotional_context = args[3] if len(args) > 3 else 'casual'
     
     # Check if input is a file path (contains path separators or exists as file)
     if os.path.exists(input_arg) and os.path.isfile(input_arg):
@@ -600,7 +2919,32 @@ async def main():
         text = input_arg
 
     tts_service = EdgeTTSService()
-    result = await tts_service.text_to_speech(text, voice, language, emotional_context=emotional_context)
+
+    if stream:
+        # One JSON line (or binary frame) per audio frame so the caller can start playback immediately
+        async for frame in tts_service.stream_speech(text, voice, language, emotional_context=emotional_context, timings=timings):
+            if output == 'binary':
+                sys.stdout.buffer.write(pack_frame(encode_frame(frame, raw=True)))
+                sys.stdout.buffer.flush()
+            else:
+                sys.stdout.write(json.dumps(encode_frame(frame)) + '\n')
+                sys.stdout.flush()
+        return
+
+    result = await tts_service.text_to_speech(
+        text, voice, language, emotional_context=emotional_context, timings=timings,
+        encoding='base64' if output == 'json' else 'raw', audio_format=audio_format or DEFAULT_AUDIO_FORMAT
+    )
+
+    if output == 'binary':
+        sys.stdout.buffer.write(pack_frame(result))
+        sys.stdout.buffer.flush()
+        return
+    if output == 'file' and result.get('success'):
+        try:
+            result['audio_path'] = write_audio_file(result.pop('audio'), result['format'])
+        except OSError as e:
+            result = {'success': False, 'error': f'Failed to write audio file: {str(e)}', 'text': text}
     
     print(json.dumps(result))
 
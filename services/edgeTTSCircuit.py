@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker for the Edge TTS backend
+Counts the outcome of every synthesis that reaches Edge TTS and, while the
+backend keeps failing or starting slowly, refuses new ones at once so the
+caller can fall back (cached audio, the browser voice) instead of waiting on
+a connect timeout.
+
+Used by every EdgeTTSService; switched by EDGE_TTS_CIRCUIT.
+"""
+
+import asyncio
+import sys
+import time
+from collections import deque
+
+from edgeTTSSettings import env_flag, env_seconds
+
+
+class BackendUnavailable(Exception):
+    """A synthesis refused without contacting Edge TTS
+
+    reason is circuit_open (the backend is failing or slow) or recent_failure
+    (the same request failed moments ago).
+    """
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _is_backend_failure(error):
+    """Whether error says Edge TTS is unreachable or failing, not that the request was bad
+
+    Network errors, timeouts, aiohttp errors and edge_tts's protocol errors are
+    backend failures. NoAudioReceived (text with nothing to speak, such as bare
+    punctuation) and local errors like a failed transcode are not.
+    """
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+    for cls in type(error).__mro__:
+        module = cls.__module__.split('.')[0]
+        if module == 'aiohttp':
+            return True
+        if module == 'edge_tts':
+            return cls.__name__ != 'NoAudioReceived'
+    return False
+
+
+class CircuitBreaker:
+    """Fails new syntheses fast while Edge TTS is down or degraded
+
+    Closed, it keeps the outcomes of the last WINDOW seconds of syntheses and
+    opens after CONSECUTIVE_FAILURES failures in a row, or once MIN_CALLS have
+    run and FAILURE_RATE of them failed or SLOW_RATE of them waited slow_call
+    seconds or more for their first chunk. Open, it refuses every synthesis
+    for a cool-down of OPEN_SECONDS, doubled after each failed probe up to
+    MAX_OPEN_SECONDS. Then it is half-open and lets PROBES syntheses through:
+    a prompt success closes it, a failure or slow call opens it again.
+
+    Only backend failures (see _is_backend_failure) count as failures; an
+    error caused by the request itself means the backend answered, so it
+    counts like a prompt success.
+
+    Separately, a request whose synthesis hit a backend failure is refused for
+    FAILURE_TTL seconds (the failure cache), so retries don't reach the backend.
+    """
+
+    WINDOW = 30
+    MIN_CALLS = 10
+    CONSECUTIVE_FAILURES = 3
+    FAILURE_RATE = 0.5
+    SLOW_RATE = 0.5
+    SLOW_CALL = 4.0
+    OPEN_SECONDS = 5
+    MAX_OPEN_SECONDS = 60
+    PROBES = 1
+    FAILURE_TTL = 10
+    MAX_CACHED_FAILURES = 1024
+
+    def __init__(self, enabled=True, slow_call=SLOW_CALL, metrics=None, clock=time.monotonic):
+        self.enabled = enabled
+        self.slow_call = slow_call
+        self.metrics = metrics
+        self.clock = clock
+        self.state = 'closed'
+        self.cooldown = self.OPEN_SECONDS
+        self.opened_until = 0
+        self.probing = 0
+        self.consecutive_failures = 0
+        # (finished at, failed, slow) for the calls of the last WINDOW seconds
+        self._calls = deque()
+        # Request key -> time its failure stops being served from the failure cache
+        self._failures = {}
+
+    @classmethod
+    def from_env(cls, metrics=None):
+        """Breaker switched by EDGE_TTS_CIRCUIT (on by default) with EDGE_TTS_CIRCUIT_SLOW_SECONDS"""
+        return cls(
+            enabled=env_flag('EDGE_TTS_CIRCUIT', True),
+            slow_call=env_seconds('EDGE_TTS_CIRCUIT_SLOW_SECONDS', cls.SLOW_CALL),
+            metrics=metrics
+        )
+
+    def admit(self, key=None):
+        """Let a synthesis of key through; True when it is a half-open probe
+
+        Raises BackendUnavailable while the circuit is open or key failed recently.
+        """
+        if not self.enabled:
+            return False
+        now = self.clock()
+        expires = self._failures.get(key) if key is not None else None
+        if expires is not None:
+            if expires > now:
+                self._reject('recent_failure', 'Edge TTS failed on this request moments ago')
+            del self._failures[key]
+        if self.state == 'open':
+            if now < self.opened_until:
+                self._reject('circuit_open', f'Edge TTS is unavailable; retrying in {self.opened_until - now:.0f}s')
+            self._transition('half_open')
+        if self.state == 'half_open':
+            if self.probing >= self.PROBES:
+                self._reject('circuit_open', 'Edge TTS is unavailable; a probe request is in flight')
+            self.probing += 1
+            return True
+        return False
+
+    def record(self, probe, first_chunk=None, error=None, key=None):
+        """Count one admitted synthesis: its time to first chunk in seconds, or the error it raised"""
+        if not self.enabled:
+            return
+        now = self.clock()
+        if probe:
+            self.probing -= 1
+        # Only backend failures count; a request Edge TTS rejected still reached a working backend
+        request_error = error is not None and not _is_backend_failure(error)
+        failed = error is not None and not request_error
+        slow = error is None and first_chunk is not None and first_chunk >= self.slow_call
+        if failed and key is not None:
+            self._failures.pop(key, None)
+            self._failures[key] = now + self.FAILURE_TTL
+            if len(self._failures) > self.MAX_CACHED_FAILURES:
+                del self._failures[next(iter(self._failures))]
+        if self.metrics is not None:
+            outcome = 'failure' if failed else 'request_error' if request_error else 'slow' if slow else 'success'
+            self.metrics.inc('circuit_calls_total', outcome=outcome)
+
+        if probe:
+            if failed or slow:
+                self._open(now, self.cooldown * 2)
+            else:
+                self._close()
+            return
+        if self.state != 'closed':
+            # A call admitted before the circuit opened
+            return
+        self.consecutive_failures = self.consecutive_failures + 1 if failed else 0
+        self._calls.append((now, failed, slow))
+        while self._calls and self._calls[0][0] < now - self.WINDOW:
+            self._calls.popleft()
+        calls = len(self._calls)
+        if self.consecutive_failures >= self.CONSECUTIVE_FAILURES:
+            self._open(now, self.OPEN_SECONDS)
+        elif calls >= self.MIN_CALLS and (
+            sum(call[1] for call in self._calls) >= self.FAILURE_RATE * calls
+            or sum(call[2] for call in self._calls) >= self.SLOW_RATE * calls
+        ):
+            self._open(now, self.OPEN_SECONDS)
+
+    def release(self, probe):
+        """Forget an admitted synthesis that was cancelled before it finished"""
+        if probe:
+            self.probing -= 1
+
+    def _open(self, now, cooldown):
+        self.cooldown = min(self.MAX_OPEN_SECONDS, cooldown)
+        self.opened_until = now + self.cooldown
+        self._calls.clear()
+        self.consecutive_failures = 0
+        self._transition('open')
+        sys.stderr.write(f'⚠️ Edge TTS circuit open for {self.cooldown:g}s\n')
+
+    def _close(self):
+        self.cooldown = self.OPEN_SECONDS
+        self._transition('closed')
+        sys.stderr.write('✅ Edge TTS circuit closed\n')
+
+    def _transition(self, state):
+        self.state = state
+        if self.metrics is not None:
+            self.metrics.inc('circuit_transitions_total', state=state)
+            self.metrics.set_gauge('circuit_open', 1 if state == 'open' else 0)
+
+    def _reject(self, reason, message):
+        if self.metrics is not None:
+            self.metrics.inc('circuit_rejected_total', reason=reason)
+        raise BackendUnavailable(reason, message)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Binary frames for the Edge TTS worker protocol
+Each frame is a u32 header length, a JSON header, a u32 audio length and the
+raw audio, so framed output carries audio without base64. Written by the
+worker with --framed and read back by the supervisor and the load test.
+"""
+
+import json
+import struct
+
+# Both lengths are big-endian u32
+FRAME_LENGTH = struct.Struct('>I')
+
+
+def pack_frame(response, audio_field='audio'):
+    """Serialize a response as one binary frame, moving audio_field out of the JSON header"""
+    header = dict(response)
+    audio = header.pop(audio_field, None)
+    if not isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = b''
+    header_bytes = json.dumps(header).encode('utf-8')
+    return b''.join((
+        FRAME_LENGTH.pack(len(header_bytes)), header_bytes,
+        FRAME_LENGTH.pack(len(audio)), audio
+    ))
+
+
+async def read_frame(reader, audio_field='audio'):
+    """Read one pack_frame frame from an asyncio stream back into a response
+
+    Raises asyncio.IncompleteReadError at the end of the stream and ValueError
+    for a header that is not JSON.
+    """
+    header = await reader.readexactly(FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))[0])
+    response = json.loads(header)
+    audio = await reader.readexactly(FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))[0])
+    if audio:
+        response[audio_field] = audio
+    return response
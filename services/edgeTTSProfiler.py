@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Sampled request profiling for the Edge TTS worker
+Runs a random fraction of requests under cProfile and tracemalloc and writes
+each profile to disk, so a production worker can be profiled without paying
+for it on every request.
+
+Used by TTSWorker; off unless EDGE_TTS_PROFILE (or --profile) is above 0.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from edgeTTSSettings import env_fraction, env_limit
+
+
+class RequestProfiler:
+    """Profiles a random sample of requests with cProfile and tracemalloc
+
+    A sampled request runs with a cProfile profiler enabled and tracemalloc
+    tracing, one request at a time: a request sampled while another is being
+    profiled is not. cProfile sees the whole event loop, so the profile also
+    holds the work of requests running alongside. Each profile is written to
+    directory as <stem>.prof (pstats.Stats, snakeviz, flameprof), <stem>.tracemalloc
+    (tracemalloc.Snapshot.load) and, last, <stem>.json with the request
+    metadata and top allocation sites; only the newest keep profiles are kept.
+    A request that is not sampled costs one random() call.
+    """
+
+    KEEP = 50
+    TRACE_FRAMES = 16
+    TOP_ALLOCATIONS = 25
+    SUFFIXES = ('.prof', '.tracemalloc', '.json')
+
+    def __init__(self, rate=0.0, directory=None, keep=KEEP, metrics=None):
+        self.rate = rate
+        self.directory = directory
+        self.keep = keep
+        self.metrics = metrics
+        self.active = False
+        self._sequence = 0
+        self._random = None
+        if rate > 0:
+            import random
+            import tempfile
+            self._random = random.random
+            self.directory = directory or os.path.join(tempfile.gettempdir(), 'clara-tts-profiles')
+
+    @classmethod
+    def from_env(cls, metrics=None):
+        """Profiler sampling the EDGE_TTS_PROFILE fraction of requests (off by default)
+
+        Profiles go to EDGE_TTS_PROFILE_DIR, keeping the newest EDGE_TTS_PROFILE_KEEP.
+        """
+        return cls(
+            rate=env_fraction('EDGE_TTS_PROFILE', 0.0),
+            directory=os.environ.get('EDGE_TTS_PROFILE_DIR'),
+            keep=env_limit('EDGE_TTS_PROFILE_KEEP', cls.KEEP),
+            metrics=metrics
+        )
+
+    def sample(self):
+        """Start profiling if this request is sampled; returns the session for finish, else None"""
+        if self._random is None or self.active or self._random() >= self.rate:
+            return None
+        import cProfile
+        import tracemalloc
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler, such as a debugger or coverage tool, holds the hooks
+            self._count('busy')
+            return None
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start(self.TRACE_FRAMES)
+        self.active = True
+        return {'profiler': profiler, 'was_tracing': tracing, 'started_at': time.time(), 'started': time.perf_counter()}
+
+    def finish(self, session, metadata):
+        """Stop profiling and write the profile with metadata from a background thread"""
+        import tracemalloc
+        session['profiler'].disable()
+        profiled_ms = round((time.perf_counter() - session['started']) * 1000, 3)
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not session['was_tracing']:
+            tracemalloc.stop()
+        self.active = False
+        self._count('sampled')
+
+        self._sequence += 1
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(session['started_at']))
+        stem = os.path.join(self.directory, f'{stamp}-{os.getpid()}-{self._sequence:06d}')
+        record = dict(metadata, pid=os.getpid(), started_at=session['started_at'], profiled_ms=profiled_ms, traced_peak_bytes=peak)
+        asyncio.get_running_loop().run_in_executor(None, self._write, stem, session['profiler'], snapshot, record)
+
+    def _write(self, stem, profiler, snapshot, record):
+        import tracemalloc
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(stem + '.prof')
+            snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+            snapshot.dump(stem + '.tracemalloc')
+            record['top_allocations'] = [
+                {'where': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:self.TOP_ALLOCATIONS]
+            ]
+            with open(stem + '.json', 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=2, default=str)
+            self._prune()
+        except OSError as e:
+            sys.stderr.write(f'⚠️ Could not write request profile {stem}: {str(e)}\n')
+
+    def _prune(self):
+        """Delete all but the newest keep profiles; names sort by start time"""
+        stems = sorted({
+            name[:-len(suffix)] for name in os.listdir(self.directory)
+            for suffix in self.SUFFIXES if name.endswith(suffix)
+        })
+        for stem in stems[:-self.keep]:
+            for suffix in self.SUFFIXES:
+                try:
+                    os.unlink(os.path.join(self.directory, stem + suffix))
+                except OSError:
+                    # Already gone, or pruned by another worker process
+                    pass
+
+    def _count(self, outcome):
+        if self.metrics is not None:
+            self.metrics.inc('profiles_total', outcome=outcome)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Admission control for the Edge TTS worker
+Bounds how many speech requests run at once and queues the rest by priority
+class, shedding or rejecting work once the queue is full or a request's
+deadline cannot be met.
+
+Used by TTSWorker for --serve and --batch; sized by EDGE_TTS_MAX_ACTIVE and
+EDGE_TTS_QUEUE_LIMIT.
+"""
+
+import asyncio
+import heapq
+import time
+from types import MappingProxyType
+
+from edgeTTSSettings import env_limit
+
+
+class AdmissionRejected(Exception):
+    """A request the scheduler turned away or gave up on
+
+    reason is queue_full, shed (displaced by a higher priority request) or deadline.
+    """
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class TTSScheduler:
+    """Priority admission control in front of text_to_speech and stream_speech
+
+    At most max_active requests run at once. The rest wait in a queue of at
+    most max_queue entries and are started by priority class, then in arrival
+    order. When the queue is full, a newcomer displaces the newest queued
+    request of a lower class, or is rejected itself.
+
+    A request may carry a deadline (a time.monotonic() value). It is rejected
+    on arrival when the estimated queue wait alone would overrun it, dropped if
+    it is still queued at the deadline and cancelled if it is still running
+    then. The wait estimate scales an EWMA of recent run times by the number of
+    requests queued ahead.
+    """
+
+    PRIORITIES = MappingProxyType({'interactive': 0, 'normal': 1, 'bulk': 2})
+    DEFAULT_PRIORITY = 'normal'
+    MAX_ACTIVE = 8
+    MAX_QUEUE = 64
+    # Weight of the newest run in the run time estimate
+    EWMA_WEIGHT = 0.2
+
+    def __init__(self, max_active=MAX_ACTIVE, max_queue=MAX_QUEUE, metrics=None):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.metrics = metrics
+        self.active = 0
+        self.run_estimate = None
+        # Heap of (priority rank, arrival sequence, future); a done future is a dead entry
+        self._queue = []
+        self._sequence = 0
+        self._depth = {priority: 0 for priority in self.PRIORITIES}
+
+    @classmethod
+    def from_env(cls, metrics=None):
+        """Scheduler sized by EDGE_TTS_MAX_ACTIVE and EDGE_TTS_QUEUE_LIMIT"""
+        return cls(
+            max_active=env_limit('EDGE_TTS_MAX_ACTIVE', cls.MAX_ACTIVE),
+            max_queue=env_limit('EDGE_TTS_QUEUE_LIMIT', cls.MAX_QUEUE),
+            metrics=metrics
+        )
+
+    @property
+    def queued(self):
+        return sum(self._depth.values())
+
+    async def run(self, factory, priority=None, deadline=None):
+        """Await factory() once admitted and return its result
+
+        Raises AdmissionRejected when the request is turned away, expires in
+        the queue or is cancelled at its deadline.
+        """
+        priority = priority or self.DEFAULT_PRIORITY
+        if priority not in self.PRIORITIES:
+            raise ValueError(f'Unknown priority: {priority} (use one of {", ".join(self.PRIORITIES)})')
+        enqueued = time.monotonic()
+        if deadline is not None and deadline <= enqueued:
+            self._reject(priority, 'deadline', 'Deadline already passed')
+
+        if self.active < self.max_active and not self.queued:
+            self.active += 1
+        else:
+            await self._wait(priority, deadline)
+        started = time.monotonic()
+        self._report(priority, queue_wait=started - enqueued)
+
+        try:
+            if deadline is None:
+                return await factory()
+            try:
+                return await asyncio.wait_for(factory(), deadline - started)
+            except asyncio.TimeoutError:
+                if time.monotonic() < deadline:
+                    raise
+                self._reject(priority, 'deadline', 'Deadline exceeded while running')
+        finally:
+            elapsed = time.monotonic() - started
+            self.run_estimate = elapsed if self.run_estimate is None else (
+                self.EWMA_WEIGHT * elapsed + (1 - self.EWMA_WEIGHT) * self.run_estimate
+            )
+            self.active -= 1
+            self._dispatch()
+
+    async def _wait(self, priority, deadline):
+        rank = self.PRIORITIES[priority]
+        if deadline is not None and self.run_estimate is not None:
+            ahead = sum(1 for queued_rank, _, future in self._queue if queued_rank <= rank and not future.done())
+            if time.monotonic() + (ahead + 1) * self.run_estimate / self.max_active > deadline:
+                self._reject(priority, 'deadline', 'Request cannot start before its deadline')
+
+        if self.queued >= self.max_queue:
+            victim = max((entry for entry in self._queue if not entry[2].done()), default=None)
+            if victim is None or victim[0] <= rank:
+                self._reject(priority, 'queue_full', 'TTS queue is full')
+            victim_priority = self._priority_name(victim[0])
+            self._dequeued(victim_priority)
+            self._count_rejection(victim_priority, 'shed')
+            victim[2].set_exception(AdmissionRejected('shed', 'Displaced by a higher priority request'))
+
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._queue, (rank, self._sequence, future))
+        self._depth[priority] += 1
+        self._report(priority)
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(priority, future)
+            raise
+        if not future.done():
+            self._abandon(priority, future)
+            self._reject(priority, 'deadline', 'Deadline exceeded while queued')
+        # Raises AdmissionRejected for a request that was shed or expired in the queue
+        future.result()
+
+    def _abandon(self, priority, future):
+        """Give up a queue entry, handing back the slot if one was granted meanwhile"""
+        if future.done():
+            if not future.cancelled() and future.exception() is None:
+                self.active -= 1
+                self._dispatch()
+            return
+        future.cancel()
+        self._dequeued(priority)
+
+    def _dispatch(self):
+        """Start queued requests, best class first, while slots are free"""
+        while self.active < self.max_active and self._queue:
+            rank, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._dequeued(self._priority_name(rank))
+            self.active += 1
+            future.set_result(None)
+        if self.metrics is not None:
+            self.metrics.set_gauge('active_requests', self.active)
+
+    def _dequeued(self, priority):
+        self._depth[priority] -= 1
+        if self.metrics is not None:
+            self.metrics.set_gauge('queue_depth', self._depth[priority], priority=priority)
+
+    def _priority_name(self, rank):
+        return next(name for name, value in self.PRIORITIES.items() if value == rank)
+
+    def _report(self, priority, queue_wait=None):
+        if self.metrics is None:
+            return
+        self.metrics.set_gauge('queue_depth', self._depth[priority], priority=priority)
+        self.metrics.set_gauge('active_requests', self.active)
+        if queue_wait is not None:
+            self.metrics.observe('queue_wait_seconds', queue_wait, priority=priority)
+
+    def _count_rejection(self, priority, reason):
+        if self.metrics is not None:
+            self.metrics.inc('rejected_total', priority=priority, reason=reason)
+
+    def _reject(self, priority, reason, message):
+        self._count_rejection(priority, reason)
+        raise AdmissionRejected(reason, message)
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Warm WebSocket session pool for the Edge TTS backend
+Keeps a few connections to the speech service open and runs synthesis turns
+over them, so a request skips the TLS and WebSocket handshake that every
+edge_tts.Communicate pays
+
+Loaded by edgeTTS.py only when EDGE_TTS_POOL_SIZE is set above 0. aiohttp and
+the endpoint constants come from the edge_tts installation.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from xml.sax.saxutils import escape
+
+from edgeTTSSettings import env_limit, env_seconds
+
+# Sent once per connection; every later turn on the session reuses it, so the
+# audio format is fixed for the life of a session
+SPEECH_CONFIG = (
+    'Content-Type:application/json; charset=utf-8\r\n'
+    'Path:speech.config\r\n\r\n'
+    '{{"context":{{"synthesis":{{"audio":{{"metadataoptions":{{'
+    '"sentenceBoundaryEnabled":"false","wordBoundaryEnabled":"true"}},'
+    '"outputFormat":"{output_format}"'
+    '}}}}}}}}\r\n'
+)
+
+# The format edge_tts.Communicate always asks for
+DEFAULT_OUTPUT_FORMAT = 'audio-24khz-48kbitrate-mono-mp3'
+
+# The service rejects a turn whose escaped text is longer than this; edge_tts
+# splits such texts itself, so they skip the pool
+MAX_TURN_BYTES = 4096
+
+
+class PoolUnavailable(Exception):
+    """No warm session can take the request; the caller connects directly instead"""
+
+
+def _date_string():
+    """Javascript-style timestamp the service expects in X-Timestamp"""
+    return time.strftime('%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)', time.gmtime())
+
+
+def _voice_name(voice):
+    """Expand a short name such as en-IN-NeerjaNeural to the service's long form"""
+    if voice.startswith('Microsoft Server Speech Text to Speech Voice'):
+        return voice
+    lang, region, name = voice.split('-', 2)
+    if '-' in name:
+        # Regional variants such as zh-CN-liaoning-XiaobeiNeural
+        region = f'{region}-{name.split("-", 1)[0]}'
+        name = name.split('-', 1)[1]
+    return f'Microsoft Server Speech Text to Speech Voice ({lang}-{region}, {name})'
+
+
+def _escaped_text(text):
+    """Text with the control characters the service rejects blanked out, XML-escaped"""
+    cleaned = ''.join(' ' if ord(ch) < 32 and ch not in '\t\n\r' else ch for ch in text)
+    return escape(cleaned)
+
+
+def _parse_headers(block):
+    """Header lines of a service message as a dict of str to str"""
+    headers = {}
+    for line in block.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name:
+            headers[name.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+    return headers
+
+
+class EdgeSession:
+    """One open WebSocket to the speech service
+
+    A reader task demultiplexes incoming messages by X-RequestId into one
+    queue per turn, so several turns may share the connection.
+    """
+
+    def __init__(self, pool, output_format=DEFAULT_OUTPUT_FORMAT):
+        self.pool = pool
+        self.output_format = output_format
+        self.http = None
+        self.ws = None
+        self.reader = None
+        self.turns = {}
+        self.opened_at = None
+        self.uses = 0
+        self.active = 0
+        self.closed = False
+
+    async def open(self):
+        """Connect, send the speech config and start reading"""
+        import aiohttp  # pyright: ignore[reportMissingImports]
+        self.http = aiohttp.ClientSession(
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.pool.connect_timeout)
+        )
+        try:
+            self.ws = await self.pool.connect(self.http)
+            await self.ws.send_str(
+                f'X-Timestamp:{_date_string()}\r\n' + SPEECH_CONFIG.format(output_format=self.output_format)
+            )
+        except BaseException:
+            await self.http.close()
+            self.closed = True
+            raise
+        self.opened_at = time.monotonic()
+        self.reader = asyncio.create_task(self._read_loop())
+
+    def usable(self):
+        """Whether the session may start another turn"""
+        if self.closed or self.opened_at is None:
+            return False
+        if self.uses >= self.pool.max_uses:
+            return False
+        return time.monotonic() - self.opened_at < self.pool.max_age
+
+    async def _read_loop(self):
+        import aiohttp  # pyright: ignore[reportMissingImports]
+        error = ConnectionError('Edge TTS session closed')
+        try:
+            async for message in self.ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    head, _, _ = message.data.encode('utf-8').partition(b'\r\n\r\n')
+                    headers = _parse_headers(head)
+                    queue = self.turns.get(headers.get('X-RequestId'))
+                    if queue is not None and headers.get('Path') == 'turn.end':
+                        queue.put_nowait(None)
+                elif message.type == aiohttp.WSMsgType.BINARY:
+                    data = message.data
+                    if len(data) < 2:
+                        continue
+                    header_length = int.from_bytes(data[:2], 'big')
+                    headers = _parse_headers(data[2:2 + header_length])
+                    audio = data[2 + header_length:]
+                    queue = self.turns.get(headers.get('X-RequestId'))
+                    if queue is not None and headers.get('Path') == 'audio' and audio:
+                        queue.put_nowait(audio)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    error = ConnectionError(f'Edge TTS session failed: {self.ws.exception()}')
+                    break
+        except Exception as e:
+            error = ConnectionError(f'Edge TTS session failed: {str(e)}')
+        finally:
+            self.closed = True
+            for queue in self.turns.values():
+                queue.put_nowait(error)
+            self.pool.wake()
+
+    async def stream(self, text, voice, rate='+0%', pitch='+0Hz', volume='+0%'):
+        """Run one synthesis turn, yielding edge_tts-style audio chunks"""
+        request_id = uuid.uuid4().hex
+        queue = asyncio.Queue()
+        self.turns[request_id] = queue
+        ssml = (
+            "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+            f"<voice name='{_voice_name(voice)}'>"
+            f"<prosody pitch='{pitch}' rate='{rate}' volume='{volume}'>"
+            f'{_escaped_text(text)}'
+            '</prosody></voice></speak>'
+        )
+        try:
+            await self.ws.send_str(
+                f'X-RequestId:{request_id}\r\n'
+                'Content-Type:application/ssml+xml\r\n'
+                f'X-Timestamp:{_date_string()}Z\r\n'
+                f'Path:ssml\r\n\r\n{ssml}'
+            )
+            while True:
+                item = await asyncio.wait_for(queue.get(), self.pool.receive_timeout)
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield {'type': 'audio', 'data': item}
+        finally:
+            self.turns.pop(request_id, None)
+
+    async def close(self):
+        self.closed = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+        if self.http is not None:
+            await self.http.close()
+
+
+class EdgeSessionPool:
+    """Keeps `size` EdgeSessions warm per output format and hands turns to the least busy one
+
+    Sessions are health-checked by WebSocket heartbeats and retired after
+    max_uses turns or max_age seconds (the service's connection token is short
+    lived); a background task replaces them. A request that finds every
+    session at its streams_per_session limit, or arrives before the first
+    session is up, raises PoolUnavailable instead of waiting.
+
+    Only the Edge TTS outputFormats in `formats` are kept warm; a turn in any
+    other format runs on a one-off connection (see communicate).
+    """
+
+    DEFAULT_OUTPUT_FORMAT = DEFAULT_OUTPUT_FORMAT
+
+    # Seconds between maintenance passes when nothing else wakes the pool
+    CHECK_INTERVAL = 5
+    # Back-off after a failed connect, so an unreachable service is not hammered
+    RETRY_DELAY = 2
+
+    def __init__(self, size=2, streams_per_session=1, max_uses=200, max_age=240,
+                 heartbeat=20, connect_timeout=10, receive_timeout=60, url=None, metrics=None,
+                 formats=(DEFAULT_OUTPUT_FORMAT,)):
+        self.size = size
+        self.formats = tuple(formats)
+        self.streams_per_session = streams_per_session
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.heartbeat = heartbeat
+        self.connect_timeout = connect_timeout
+        self.receive_timeout = receive_timeout
+        # Test and benchmark override for the service endpoint (a local stand-in server)
+        self.url = url
+        self.metrics = metrics
+        self.sessions = []
+        self._wake = None
+        self._maintainer = None
+        self._closing = False
+
+    @classmethod
+    def from_env(cls, metrics=None):
+        """Pool configured by EDGE_TTS_POOL_* variables, or None when EDGE_TTS_POOL_SIZE is unset or 0"""
+        size = env_limit('EDGE_TTS_POOL_SIZE', 0)
+        if size <= 0:
+            return None
+        return cls(
+            size=size,
+            streams_per_session=env_limit('EDGE_TTS_POOL_STREAMS', 1),
+            max_uses=env_limit('EDGE_TTS_POOL_MAX_USES', 200),
+            max_age=env_seconds('EDGE_TTS_POOL_MAX_AGE', 240),
+            url=os.environ.get('EDGE_TTS_POOL_URL') or None,
+            metrics=metrics,
+            formats=[name.strip() for name in os.environ.get('EDGE_TTS_POOL_FORMATS', DEFAULT_OUTPUT_FORMAT).split(',')
+                     if name.strip()] or (DEFAULT_OUTPUT_FORMAT,)
+        )
+
+    def start(self):
+        """Begin warming sessions; must be called from the running event loop"""
+        if self._maintainer is None:
+            self._wake = asyncio.Event()
+            self._maintainer = asyncio.create_task(self._maintain())
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def connect(self, http):
+        """Open the WebSocket for a new session on the given aiohttp ClientSession"""
+        import aiohttp  # pyright: ignore[reportMissingImports]
+        options = {'compress': 15, 'heartbeat': self.heartbeat}
+        if self.url:
+            return await http.ws_connect(self.url, **options)
+
+        from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL  # pyright: ignore[reportMissingImports]
+        from edge_tts.drm import DRM  # pyright: ignore[reportMissingImports]
+        try:
+            import certifi  # pyright: ignore[reportMissingImports]
+            import ssl
+            options['ssl'] = ssl.create_default_context(cafile=certifi.where())
+        except ImportError:
+            pass
+
+        for attempt in range(2):
+            try:
+                return await http.ws_connect(
+                    f'{WSS_URL}&Sec-MS-GEC={DRM.generate_sec_ms_gec()}'
+                    f'&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}'
+                    f'&ConnectionId={uuid.uuid4().hex}',
+                    headers=WSS_HEADERS, **options
+                )
+            except aiohttp.ClientResponseError as e:
+                # A 403 means the local clock is off; edge_tts corrects its skew and retries once
+                if e.status != 403 or attempt:
+                    raise
+                DRM.handle_client_response_error(e)
+
+    async def _open_session(self, output_format):
+        session = EdgeSession(self, output_format)
+        try:
+            await session.open()
+        except Exception as e:
+            sys.stderr.write(f'⚠️ Could not open an Edge TTS session: {str(e)}\n')
+            self._count('pool_connect_errors_total')
+            return False
+        self.sessions.append(session)
+        self._count('pool_sessions_opened_total')
+        return True
+
+    async def _maintain(self):
+        while not self._closing:
+            retired = [s for s in self.sessions if not s.usable() and s.active == 0]
+            for session in retired:
+                self.sessions.remove(session)
+                await session.close()
+
+            healthy = True
+            for output_format in self.formats:
+                while healthy and not self._closing and self._warm(output_format) < self.size:
+                    healthy = await self._open_session(output_format)
+                if self.metrics is not None:
+                    self.metrics.set_gauge('pool_sessions', self._warm(output_format), format=output_format)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.CHECK_INTERVAL if healthy else self.RETRY_DELAY)
+            except asyncio.TimeoutError:
+                pass
+
+    def _warm(self, output_format):
+        return sum(s.usable() for s in self.sessions if s.output_format == output_format)
+
+    def _acquire(self, output_format):
+        best = None
+        for session in self.sessions:
+            if session.output_format != output_format:
+                continue
+            if session.active < self.streams_per_session and session.usable():
+                if best is None or session.active < best.active:
+                    best = session
+        if best is None:
+            raise PoolUnavailable('No warm Edge TTS session is free')
+        best.active += 1
+        best.uses += 1
+        return best
+
+    async def stream(self, text, voice, output_format=DEFAULT_OUTPUT_FORMAT):
+        """Run one turn on a warm session; raises PoolUnavailable when none is free"""
+        if len(_escaped_text(text).encode('utf-8')) > MAX_TURN_BYTES:
+            raise PoolUnavailable('Text is too long for a single turn')
+        session = self._acquire(output_format)
+        finished = False
+        try:
+            async for chunk in session.stream(text, voice):
+                yield chunk
+            finished = True
+        finally:
+            session.active -= 1
+            if not finished:
+                # A turn abandoned or failed midway leaves the connection in an unknown state
+                session.closed = True
+                if session.ws is not None:
+                    await session.ws.close()
+            if not session.usable():
+                self.wake()
+
+    def communicate(self, text, voice, fallback, output_format=None):
+        """A Communicate-like object that prefers a warm session over fallback()
+
+        fallback() must produce edge_tts's default format, so for any other
+        output_format it is replaced by a one-off DirectCommunicate, and every
+        chunk of the stream is in the format asked for.
+        """
+        output_format = output_format or DEFAULT_OUTPUT_FORMAT
+        if output_format != DEFAULT_OUTPUT_FORMAT:
+            fallback = lambda: DirectCommunicate(self, text, voice, output_format)  # noqa: E731
+        return PooledCommunicate(self, text, voice, fallback, output_format)
+
+    def _count(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    async def close(self):
+        self._closing = True
+        if self._maintainer is not None:
+            self.wake()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+        sessions, self.sessions = self.sessions, []
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+
+class PooledCommunicate:
+    """Stands in for edge_tts.Communicate(text, voice) in the synthesis pipeline
+
+    Streams from a warm session when one is free. When the pool is busy, or a
+    pooled turn fails before any audio arrived, the text is synthesized over a
+    fresh connection from fallback() instead.
+    """
+
+    def __init__(self, pool, text, voice, fallback, output_format=DEFAULT_OUTPUT_FORMAT):
+        self.pool = pool
+        self.text = text
+        self.voice = voice
+        self.fallback = fallback
+        self.output_format = output_format
+
+    async def stream(self):
+        received = False
+        try:
+            async for chunk in self.pool.stream(self.text, self.voice, self.output_format):
+                received = True
+                yield chunk
+            self.pool._count('pool_streams_total', result='pooled')
+            return
+        except PoolUnavailable:
+            self.pool._count('pool_streams_total', result='unavailable')
+        except Exception as e:
+            if received:
+                raise
+            sys.stderr.write(f'⚠️ Pooled Edge TTS session failed, reconnecting: {str(e)}\n')
+            self.pool._count('pool_streams_total', result='failed')
+
+        async for chunk in self.fallback().stream():
+            yield chunk
+
+
+class DirectCommunicate:
+    """Communicate-like stream over a connection opened for this turn alone
+
+    Unlike edge_tts.Communicate it can ask the service for any outputFormat.
+    """
+
+    def __init__(self, pool, text, voice, output_format=DEFAULT_OUTPUT_FORMAT):
+        self.pool = pool
+        self.text = text
+        self.voice = voice
+        self.output_format = output_format
+
+    async def stream(self):
+        session = EdgeSession(self.pool, self.output_format)
+        await session.open()
+        try:
+            async for chunk in session.stream(self.text, self.voice):
+                yield chunk
+        finally:
+            await session.close()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Environment settings for the Edge TTS worker
+Every EDGE_TTS_* variable is read through these helpers, so switches accept
+the same spellings everywhere and a value that doesn't parse is reported and
+replaced by the default.
+"""
+
+import os
+import sys
+
+
+def _env_number(name, default, kind):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        sys.stderr.write(f'⚠️ Ignoring invalid {name}\n')
+        return default
+
+
+def env_limit(name, default):
+    """A positive integer from the environment, or default when unset, invalid or not positive"""
+    value = _env_number(name, default, int)
+    return value if value > 0 else default
+
+
+def env_seconds(name, default):
+    """A positive number of seconds from the environment, or default"""
+    value = _env_number(name, default, float)
+    return value if value > 0 else default
+
+
+def env_fraction(name, default):
+    """A float between 0 and 1 from the environment, or default"""
+    value = _env_number(name, default, float)
+    return value if 0 <= value <= 1 else default
+
+
+def env_flag(name, default):
+    """A switch from the environment: 1/true/yes/on or 0/false/no/off, else default"""
+    value = os.environ.get(name, '').strip().lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off'):
+        return False
+    if value:
+        sys.stderr.write(f'⚠️ Ignoring invalid {name}\n')
+    return default
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Multi-process supervisor for the Edge TTS worker
+Runs several `edgeTTS.py --serve` processes behind one stdin/stdout (or Unix
+socket) endpoint, so the text pipeline, base64 encoding and ffmpeg I/O of
+concurrent requests use more than one core. Requests are routed by a
+consistent hash of their normalized text, so a repeated phrase keeps landing
+on the worker whose in-memory state (in-flight coalescing, lexicon rewriters,
+warm backend sessions) has already seen it.
+
+Loaded by edgeTTS.py for --serve --workers <n> (or EDGE_TTS_WORKERS) above 1.
+Speaks the same JSON-lines or framed protocol as a single worker.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from edgeTTSFrames import pack_frame, read_frame
+
+# Longest JSON line a worker may answer with (base64 audio of a long text)
+LINE_LIMIT = 2 ** 26
+
+
+def routing_key(request):
+    """The text a request is routed by: whitespace collapsed and case folded
+
+    Template requests go by their template, so every sentence made from it
+    finds the fixed fragments already in the same worker's memory.
+    """
+    text = request.get('template', request.get('text'))
+    if not isinstance(text, str):
+        return ''
+    return ' '.join(text.split()).casefold()
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring over worker indexes
+
+    Each node owns `replicas` points on the ring. A key belongs to the node of
+    the first point at or after its hash; when that node is down, the walk
+    continues to the next usable one, so only the down node's keys move.
+    """
+
+    REPLICAS = 64
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        points = sorted((_hash(f'{node}:{replica}'), node) for node in nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key, usable=None):
+        """The node owning key, skipping nodes usable(node) rejects; None when none is usable"""
+        if not self._nodes:
+            return None
+        start = bisect.bisect_left(self._hashes, _hash(key)) % len(self._nodes)
+        tried = set()
+        for offset in range(len(self._nodes)):
+            node = self._nodes[(start + offset) % len(self._nodes)]
+            if node in tried:
+                continue
+            if usable is None or usable(node):
+                return node
+            tried.add(node)
+        return None
+
+
+class WorkerProcess:
+    """One `edgeTTS.py --serve` child and the requests it has been sent"""
+
+    def __init__(self, index, command):
+        self.index = index
+        self.command = command
+        self.process = None
+        self.pending = {}
+        self.restarts = 0
+        self.started_at = None
+        self.write_lock = asyncio.Lock()
+
+    @property
+    def up(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=LINE_LIMIT
+        )
+        self.started_at = time.monotonic()
+
+    async def send(self, request):
+        async with self.write_lock:
+            self.process.stdin.write((json.dumps(request) + '\n').encode('utf-8'))
+            await self.process.stdin.drain()
+
+
+class TTSSupervisor:
+    """Starts `workers` TTS worker processes and routes requests to them
+
+    Each request gets a supervisor-wide id on its way to a worker and its own
+    id back on the response, so several clients may reuse ids. A worker that
+    exits is restarted with exponential backoff (reset once it has stayed up
+    for STABLE_AFTER seconds); requests it had not answered at all are retried
+    once on the next worker on the ring, the rest fail with reason
+    worker_exit. drain() stops routing, waits for in-flight requests and
+    then closes every worker. metrics is the supervisor's TTSMetrics; worker
+    metrics are merged into a fresh instance of its class on request.
+    """
+
+    RESTART_DELAY = 0.5
+    MAX_RESTART_DELAY = 30
+    STABLE_AFTER = 60
+    # Seconds a worker gets to exit after its stdin closes before it is killed
+    STOP_TIMEOUT = 10
+
+    def __init__(self, workers, metrics, framed=False, command=None):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'edgeTTS.py')
+        command = command or [sys.executable, script, '--serve', '--workers', '1']
+        if framed:
+            command = command + ['--framed']
+        self.framed = framed
+        self.metrics = metrics
+        self.workers = [WorkerProcess(index, command) for index in range(workers)]
+        self.ring = HashRing(range(workers))
+        self.draining = False
+        self._next_id = 1
+        self._tasks = set()
+
+    async def start(self):
+        for worker in self.workers:
+            await worker.start()
+            self._watch(worker)
+        self._count_up()
+
+    def _watch(self, worker):
+        task = asyncio.create_task(self._read_responses(worker))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _count_up(self):
+        self.metrics.set_gauge('workers_up', sum(worker.up for worker in self.workers))
+
+    async def _read_responses(self, worker):
+        """Forward one worker's responses until it exits, then recover"""
+        stdout = worker.process.stdout
+        try:
+            while True:
+                if self.framed:
+                    response = await read_frame(stdout)
+                else:
+                    line = await stdout.readline()
+                    if not line:
+                        break
+                    response = json.loads(line)
+                await self._deliver(worker, response)
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            if not isinstance(e, asyncio.IncompleteReadError):
+                sys.stderr.write(f'⚠️ Unreadable output from TTS worker {worker.index}: {str(e)}\n')
+                worker.process.kill()
+        await worker.process.wait()
+        await self._worker_exited(worker)
+
+    async def _deliver(self, worker, response):
+        entry = worker.pending.get(response.get('id'))
+        if entry is None:
+            return
+        entry['responded'] = True
+        final = not entry['stream'] or response.get('type') in ('end', 'error')
+        if final:
+            del worker.pending[response['id']]
+        response['id'] = entry['client_id']
+        try:
+            await entry['emit'](response)
+        except OSError:
+            # The client went away; the worker itself is fine
+            pass
+        finally:
+            if final and not entry['done'].done():
+                entry['done'].set_result(response)
+
+    async def _worker_exited(self, worker):
+        """Retry or fail what the worker still owed, then restart it"""
+        code = worker.process.returncode
+        pending, worker.pending = worker.pending, {}
+        self._count_up()
+        if not self.draining:
+            sys.stderr.write(f'⚠️ TTS worker {worker.index} exited with code {code}; restarting\n')
+        for entry in pending.values():
+            if not entry['responded'] and not entry['retried'] and not self.draining:
+                entry['retried'] = True
+                self.metrics.inc('worker_retries_total')
+                if await self._dispatch(entry, exclude=worker.index):
+                    continue
+            await self._fail(entry, f'TTS worker exited (code {code})', 'worker_exit')
+
+        if self.draining:
+            return
+        if time.monotonic() - worker.started_at > self.STABLE_AFTER:
+            worker.restarts = 0
+        delay = min(self.MAX_RESTART_DELAY, self.RESTART_DELAY * 2 ** worker.restarts)
+        worker.restarts += 1
+        self.metrics.inc('worker_restarts_total', worker=str(worker.index))
+        await asyncio.sleep(delay)
+        if self.draining:
+            return
+        try:
+            await worker.start()
+        except OSError as e:
+            sys.stderr.write(f'❌ Could not restart TTS worker {worker.index}: {str(e)}\n')
+            worker.started_at = time.monotonic()
+            await self._worker_exited(worker)
+            return
+        self._watch(worker)
+        self._count_up()
+
+    async def _fail(self, entry, message, reason):
+        if entry['done'].done():
+            return
+        response = {'id': entry['client_id'], 'success': False, 'error': message, 'reason': reason}
+        if entry['stream']:
+            response['type'] = 'error'
+        response['text'] = entry['request'].get('text')
+        try:
+            await entry['emit'](response)
+        finally:
+            entry['done'].set_result(response)
+
+    async def _dispatch(self, entry, exclude=None):
+        """Send entry to the worker owning its text; False when no worker is up"""
+        index = self.ring.node_for(
+            routing_key(entry['request']),
+            lambda node: node != exclude and self.workers[node].up
+        )
+        if index is None:
+            return False
+        worker = self.workers[index]
+        internal_id = self._next_id
+        self._next_id += 1
+        worker.pending[internal_id] = entry
+        try:
+            await worker.send(dict(entry['request'], id=internal_id))
+        except (ConnectionError, RuntimeError):
+            # The worker is going away; its reader will retry or fail the entry
+            return True
+        self.metrics.inc('routed_total', worker=str(index))
+        return True
+
+    async def handle_line(self, line, emit):
+        """Decode one request line, route it and wait for its last response"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            await emit({'id': None, 'success': False, 'error': f'Invalid JSON request: {str(e)}'})
+            return
+        if not isinstance(request, dict):
+            await emit({'id': None, 'success': False, 'error': 'Request must be a JSON object'})
+            return
+        if request.get('op') == 'metrics':
+            await emit(await self.metrics_response(request.get('id'), request.get('format')))
+            return
+
+        entry = {
+            'client_id': request.get('id'),
+            'request': request,
+            'emit': emit,
+            'stream': bool(request.get('stream')),
+            'responded': False,
+            'retried': False,
+            'done': asyncio.get_running_loop().create_future()
+        }
+        if self.draining:
+            await self._fail(entry, 'TTS worker is shutting down', 'draining')
+        elif not await self._dispatch(entry):
+            await self._fail(entry, 'No TTS worker is running', 'unavailable')
+        await entry['done']
+
+    async def metrics_response(self, request_id, output_format=None):
+        """Every worker's metrics, labelled by worker, plus the supervisor's own"""
+        if output_format not in (None, 'prometheus', 'json'):
+            return {'id': request_id, 'success': False, 'error': f'Unknown metrics format: {output_format}'}
+        merged = type(self.metrics)()
+        merged.merge(self.metrics.to_json())
+
+        async def collect(worker):
+            responses = []
+
+            async def keep(response):
+                responses.append(response)
+
+            entry = {
+                'client_id': None, 'request': {'op': 'metrics', 'format': 'json'}, 'emit': keep,
+                'stream': False, 'responded': False, 'retried': True,
+                'done': asyncio.get_running_loop().create_future()
+            }
+            internal_id = self._next_id
+            self._next_id += 1
+            worker.pending[internal_id] = entry
+            try:
+                await worker.send({'id': internal_id, 'op': 'metrics', 'format': 'json'})
+                await entry['done']
+            except (ConnectionError, RuntimeError):
+                worker.pending.pop(internal_id, None)
+                return
+            if responses and responses[0].get('success'):
+                merged.merge(responses[0]['metrics'], worker=str(worker.index))
+
+        await asyncio.gather(*(collect(worker) for worker in self.workers if worker.up))
+        if output_format == 'json':
+            return {'id': request_id, 'success': True, 'format': 'json', 'metrics': merged.to_json()}
+        return {'id': request_id, 'success': True, 'format': 'prometheus', 'metrics': merged.to_prometheus()}
+
+    def serialize(self, response):
+        """Encode a response for the wire: a binary frame or a JSON line"""
+        if self.framed:
+            return pack_frame(response)
+        return (json.dumps(response) + '\n').encode('utf-8')
+
+    async def drain(self):
+        """Stop taking requests, let in-flight ones finish, then stop every worker"""
+        self.draining = True
+        owed = [entry['done'] for worker in self.workers for entry in worker.pending.values()]
+        if owed:
+            await asyncio.gather(*owed, return_exceptions=True)
+        for worker in self.workers:
+            if not worker.up:
+                continue
+            worker.process.stdin.close()
+            try:
+                await asyncio.wait_for(worker.process.wait(), self.STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                sys.stderr.write(f'⚠️ TTS worker {worker.index} did not exit; killing it\n')
+                worker.process.kill()
+                await worker.process.wait()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._count_up()
+
+    def _stop_on_signals(self, stop):
+        loop = asyncio.get_running_loop()
+        for name in ('SIGTERM', 'SIGINT'):
+            try:
+                loop.add_signal_handler(getattr(signal, name), stop.set)
+            except (AttributeError, NotImplementedError, RuntimeError):
+                # Windows has no loop signal handlers; EOF on stdin still drains
+                pass
+
+    async def serve_stdio(self):
+        """Serve requests from stdin until EOF or SIGTERM, then drain"""
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+        stop = asyncio.Event()
+        pending = set()
+
+        def read():
+            # A daemon thread, unlike the default executor, never holds up exit while blocked on stdin
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+
+        async def emit(response):
+            sys.stdout.buffer.write(self.serialize(response))
+            sys.stdout.buffer.flush()
+
+        await self.start()
+        self._stop_on_signals(stop)
+        threading.Thread(target=read, name='tts-supervisor-stdin', daemon=True).start()
+        stopped = asyncio.ensure_future(stop.wait())
+        try:
+            while True:
+                line = asyncio.ensure_future(lines.get())
+                await asyncio.wait({line, stopped}, return_when=asyncio.FIRST_COMPLETED)
+                if not line.done():
+                    line.cancel()
+                    break
+                line = line.result()
+                if line is None:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.handle_line(line, emit))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        finally:
+            stopped.cancel()
+            await self.drain()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def serve_unix(self, socket_path):
+        """Serve JSON-lines requests on a Unix domain socket until SIGTERM, then drain"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        async def handle_connection(reader, writer):
+            write_lock = asyncio.Lock()
+            pending = set()
+
+            async def emit(response):
+                async with write_lock:
+                    writer.write(self.serialize(response))
+                    await writer.drain()
+
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+                    task = asyncio.create_task(self.handle_line(line.decode('utf-8'), emit))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            finally:
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+                writer.close()
+
+        stop = asyncio.Event()
+        await self.start()
+        self._stop_on_signals(stop)
+        server = await asyncio.start_unix_server(handle_connection, path=socket_path, limit=2 ** 20)
+        sys.stderr.write(f'Edge TTS supervisor with {len(self.workers)} workers listening on {socket_path}\n')
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            server.close()
+            await self.drain()
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
@@ -0,0 +1,228 @@
+// Persistent Edge TTS worker client
+// Keeps one `python edgeTTS.py --serve` process alive and multiplexes requests
+// over its stdin/stdout protocol, matching replies by request id. Requests are
+// JSON lines; replies are binary frames (u32 header length, JSON header,
+// u32 audio length, raw audio) unless framed output is turned off, in which
+// case they are JSON lines with base64 audio.
+
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// Splits a byte stream into frames, concatenating only once a whole frame has arrived
+class FrameReader {
+    constructor(onFrame) {
+        this.onFrame = onFrame;
+        this.chunks = [];
+        this.length = 0;
+        // Bytes needed before the next parse attempt can make progress
+        this.needed = 4;
+    }
+
+    push(data) {
+        this.chunks.push(data);
+        this.length += data.length;
+
+        while (this.length >= this.needed) {
+            const buffer = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks, this.length);
+            this.chunks = [buffer];
+
+            const headerLength = buffer.readUInt32BE(0);
+            if (buffer.length < 8 + headerLength) {
+                this.needed = 8 + headerLength;
+                return;
+            }
+            const frameLength = 8 + headerLength + buffer.readUInt32BE(4 + headerLength);
+            if (buffer.length < frameLength) {
+                this.needed = frameLength;
+                return;
+            }
+
+            const header = buffer.subarray(4, 4 + headerLength);
+            const audio = buffer.subarray(8 + headerLength, frameLength);
+            const rest = buffer.subarray(frameLength);
+            this.chunks = rest.length > 0 ? [rest] : [];
+            this.length = rest.length;
+            this.needed = 4;
+            this.onFrame(header, audio);
+        }
+    }
+}
+
+class EdgeTTSWorker {
+    constructor(options = {}) {
+        this.pythonCommand = options.pythonCommand || process.env.EDGE_TTS_PYTHON || 'python';
+        this.scriptPath = options.scriptPath || path.join(__dirname, 'edgeTTS.py');
+        this.timeoutMs = options.timeoutMs || 30000;
+        this.framed = options.framed !== undefined ? options.framed : process.env.EDGE_TTS_FRAMED !== '0';
+        this.process = null;
+        this.pending = new Map();
+        this.nextId = 1;
+    }
+
+    start() {
+        if (this.process) {
+            return this.process;
+        }
+
+        const args = [this.scriptPath, '--serve'];
+        if (this.framed) {
+            args.push('--framed');
+        }
+        const child = spawn(this.pythonCommand, args, {
+            stdio: ['pipe', 'pipe', 'pipe']
+        });
+        child.stderr.setEncoding('utf8');
+
+        if (this.framed) {
+            const reader = new FrameReader((header, audio) => this.handleFrame(header, audio));
+            child.stdout.on('data', (data) => reader.push(data));
+        } else {
+            child.stdout.setEncoding('utf8');
+            const lines = readline.createInterface({ input: child.stdout });
+            lines.on('line', (line) => this.handleLine(line));
+        }
+
+        child.stderr.on('data', (data) => {
+            console.error('Edge TTS worker stderr:', data.trim());
+        });
+
+        child.on('error', (error) => {
+            console.error('Edge TTS worker failed to start:', error.message);
+            this.handleExit(child, error);
+        });
+
+        child.on('exit', (code, signal) => {
+            this.handleExit(child, new Error(`Edge TTS worker exited (code ${code}, signal ${signal})`));
+        });
+
+        this.process = child;
+        return child;
+    }
+
+    handleLine(line) {
+        let response;
+        try {
+            response = JSON.parse(line);
+        } catch (error) {
+            console.error('Failed to parse Edge TTS worker response:', error.message);
+            return;
+        }
+        this.handleResponse(response);
+    }
+
+    handleFrame(headerBuffer, audio) {
+        let response;
+        try {
+            response = JSON.parse(headerBuffer.toString('utf8'));
+        } catch (error) {
+            console.error('Failed to parse Edge TTS worker frame header:', error.message);
+            return;
+        }
+        // Raw audio stays a Buffer; callers encode it only if they need to
+        if (audio.length > 0) {
+            response.audio = audio;
+        }
+        this.handleResponse(response);
+    }
+
+    handleResponse(response) {
+        const entry = this.pending.get(response.id);
+        if (!entry) {
+            return;
+        }
+        this.pending.delete(response.id);
+        clearTimeout(entry.timer);
+
+        const { id, ...result } = response;
+        entry.resolve(result);
+    }
+
+    handleExit(child, error) {
+        if (this.process !== child) {
+            return;
+        }
+        this.process = null;
+
+        // Fail everything still in flight; the next request respawns the worker
+        for (const entry of this.pending.values()) {
+            clearTimeout(entry.timer);
+            entry.reject(error);
+        }
+        this.pending.clear();
+    }
+
+    request(payload) {
+        return new Promise((resolve, reject) => {
+            let child;
+            try {
+                child = this.start();
+            } catch (error) {
+                reject(error);
+                return;
+            }
+
+            const id = this.nextId++;
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error('Edge TTS worker request timed out'));
+            }, this.timeoutMs);
+
+            this.pending.set(id, { resolve, reject, timer });
+
+            child.stdin.write(JSON.stringify({ id, ...payload }) + '\n', 'utf8', (error) => {
+                if (error && this.pending.has(id)) {
+                    this.pending.delete(id);
+                    clearTimeout(timer);
+                    reject(error);
+                }
+            });
+        });
+    }
+
+    // format: mp3 (default), mp3-low, opus or pcm; the reply's format names what was delivered.
+    // priority: interactive, normal or bulk. The worker drops the request once
+    // deadlineMs (by default this client's own timeout) has passed.
+    speak({ text, language, voice, emotionalContext, timings, format, priority, deadlineMs }) {
+        return this.request({
+            text,
+            language: language || null,
+            voice: voice || null,
+            emotional_context: emotionalContext || 'casual',
+            timings: Boolean(timings),
+            format: format || null,
+            priority: priority || null,
+            deadline_ms: deadlineMs || this.timeoutMs
+        });
+    }
+
+    // template names its slots, e.g. 'Professor {name} is in room {room}', and slots
+    // fills them in; the fixed words are synthesized once and reused across calls.
+    speakTemplate({ template, slots, language, voice, emotionalContext, timings, format, priority, deadlineMs }) {
+        return this.request({
+            template,
+            slots: slots || {},
+            language: language || null,
+            voice: voice || null,
+            emotional_context: emotionalContext || 'casual',
+            timings: Boolean(timings),
+            format: format || null,
+            priority: priority || null,
+            deadline_ms: deadlineMs || this.timeoutMs
+        });
+    }
+
+    // Accumulated per-stage latency histograms and counters, as Prometheus text or JSON
+    metrics(format = 'prometheus') {
+        return this.request({ op: 'metrics', format });
+    }
+
+    stop() {
+        if (this.process) {
+            this.process.stdin.end();
+        }
+    }
+}
+
+module.exports = EdgeTTSWorker;
+module.exports.FrameReader = FrameReader;
@@ -0,0 +1,92 @@
+"""
+AudioCache: keys cover everything that changes the audio, writes are atomic,
+and the least recently used entries are evicted over the size cap
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import AudioCache, EdgeTTSService  # noqa: E402
+
+PARAMS = {'rate': '+0%', 'pitch': '+0Hz', 'volume': '+0%'}
+
+
+class AudioCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = AudioCache(self.directory, max_bytes=300)
+
+    def files(self):
+        return sorted(name for _, _, names in os.walk(self.directory) for name in names)
+
+    def test_key_covers_everything_that_changes_the_audio(self):
+        base = ('Hello', 'en-US-AvaNeural', PARAMS, 'mp3', None)
+        key = AudioCache.make_key(*base)
+        self.assertEqual(AudioCache.make_key(*base), key)
+        for name, changed in (
+            ('text', ('Hello!', *base[1:])),
+            ('voice', ('Hello', 'en-IN-NeerjaNeural', *base[2:])),
+            ('rate', ('Hello', base[1], dict(PARAMS, rate='+10%'), 'mp3', None)),
+            ('pitch', ('Hello', base[1], dict(PARAMS, pitch='+5Hz'), 'mp3', None)),
+            ('volume', ('Hello', base[1], dict(PARAMS, volume='-10%'), 'mp3', None)),
+            ('format', (*base[:3], 'opus', None)),
+            ('segment_language', (*base[:4], 'en')),
+        ):
+            with self.subTest(changed=name):
+                self.assertNotEqual(AudioCache.make_key(*changed), key)
+
+    def test_put_then_get(self):
+        key = AudioCache.make_key('Hello', 'voice', PARAMS, 'mp3')
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, b'audio')
+        self.assertEqual(self.cache.get(key), b'audio')
+
+    def test_failed_write_leaves_no_partial_file(self):
+        key = AudioCache.make_key('Hello', 'voice', PARAMS, 'mp3')
+        self.cache.put(key, b'old audio')
+        with mock.patch('edgeTTS.os.replace', side_effect=OSError('disk full')):
+            self.cache.put(key, b'new audio')
+        self.assertEqual(self.cache.get(key), b'old audio')
+        self.assertEqual(self.files(), [key + '.audio'])
+
+        other = AudioCache.make_key('Goodbye', 'voice', PARAMS, 'mp3')
+        with self.assertRaises(TypeError):
+            self.cache.put(other, 'not bytes')
+        self.assertIsNone(self.cache.get(other))
+        self.assertEqual(self.files(), [key + '.audio'])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [AudioCache.make_key(f'Phrase {index}', 'voice', PARAMS, 'mp3') for index in range(4)]
+        for index, key in enumerate(keys[:3]):
+            self.cache.put(key, bytes(100))
+            os.utime(self.cache._path(key), (1000 + index, 1000 + index))
+        # A hit makes the oldest entry the most recent one
+        self.assertIsNotNone(self.cache.get(keys[0]))
+
+        self.cache.put(keys[3], bytes(100))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNone(self.cache.get(keys[2]))
+        self.assertIsNotNone(self.cache.get(keys[3]))
+        self.assertLessEqual(sum(os.path.getsize(self.cache._path(key)) for key in (keys[0], keys[3])), 300 * 0.9)
+
+    def test_disabled_by_environment(self):
+        for value in ('0', 'off'):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {'EDGE_TTS_CACHE': value}):
+                self.assertIsNone(AudioCache.from_env())
+                self.assertIsNone(EdgeTTSService().audio_cache)
+        with mock.patch.dict(os.environ, {'EDGE_TTS_CACHE': '1', 'EDGE_TTS_CACHE_DIR': self.directory,
+                                          'EDGE_TTS_CACHE_MAX_BYTES': '1000'}):
+            cache = AudioCache.from_env()
+        self.assertEqual((cache.directory, cache.max_bytes), (self.directory, 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Delivered audio formats: one name for passed-through MP3, and Opus pieces
+joined into a single Ogg stream
+"""
+
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import _ogg_crc, _ogg_pages, delivered_format_name, join_ogg_opus, sniff_audio_format  # noqa: E402
+
+# A 48 kbps MPEG-2 Layer III frame header, as Edge TTS sends by default
+LOW_MP3 = b'\xff\xf3\x64\xc4' + bytes(100)
+# TOC byte of a 20 ms CELT frame: 960 samples at 48 kHz
+OPUS_PACKET = bytes([31 << 3]) + bytes(40)
+
+
+def ogg_page(flags, granule, serial, sequence, packets):
+    lacing = b''
+    for packet in packets:
+        lacing += b'\xff' * (len(packet) // 255) + bytes([len(packet) % 255])
+    page = bytearray(struct.pack('<4sBBqIII', b'OggS', 0, flags, granule, serial, sequence, 0)
+                     + bytes([len(lacing)]) + lacing + b''.join(packets))
+    struct.pack_into('<I', page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def opus_link(serial, packets_per_page, pages, pre_skip=312, trim=0):
+    head = b'OpusHead' + struct.pack('<BBHIhB', 1, 1, pre_skip, 24000, 0, 0)
+    tags = b'OpusTags' + struct.pack('<I', 0) + struct.pack('<I', 0)
+    link = [ogg_page(0x02, 0, serial, 0, [head]), ogg_page(0, 0, serial, 1, [tags])]
+    granule = 0
+    for index in range(pages):
+        granule += 960 * packets_per_page
+        last = index == pages - 1
+        link.append(ogg_page(0x04 if last else 0, granule - (trim if last else 0), serial, index + 2,
+                             [OPUS_PACKET] * packets_per_page))
+    return b''.join(link)
+
+
+class DeliveredFormatNameTest(unittest.TestCase):
+    def test_low_bitrate_mp3_is_named_like_text_to_speech(self):
+        self.assertEqual(sniff_audio_format(LOW_MP3), 'mp3-low')
+        self.assertEqual(delivered_format_name(sniff_audio_format(LOW_MP3)), 'mp3')
+        self.assertEqual(delivered_format_name('opus'), 'opus')
+        self.assertIsNone(delivered_format_name(None))
+
+
+class JoinOggOpusTest(unittest.TestCase):
+    def test_chained_links_become_one_stream(self):
+        chained = opus_link(11, 3, 2) + opus_link(22, 2, 2) + opus_link(33, 1, 3, trim=100)
+        pages = list(_ogg_pages(join_ogg_opus(chained)))
+
+        self.assertEqual({serial for _, _, serial, _, _ in pages}, {11})
+        self.assertTrue(pages[0][4].startswith(b'OpusHead'))
+        self.assertTrue(pages[1][4].startswith(b'OpusTags'))
+        self.assertEqual(sum(1 for page in pages if page[4].startswith(b'Opus')), 2)
+        self.assertEqual([flags for flags, *_ in pages], [0x02] + [0] * (len(pages) - 2) + [0x04])
+        granules = [granule for _, granule, *_ in pages[2:]]
+        self.assertEqual(granules, [2880, 5760, 7680, 9600, 10560, 11520, 12480 - 100])
+
+        joined = join_ogg_opus(chained)
+        offset = 0
+        for sequence, (_, _, _, lacing, body) in enumerate(pages):
+            size = 27 + len(lacing) + len(body)
+            page = bytearray(joined[offset:offset + size])
+            self.assertEqual(struct.unpack_from('<I', page, 18)[0], sequence)
+            crc = struct.unpack_from('<I', page, 22)[0]
+            struct.pack_into('<I', page, 22, 0)
+            self.assertEqual(crc, _ogg_crc(page))
+            offset += size
+
+    def test_single_stream_and_other_audio_are_unchanged(self):
+        single = opus_link(11, 2, 2)
+        self.assertEqual(join_ogg_opus(single), single)
+        self.assertEqual(join_ogg_opus(LOW_MP3 * 2), LOW_MP3 * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+--batch runs through TTSWorker.run_batch without losing items to the
+worker's admission control
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import TTSMetrics, TTSWorker  # noqa: E402
+from edgeTTSScheduler import TTSScheduler  # noqa: E402
+
+
+class SlowService:
+    """Stands in for EdgeTTSService: every request takes a little while"""
+
+    def __init__(self):
+        self.metrics = TTSMetrics()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def text_to_speech(self, text, voice=None, language=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        return {'success': True, 'audio': '', 'text': text}
+
+
+class BatchAdmissionTest(unittest.TestCase):
+    def run_batch(self, count, concurrency):
+        service = SlowService()
+        worker = TTSWorker(service, scheduler=TTSScheduler(metrics=service.metrics))
+        results = []
+
+        async def emit(result):
+            results.append(result)
+
+        items = [{'id': index, 'text': f'Item {index}'} for index in range(count)]
+        asyncio.run(worker.run_batch(items, emit, concurrency))
+        return service, results
+
+    def test_batch_larger_than_the_queue_completes(self):
+        count = TTSScheduler.MAX_QUEUE * 2
+        service, results = self.run_batch(count, concurrency=100)
+        failures = [result for result in results if not result['success']]
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(result['id'] for result in results), list(range(count)))
+        self.assertEqual(service.peak, 100)
+
+    def test_concurrency_bounds_the_batch(self):
+        service, results = self.run_batch(30, concurrency=3)
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(service.peak, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+CircuitBreaker: only backend failures trip it, and the EDGE_TTS_* switches
+share one parser
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import HedgePolicy  # noqa: E402
+from edgeTTSCircuit import BackendUnavailable, CircuitBreaker  # noqa: E402
+from edgeTTSSettings import env_flag  # noqa: E402
+
+# Stands in for edge_tts.exceptions.NoAudioReceived without needing edge_tts installed
+NoAudioReceived = type('NoAudioReceived', (Exception,), {'__module__': 'edge_tts.exceptions'})
+WebSocketError = type('WebSocketError', (Exception,), {'__module__': 'edge_tts.exceptions'})
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(clock=lambda: self.now)
+
+    def fail(self, error, key=None):
+        probe = self.breaker.admit(key)
+        self.breaker.record(probe, error=error, key=key)
+
+    def test_backend_failures_open_the_circuit(self):
+        for error in (ConnectionError('refused'), TimeoutError(), WebSocketError('closed')):
+            with self.subTest(error=type(error).__name__):
+                self.breaker = CircuitBreaker(clock=lambda: self.now)
+                for _ in range(CircuitBreaker.CONSECUTIVE_FAILURES):
+                    self.fail(error)
+                self.assertEqual(self.breaker.state, 'open')
+                with self.assertRaises(BackendUnavailable):
+                    self.breaker.admit()
+
+    def test_request_errors_do_not_open_the_circuit(self):
+        for _ in range(CircuitBreaker.MIN_CALLS * 2):
+            self.fail(NoAudioReceived('No audio was received'), key='punctuation')
+            self.fail(ValueError('bad input'))
+        self.assertEqual(self.breaker.state, 'closed')
+        # Nor are they kept in the failure cache
+        self.assertFalse(self.breaker.admit('punctuation'))
+
+    def test_request_error_ends_a_run_of_failures(self):
+        self.fail(ConnectionError())
+        self.fail(ConnectionError())
+        self.fail(NoAudioReceived())
+        self.fail(ConnectionError())
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_failed_request_is_refused_until_its_ttl(self):
+        self.fail(ConnectionError(), key='hello')
+        with self.assertRaises(BackendUnavailable) as raised:
+            self.breaker.admit('hello')
+        self.assertEqual(raised.exception.reason, 'recent_failure')
+        self.now += CircuitBreaker.FAILURE_TTL
+        self.assertFalse(self.breaker.admit('hello'))
+
+    def test_prompt_probe_closes_the_circuit(self):
+        for _ in range(CircuitBreaker.CONSECUTIVE_FAILURES):
+            self.fail(ConnectionError())
+        self.now += CircuitBreaker.OPEN_SECONDS
+        probe = self.breaker.admit()
+        self.assertTrue(probe)
+        with self.assertRaises(BackendUnavailable):
+            self.breaker.admit()
+        self.breaker.record(probe, first_chunk=0.2)
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+class EnvironmentTest(unittest.TestCase):
+    def setEnv(self, **values):
+        patcher = mock.patch.dict(os.environ, values)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flag_values(self):
+        for value, expected in (('1', True), ('Yes', True), (' on ', True), ('0', False), ('off', False),
+                                ('FALSE', False), ('', None), ('maybe', None)):
+            with self.subTest(value=value):
+                self.setEnv(EDGE_TTS_TEST_FLAG=value)
+                self.assertIs(env_flag('EDGE_TTS_TEST_FLAG', None), expected)
+
+    def test_switches_parse_alike(self):
+        self.setEnv(EDGE_TTS_CIRCUIT='off', EDGE_TTS_HEDGE='yes', EDGE_TTS_CIRCUIT_SLOW_SECONDS='soon')
+        self.assertFalse(CircuitBreaker.from_env().enabled)
+        self.assertTrue(HedgePolicy.from_env().enabled)
+        self.assertEqual(CircuitBreaker.from_env().slow_call, CircuitBreaker.SLOW_CALL)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+EdgeTTSService request coalescing: identical concurrent requests share one
+backend stream, and a cancelled caller leaves the others alone
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import EdgeTTSService  # noqa: E402
+
+# A 48 kbps MP3 frame header, passed through for mp3 without ffmpeg
+AUDIO = b'\xff\xf3\x64\xc4' + bytes(100)
+TEXT = 'Where is the library?'
+
+
+class CoalescingTest(unittest.TestCase):
+    def setUp(self):
+        os.environ['EDGE_TTS_CACHE'] = '0'
+        self.addCleanup(os.environ.pop, 'EDGE_TTS_CACHE')
+        self.service = EdgeTTSService()
+        self.service.phrase_bank = None
+        self.streams = 0
+        self.error = None
+
+    def run_requests(self, count, cancel=0):
+        """Results of count identical requests, the first cancel of them cancelled mid-synthesis"""
+        async def scenario():
+            release = asyncio.Event()
+
+            async def stream(text, voice, language=None, output_format=None, hedge=False):
+                self.streams += 1
+                await release.wait()
+                if self.error is not None:
+                    raise self.error
+                yield AUDIO
+
+            self.service._synthesis_stream = stream
+            tasks = [
+                asyncio.ensure_future(self.service.text_to_speech(TEXT, language='en', encoding='raw'))
+                for _ in range(count)
+            ]
+            while self.streams == 0:
+                await asyncio.sleep(0)
+            for task in tasks[:cancel]:
+                task.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Let the shielded synthesis finish when every caller was cancelled
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return results
+
+        return asyncio.run(scenario())
+
+    def test_identical_requests_share_one_stream(self):
+        results = self.run_requests(8)
+        self.assertEqual(self.streams, 1)
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertTrue(all(bytes(result['audio']) == AUDIO for result in results))
+        self.assertEqual(self.service.metrics.counters.get(('coalesced_total', (('kind', 'speak'),))), 7)
+        self.assertEqual(self.service._in_flight, {})
+
+    def test_cancelled_caller_leaves_the_others_alone(self):
+        results = self.run_requests(4, cancel=1)
+        self.assertEqual(self.streams, 1)
+        self.assertIsInstance(results[0], asyncio.CancelledError)
+        for result in results[1:]:
+            self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(self.service._in_flight, {})
+
+    def test_every_caller_cancelled(self):
+        results = self.run_requests(3, cancel=3)
+        self.assertTrue(all(isinstance(result, asyncio.CancelledError) for result in results))
+        self.assertEqual(self.service._in_flight, {})
+
+    def test_error_reaches_every_waiter(self):
+        self.error = ValueError('No audio was received')
+        results = self.run_requests(5)
+        self.assertEqual(self.streams, 1)
+        for result in results:
+            self.assertFalse(result['success'])
+            self.assertIn('No audio was received', result['error'])
+        self.assertEqual(self.service._in_flight, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Hedged Edge TTS streams: HedgePolicy's delay and budget, and _piece_audio
+yielding one stream's audio when a hedge races a failing primary
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import EdgeTTSService, HedgePolicy  # noqa: E402
+
+
+class FakeCommunicate:
+    def __init__(self, script):
+        self.script = script
+
+    async def stream(self):
+        for step in self.script:
+            if isinstance(step, float):
+                await asyncio.sleep(step)
+            elif isinstance(step, Exception):
+                raise step
+            else:
+                yield {'type': 'audio', 'data': step}
+
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_default_delay_until_enough_samples(self):
+        policy = HedgePolicy(enabled=True)
+        for _ in range(HedgePolicy.MIN_SAMPLES - 1):
+            policy.observe(0.2)
+        self.assertEqual(policy.delay(), HedgePolicy.DEFAULT_DELAY)
+        policy.observe(0.2)
+        self.assertEqual(policy.delay(), 0.2)
+
+    def test_delay_is_the_quantile_with_a_floor(self):
+        policy = HedgePolicy(enabled=True, quantile=0.9)
+        for index in range(100):
+            policy.observe(index / 100)
+        self.assertEqual(policy.delay(), 0.89)
+        policy = HedgePolicy(enabled=True)
+        for _ in range(HedgePolicy.MIN_SAMPLES):
+            policy.observe(0.001)
+        self.assertEqual(policy.delay(), HedgePolicy.MIN_DELAY)
+
+    def test_budget_refuses_hedges_once_spent(self):
+        policy = HedgePolicy(enabled=True, max_ratio=0.25)
+        self.assertEqual(sum(policy.try_hedge() for _ in range(HedgePolicy.BURST + 5)), HedgePolicy.BURST)
+        self.assertFalse(policy.try_hedge())
+        # Every stream earns a quarter of a token back
+        for _ in range(3):
+            policy.stream_started()
+        self.assertFalse(policy.try_hedge())
+        policy.stream_started()
+        self.assertTrue(policy.try_hedge())
+        self.assertFalse(policy.try_hedge())
+
+
+class PieceAudioTest(unittest.TestCase):
+    def setUp(self):
+        self.service = EdgeTTSService()
+        self.service.hedge_policy.DEFAULT_DELAY = 0.02
+        self.scripts = []
+        self.service._communicate = lambda text, voice, output_format=None: FakeCommunicate(self.scripts.pop(0))
+
+    def piece_audio(self):
+        async def collect():
+            return [data async for data in self.service._piece_audio('Hello', 'voice', hedge=True)]
+        return asyncio.run(collect())
+
+    def counter(self, name, **labels):
+        return self.service.metrics.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def test_failing_primary_loses_to_the_hedge(self):
+        self.scripts = [
+            # Late, sends a chunk after the hedge started, then fails
+            [0.05, b'primary', ConnectionError('reset')],
+            [0.05, b'hedge 1', b'hedge 2'],
+        ]
+        self.assertEqual(self.piece_audio(), [b'hedge 1', b'hedge 2'])
+        self.assertEqual(self.counter('hedges_total', outcome='hedge'), 1)
+        self.assertEqual(self.scripts, [])
+
+    def test_prompt_primary_is_not_hedged(self):
+        self.scripts = [[b'one', b'two']]
+        self.assertEqual(self.piece_audio(), [b'one', b'two'])
+        self.assertEqual(self.counter('hedges_total', outcome='hedge'), 0)
+
+    def test_spent_budget_skips_the_hedge(self):
+        self.service.hedge_policy.tokens = 0
+        self.scripts = [[0.05, b'slow'], [b'unused']]
+        self.assertEqual(self.piece_audio(), [b'slow'])
+        self.assertEqual(self.counter('hedges_skipped_total', reason='budget'), 1)
+        self.assertEqual(len(self.scripts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
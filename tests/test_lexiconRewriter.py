@@ -0,0 +1,93 @@
+"""
+LexiconRewriter: the single-pass rewrite gives the same text as applying the
+lexicon one re.sub per entry, in order
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import LexiconRewriter  # noqa: E402
+
+PRONUNCIATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'config', 'pronunciations.json')
+
+# Word and non-word characters, including a non-ASCII letter and a Devanagari
+# sign, so \b boundaries fall in every combination
+TOKEN_CHARS = 'ab.E-é'
+REPLACEMENT_CHARS = 'ab.E -éि'
+TEXT_CHARS = 'ab.E -é'
+
+
+def sequential(mapping, text):
+    """The rewrite before LexiconRewriter: one re.sub per entry, stopping at a malformed one"""
+    for token, replacement in mapping.items():
+        try:
+            text = re.sub(rf"\b{re.escape(token)}\b", replacement, text)
+        except Exception:
+            break
+    return text
+
+
+def random_string(rng, chars, shortest, longest):
+    return ''.join(rng.choice(chars) for _ in range(rng.randint(shortest, longest)))
+
+
+class LexiconRewriterTest(unittest.TestCase):
+    def assertRewritesLikeSequential(self, mapping, text):
+        self.assertEqual(LexiconRewriter(mapping).rewrite(text), sequential(mapping, text),
+                         f'mapping={mapping!r} text={text!r}')
+
+    def test_differential(self):
+        rng = random.Random(20261017)
+        for _ in range(3000):
+            mapping = {}
+            for _ in range(rng.randint(1, 5)):
+                replacement = random_string(rng, REPLACEMENT_CHARS, 0, 4)
+                if rng.random() < 0.02:
+                    replacement += '\\1'
+                mapping[random_string(rng, TOKEN_CHARS, 1, 3)] = replacement
+            rewriter = LexiconRewriter(mapping)
+            for _ in range(10):
+                text = random_string(rng, TEXT_CHARS, 0, 12)
+                self.assertEqual(rewriter.rewrite(text), sequential(mapping, text),
+                                 f'mapping={mapping!r} text={text!r}')
+
+    def test_shipped_lexicon(self):
+        with open(PRONUNCIATIONS, encoding='utf-8') as f:
+            lexicon = json.load(f)['serverLexicon']
+        text = 'The B.Tech and B.E. programmes in CSE, ECE and EEE are AICTE approved; so is the MBA. MTech too.'
+        for language, entries in lexicon.items():
+            with self.subTest(language=language):
+                mapping = dict(lexicon['default'])
+                mapping.update(entries)
+                self.assertRewritesLikeSequential(mapping, text)
+
+    def test_interacting_entries(self):
+        cases = [
+            # Overlapping tokens: the earlier entry wins where both match
+            ({'a b': 'x', 'b a': 'y'}, 'a b a'),
+            # A later entry matches inside an earlier replacement
+            ({'ECE': 'E C E', 'E': 'ee'}, 'ECE and E'),
+            # A replacement that ends in a non-word character moves a later \b
+            ({'a': 'a.', '.b': 'z'}, 'a.b ab a b'),
+            ({'a': '-', 'b': 'y'}, 'ab a-b'),
+        ]
+        for mapping, text in cases:
+            with self.subTest(mapping=mapping):
+                self.assertRewritesLikeSequential(mapping, text)
+
+    def test_template_replacement_stops_like_re_sub(self):
+        mapping = {'a': 'x', 'b': 'bad\\1', 'c': 'z'}
+        self.assertEqual(LexiconRewriter(mapping).rewrite('a b c'), 'x b c')
+
+    def test_empty_lexicon(self):
+        self.assertEqual(LexiconRewriter({}).rewrite('B.Tech'), 'B.Tech')
+
+
+if __name__ == '__main__':
+    unittest.main()
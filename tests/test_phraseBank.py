@@ -0,0 +1,105 @@
+"""
+Phrase bank: the pack format round-trips and bad packs are refused, and the
+utterances it is built from are keyed as replies are
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import EdgeTTSService, PhraseBank  # noqa: E402
+
+
+def key(home, tag):
+    """An AudioCache-shaped key whose digest lands in index slot home of a pack with 8 slots"""
+    return (home.to_bytes(8, 'little') + bytes([tag]) * 24).hex()
+
+
+class PhraseBankPackTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'phraseBank.pack')
+
+    def load(self, entries):
+        self.assertEqual(PhraseBank.write(self.path, entries), len(entries))
+        bank = PhraseBank(self.path)
+        self.addCleanup(bank.close)
+        return bank
+
+    def test_write_then_get_round_trips(self):
+        entries = {key(index, index + 1): bytes([index]) * (index + 10) for index in range(3)}
+        bank = self.load(entries)
+        self.assertEqual(bank.entry_count, 3)
+        for entry_key, audio in entries.items():
+            self.assertEqual(bytes(bank.get(entry_key)), audio)
+
+    def test_missing_key_misses(self):
+        bank = self.load({key(1, 1): b'audio'})
+        self.assertIsNone(bank.get(key(1, 2)))
+        self.assertIsNone(bank.get(key(5, 1)))
+
+    def test_colliding_slots_are_probed(self):
+        # Three keys share slot 6, so they take 6, 7 and (wrapping) 0
+        entries = {key(6, tag): f'audio {tag}'.encode() for tag in (1, 2, 3)}
+        entries[key(0, 4)] = b'displaced'
+        bank = self.load(entries)
+        self.assertEqual(bank.slot_count, 8)
+        for entry_key, audio in entries.items():
+            self.assertEqual(bytes(bank.get(entry_key)), audio)
+        self.assertIsNone(bank.get(key(6, 5)))
+
+    def test_bad_packs_are_refused(self):
+        PhraseBank.write(self.path, {key(1, 1): b'audio' * 100})
+        with open(self.path, 'rb') as f:
+            pack = f.read()
+        for name, data in (
+            ('empty', b''),
+            ('header only', pack[:10]),
+            ('truncated index', pack[:PhraseBank.HEADER.size + 10]),
+            ('truncated audio', pack[:-1]),
+            ('wrong magic', b'NOTAPACK' + pack[8:]),
+        ):
+            with self.subTest(name=name):
+                with open(self.path, 'wb') as f:
+                    f.write(data)
+                with self.assertRaises(ValueError):
+                    PhraseBank(self.path)
+                with mock.patch.dict(os.environ, {'EDGE_TTS_PHRASE_BANK': self.path}):
+                    self.assertIsNone(EdgeTTSService().phrase_bank)
+
+
+class PhraseBankRequestsTest(unittest.TestCase):
+    def setUp(self):
+        self.service = EdgeTTSService()
+
+    def test_names_are_expanded_once(self):
+        for text, expected in (
+            ('Computer Science Engineering', 'Computer Science Engineering'),
+            ('Data Structures and Algorithms', 'Data Structures and Algorithms'),
+            ('Computer Science & Engineering', 'Computer Science & Engineering'),
+            ('Computer Science', 'Computer Science Engineering'),
+            ('Prof. Anitha C S', 'Professor Anitha C S'),
+            ('Dr. G Dhivyasri', 'Doctor G Dhivyasri'),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(self.service.prepare_speech(text, language='en')[0], expected)
+
+    def test_requests_prepare_like_replies(self):
+        for text, language, emotional_context in self.service.phrase_bank_requests():
+            with self.subTest(text=text, language=language, emotional_context=emotional_context):
+                prepared = self.service.prepare_speech(text, None, language, emotional_context=emotional_context)
+                # Expanding the prepared text again changes nothing, so no term is expanded twice
+                self.assertEqual(self.service.enhance_pronunciation(prepared[0], language), prepared[0])
+                reply = self.service.prepare_speech(f'Please meet {text} today.', None, language,
+                                                    emotional_context=emotional_context)
+                self.assertIn(prepared[0], reply[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
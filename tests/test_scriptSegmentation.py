@@ -0,0 +1,50 @@
+"""
+Voice selection for mixed-script text in services/edgeTTS.py
+An explicit language keeps the request voice for every run in its own script;
+only runs in another script are read by another voice.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from edgeTTS import EdgeTTSService  # noqa: E402
+
+
+class ScriptSegmentationTest(unittest.TestCase):
+    def setUp(self):
+        self.service = EdgeTTSService()
+        # Capture the (piece, voice) list instead of synthesizing it
+        self.service._ordered_piece_audio = lambda pieces, output_format=None, hedge=False: pieces
+
+    def voices(self, text, language):
+        voice = self.service.get_voice(language)
+        return [piece_voice for _, piece_voice in self.service._synthesis_stream(text, voice, language)]
+
+    def test_accented_latin_keeps_the_request_voice(self):
+        cases = (
+            ('Bonjour, où est la bibliothèque? Elle est à côté de la cafétéria.', 'fr', 'fr-FR-DeniseNeural'),
+            ('Olá! A secretaria fica no térreo, ao lado da recepção.', 'pt-BR', 'pt-BR-FranciscaNeural'),
+            ('Welcome to the café near the main block.', 'en', self.service.voice_mapping['en']),
+        )
+        for text, language, voice in cases:
+            with self.subTest(language=language):
+                self.assertEqual(self.service.segment_by_script(text, language), [(text, language)])
+                self.assertEqual(set(self.voices(text, language)), {voice})
+
+    def test_same_script_variants_keep_the_request_voice(self):
+        for text, language in (('歡迎光臨，圖書館在二樓。', 'zh-TW'), ('Здравейте, библиотеката е на втория етаж.', 'bg')):
+            with self.subTest(language=language):
+                self.assertEqual(self.service.segment_by_script(text, language), [(text, language)])
+
+    def test_other_scripts_switch_voice(self):
+        segments = self.service.segment_by_script('ನಮಸ್ಕಾರ! CSE department ಎರಡನೇ ಮಹಡಿಯಲ್ಲಿದೆ.', 'kn')
+        self.assertEqual([language for _, language in segments], ['kn', 'en-IN', 'kn'])
+        segments = self.service.segment_by_script('The word ನಮಸ್ಕಾರ means hello, as in the café.', 'en')
+        self.assertEqual([language for _, language in segments], ['en', 'kn', 'en'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+EdgeTTSService.template_to_speech: results shaped like text_to_speech's, and
+a whole-sentence fallback when pieces cannot be had as PCM
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+import edgeTTS  # noqa: E402
+from edgeTTS import EdgeTTSService  # noqa: E402
+
+TEMPLATE = 'Professor {name} is available in room {room}.'
+SLOTS = {'name': 'Anitha', 'room': 'A12'}
+
+
+class TemplateSpeechTest(unittest.TestCase):
+    def setUp(self):
+        os.environ['EDGE_TTS_CACHE'] = '0'
+        self.addCleanup(os.environ.pop, 'EDGE_TTS_CACHE')
+        self.service = EdgeTTSService()
+        self.service.phrase_bank = None
+        self.synthesized = []
+
+        async def synthesis(key, text, voice, segment_language, audio_format='mp3', hedge=False):
+            self.synthesized.append((text, audio_format))
+            return b'\xff\xf3' + text.encode('utf-8'), audio_format, {}
+
+        self.service._coalesced_synthesis = synthesis
+        ffmpeg = edgeTTS._ffmpeg_available
+        self.addCleanup(setattr, edgeTTS, '_ffmpeg_available', ffmpeg)
+
+    def test_without_pcm_the_whole_sentence_is_synthesized(self):
+        edgeTTS._ffmpeg_available = False
+        self.service.session_pool = None
+        result = asyncio.run(self.service.template_to_speech(TEMPLATE, SLOTS, language='en', encoding='raw'))
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(result['format'], 'mp3')
+        self.assertEqual(self.synthesized, [(result['text'], 'mp3')])
+        self.assertIn('Anitha', result['text'])
+        self.assertEqual(self.service.metrics.counters[('template_fallbacks_total', (('reason', 'no_pcm'),))], 1)
+
+    def test_results_match_text_to_speech(self):
+        edgeTTS._ffmpeg_available = False
+        self.service.session_pool = None
+        template = asyncio.run(self.service.template_to_speech(TEMPLATE, SLOTS, language='en', timings=True))
+        text = asyncio.run(self.service.text_to_speech(TEMPLATE.format(**SLOTS), language='en', timings=True))
+        self.assertEqual(set(template), set(text))
+        self.assertEqual(template['audio'], text['audio'])
+
+    def test_failures_name_the_template(self):
+        result = asyncio.run(self.service.template_to_speech(TEMPLATE, {'name': 'Anitha'}))
+        self.assertFalse(result['success'])
+        self.assertEqual(result['text'], TEMPLATE)
+        self.assertIn('room', result['error'])
+        result = asyncio.run(self.service.template_to_speech(TEMPLATE, SLOTS, audio_format='wav'))
+        self.assertIn('Unsupported audio format', result['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()